@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
-from db.database import get_db
+from db.database import get_db, get_read_db
 from db.models import Expense
 from pydantic import BaseModel, Field
 from typing import List, Optional
@@ -76,7 +76,7 @@ async def get_expenses(
     category: Optional[str] = None,
     limit: int = Query(50, le=100),
     offset: int = 0,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get user's expenses with optional filters
@@ -103,7 +103,7 @@ async def get_expense_summary(
     user_id: str = Query(..., description="User ID from auth token"),
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get expense summary statistics
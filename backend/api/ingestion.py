@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
-from db.database import get_db
+from db.database import get_db, get_redis
 from db.models import SignalReading
 from schemas.signal import SignalBatchInput, SignalReadingResponse
 from services.anonymizer import Anonymizer
 from services.geospatial import GeospatialService
 from services.aggregator import SignalAggregator
-from datetime import datetime
+from services.contributors import ContributorCounter
+from services.outages import Observation, outage_detector
+from services.sharding import AggregationShards
+from services.metrics import ingest_batch_size, ingest_cells, ingest_readings
+from config import settings
+from datetime import datetime, timedelta, timezone
 
 router = APIRouter(prefix="/api/v1/ingest", tags=["Ingestion"])
 
@@ -28,6 +33,11 @@ async def ingest_signal_batch(
     accepted_count = 0
     rejected_count = 0
     affected_h3_cells = set()
+    contributors = {}  # UTC day -> h3_index -> device hashes, for distinct-contributor counts
+    observations = []  # For streaming outage detection
+    
+    # Days before this are outside every contributor count
+    oldest_day = datetime.now(timezone.utc).date() - timedelta(days=ContributorCounter.WINDOW_DAYS - 1)
     
     try:
         for reading in batch.readings:
@@ -62,37 +72,78 @@ async def ingest_signal_batch(
             geo_service = GeospatialService()
             h3_index = geo_service.lat_lon_to_h3(lat, lon)
             affected_h3_cells.add(h3_index)
+            timestamp = reading.timestamp if reading.timestamp.tzinfo else reading.timestamp.replace(tzinfo=timezone.utc)
+            day = timestamp.astimezone(timezone.utc).date()
+            if day >= oldest_day:
+                contributors.setdefault(day, {}).setdefault(h3_index, set()).add(device_hash)
+            observations.append(Observation(
+                h3_index=h3_index,
+                carrier_hash=carrier_hash,
+                device_hash=device_hash,
+                signal_dbm=reading.signal_dbm,
+                timestamp=reading.timestamp
+            ))
         
         # Commit all readings
         await db.commit()
+        ingest_batch_size.observe(len(batch.readings))
+        ingest_cells.observe(len(affected_h3_cells))
+        ingest_readings.inc(accepted_count)
+        
+        # Update contributor HyperLogLogs (per day of the readings) before aggregation reads them
+        redis = await get_redis()
+        try:
+            counter = ContributorCounter(redis)
+            for day, day_contributors in contributors.items():
+                await counter.add(day_contributors, when=datetime(day.year, day.month, day.day, tzinfo=timezone.utc))
+        except Exception as e:
+            # Readings are stored; confidence falls back to stale counts
+            print(f"Contributor count update failed: {e}")
+        
+        # Update rolling baselines and publish outages (never fails the batch)
+        try:
+            await outage_detector.observe(redis, observations)
+        except Exception as e:
+            print(f"Outage detection failed: {e}")
+        
+        # Queue affected cells for their shard's aggregation worker
+        queued = False
+        if settings.aggregation_sharding:
+            try:
+                await AggregationShards.mark_dirty(redis, affected_h3_cells)
+                queued = True
+            except Exception as e:
+                print(f"Queueing aggregation failed, aggregating locally: {e}")
         
         # Trigger background aggregation for affected cells
-        for h3_index in affected_h3_cells:
-            background_tasks.add_task(
-                aggregate_cell_background,
-                h3_index,
-                db
-            )
+        if not queued:
+            for h3_index in affected_h3_cells:
+                background_tasks.add_task(
+                    aggregate_cell_background,
+                    h3_index,
+                    db,
+                    redis
+                )
         
         return SignalReadingResponse(
             accepted_count=accepted_count,
             rejected_count=rejected_count,
             message=f"Successfully ingested {accepted_count} readings"
         )
-        
+    
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
 
 
-async def aggregate_cell_background(h3_index: str, db: AsyncSession):
+async def aggregate_cell_background(h3_index: int, db: AsyncSession, redis=None):
     """Background task to aggregate signal data for a cell"""
     try:
-        aggregator = SignalAggregator(db)
+        aggregator = SignalAggregator(db, redis=redis)
         await aggregator.aggregate_cell(h3_index)
     except Exception as e:
         # Log error but don't fail the request
-        print(f"Background aggregation failed for {h3_index}: {e}")
+        print(f"Background aggregation failed for {h3_index:x}: {e}")
 
 
 @router.get("/health")
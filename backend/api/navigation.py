@@ -1,40 +1,136 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from db.database import get_db, get_redis
-from schemas.signal import NavigationVector, HeatmapResponse, HeatmapCell
+from db.database import get_db, get_read_db, get_redis
+from schemas.signal import NavigationVector, HeatmapResponse, HeatmapCell, NetworkType, SignalPercentiles, Hotspot, HotspotResponse, RegionPackInfo
 from services.aggregator import SignalAggregator
+from services.anonymizer import Anonymizer
 from services.geospatial import GeospatialService
-from sqlalchemy import select
-from db.models import SignalAggregate
-import json
+from services.hotspots import hotspot_index, HotspotIndex
+from services.outages import OutageDetector
+from services.packs import PackStore, PACK_RESOLUTION, pack_filename
+from services.sharding import AggregationShards
+from services.metrics import cache_requests
+from services.cache import TieredCache
+from sqlalchemy.exc import SQLAlchemyError
+from config import settings
+from sqlalchemy import select, cast, Float, null, and_
+from db.models import SignalAggregate, SignalAggregateSlice, SignalEstimate
+from db.queries import h3_range_table, sync_version
+from datetime import datetime
+from typing import Optional, Tuple
+import asyncpg
+import os
 
 router = APIRouter(prefix="/api/v1/navigate", tags=["Navigation"])
 
+# Memory-mapped offline packs, the read path when the database is unreachable
+pack_store = PackStore(settings.region_pack_dir)
+
+# Errors that send navigation to the packs: the ORM path raises SQLAlchemy
+# errors, the asyncpg fast path (db/fastpath.py) raises asyncpg's own
+DATABASE_UNAVAILABLE = (
+    SQLAlchemyError,
+    asyncpg.PostgresError,
+    asyncpg.InterfaceError,
+    ConnectionError,
+    OSError
+)
+
+VECTOR_CACHE_HIT = cache_requests.labels("vector", "hit")
+VECTOR_CACHE_MISS = cache_requests.labels("vector", "miss")
+HEATMAP_CACHE_HIT = cache_requests.labels("heatmap", "hit")
+HEATMAP_CACHE_MISS = cache_requests.labels("heatmap", "miss")
+
+# Response caches: in-process L1 in front of the Redis keys (see services/cache.py)
+vector_cache = TieredCache("vector")
+heatmap_cache = TieredCache("heatmap")
+
+
+def resolve_slice(
+    network_type: Optional[NetworkType],
+    carrier: Optional[str],
+    at: Optional[datetime]
+) -> Optional[Tuple[str, str]]:
+    """
+    Map network type / carrier filters to a pre-aggregated slice
+    
+    Returns:
+        (dimension, value) for SignalAggregateSlice, or None when unfiltered
+    """
+    if network_type and carrier:
+        raise HTTPException(
+            status_code=400,
+            detail="Filter by either network_type or carrier, not both"
+        )
+    if (network_type or carrier) and at:
+        raise HTTPException(
+            status_code=400,
+            detail="Network type and carrier filters cannot be combined with a time filter"
+        )
+    
+    if network_type:
+        return (SignalAggregateSlice.NETWORK_TYPE, network_type.value)
+    if carrier:
+        return (SignalAggregateSlice.CARRIER, Anonymizer.hash_carrier(carrier))
+    return None
+
 
 @router.get("/vector", response_model=NavigationVector)
 async def get_navigation_vector(
     lat: float = Query(..., ge=-90, le=90, description="Current latitude"),
     lon: float = Query(..., ge=-180, le=180, description="Current longitude"),
     radius_meters: int = Query(500, ge=100, le=2000, description="Search radius"),
-    db: AsyncSession = Depends(get_db)
+    at: Optional[datetime] = Query(None, description="Time to navigate for (uses hour-of-week data)"),
+    network_type: Optional[NetworkType] = Query(None, description="Only use readings from this network type"),
+    carrier: Optional[str] = Query(None, max_length=32, description="Only use readings from this carrier"),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get navigation vector pointing toward better signal
     
     Returns bearing (compass direction) and distance to move for improved connectivity.
     Includes confidence score based on data freshness and sample size.
+    With `at`, cells are compared by their signal in that hour of the week.
+    With `network_type` or `carrier`, only that slice of the data is used.
     """
-    # Check Redis cache first
+    dimension = resolve_slice(network_type, carrier, at)
     redis = await get_redis()
+    
+    # Steer away from areas with an active outage (blended, or this carrier's)
+    avoid_areas = []
+    if settings.outage_navigation_penalty:
+        carrier_hash = dimension[1] if dimension and dimension[0] == SignalAggregateSlice.CARRIER else None
+        avoid_areas = await OutageDetector.outage_areas(
+            redis, lat, lon, radius_meters, carrier_hash=carrier_hash
+        )
+    
+    # Check Redis cache first
     cache_key = f"nav:{lat:.5f}:{lon:.5f}:{radius_meters}"
+    if at:
+        cache_key += f":h{GeospatialService.hour_of_week_slot(at)}"
+    if dimension:
+        cache_key += f":{dimension[0]}={dimension[1]}"
+    if avoid_areas:
+        cache_key += ":avoid=" + ",".join(f"{area:x}" for area in avoid_areas)
     
-    cached_result = await redis.get(cache_key)
-    if cached_result:
-        return NavigationVector(**json.loads(cached_result))
+    cached_result = await vector_cache.get(redis, cache_key, NavigationVector.model_validate_json)
+    if cached_result is not None:
+        VECTOR_CACHE_HIT.inc()
+        return cached_result
+    VECTOR_CACHE_MISS.inc()
     
     # Calculate navigation vector
     aggregator = SignalAggregator(db)
-    result = await aggregator.get_best_signal_in_area(lat, lon, radius_meters)
+    try:
+        result = await aggregator.get_best_signal_in_area(
+            lat, lon, radius_meters, at=at, dimension=dimension, avoid_areas=avoid_areas
+        )
+    except DATABASE_UNAVAILABLE as e:
+        # Database unavailable: answer blended queries from the offline packs
+        if at or dimension:
+            raise
+        print(f"Navigation falling back to region packs: {e}")
+        result = pack_store.best_signal_in_area(lat, lon, radius_meters)
     
     if not result:
         raise HTTPException(
@@ -45,49 +141,251 @@ async def get_navigation_vector(
     navigation_vector = NavigationVector(**result)
     
     # Cache result for 2 minutes
-    await redis.setex(
+    await vector_cache.set(
+        redis,
         cache_key,
-        120,
-        navigation_vector.model_dump_json()
+        navigation_vector,
+        navigation_vector.model_dump_json(),
+        120
     )
     
     return navigation_vector
 
 
+@router.get("/hotspots", response_model=HotspotResponse)
+async def get_nearest_hotspots(
+    lat: float = Query(..., ge=-90, le=90, description="Current latitude"),
+    lon: float = Query(..., ge=-180, le=180, description="Current longitude"),
+    k: int = Query(5, ge=1, le=50, description="Number of hotspots"),
+    min_signal_dbm: int = Query(HotspotIndex.STRONG_SIGNAL_DBM, ge=-120, le=-20, description="Minimum hotspot strength"),
+    radius_meters: int = Query(1000, ge=50, le=5000, description="Search radius")
+):
+    """
+    Get the nearest strong WiFi hotspots
+    
+    Served from the in-memory hotspot index (no database round trip), so
+    results may lag new readings by up to one refresh interval.
+    """
+    nearby = hotspot_index.nearest(
+        lat,
+        lon,
+        k=k,
+        min_signal_dbm=min_signal_dbm,
+        max_distance_meters=radius_meters
+    )
+    
+    return HotspotResponse(
+        hotspots=[Hotspot(**hotspot._asdict()) for hotspot in nearby]
+    )
+
+
+@router.get("/packs", response_model=RegionPackInfo)
+async def get_region_pack(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude")
+):
+    """
+    Find the offline region pack covering a location
+    
+    Download it from `url` (ETag / If-None-Match supported) and keep it
+    current with `/heatmap?since=<data_version>` while online.
+    """
+    region = GeospatialService.get_parent(
+        GeospatialService.lat_lon_to_h3(lat, lon), PACK_RESOLUTION
+    )
+    pack = pack_store.pack_for(region)
+    if pack is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No offline pack has been exported for this region"
+        )
+    
+    return RegionPackInfo(
+        region=GeospatialService.h3_to_string(region),
+        url=f"/packs/{pack_filename(region)}",
+        cell_count=len(pack),
+        size_bytes=os.path.getsize(pack.path),
+        data_version=pack.header.data_version,
+        created_at=pack.header.created_at
+    )
+
+
 @router.get("/heatmap", response_model=HeatmapResponse)
 async def get_heatmap(
     lat: float = Query(..., ge=-90, le=90, description="Center latitude"),
     lon: float = Query(..., ge=-180, le=180, description="Center longitude"),
     radius_meters: int = Query(1000, ge=500, le=5000, description="Area radius"),
-    db: AsyncSession = Depends(get_db)
+    at: Optional[datetime] = Query(None, description="Time to show (uses hour-of-week data)"),
+    network_type: Optional[NetworkType] = Query(None, description="Only show this network type"),
+    carrier: Optional[str] = Query(None, max_length=32, description="Only show this carrier"),
+    include_estimates: bool = Query(False, description="Fill unmeasured cells from the interpolated surface"),
+    since: Optional[int] = Query(None, ge=0, description="Only return changes after this version"),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get heatmap data for visualization
     
     Returns aggregated signal strength data for all H3 cells in the specified area.
+    With `at`, each cell shows its average for that hour of the week.
+    With `network_type` or `carrier`, each cell shows only that slice of the data.
+    With `include_estimates`, unmeasured cells are filled from the interpolated
+    surface and flagged `interpolated` (blended view only).
+    
+    Every response carries a `version`. Passing it back as `since` returns
+    only cells added or changed after it in `cells`, and cells that no
+    longer qualify (e.g. dropped below the confidence threshold) in `removed`.
+    A `since` that can't be served as a delta (e.g. from before aggregates
+    were rebuilt) gets a full response, with `since` unset.
     """
-    # Check cache
+    geo_service = GeospatialService()
+    hour_slot = geo_service.hour_of_week_slot(at) if at else None
+    dimension = resolve_slice(network_type, carrier, at)
+    
+    # Estimates are interpolated from the blended aggregate only
+    if include_estimates and (hour_slot is not None or dimension is not None):
+        raise HTTPException(
+            status_code=400,
+            detail="include_estimates cannot be combined with at, network_type or carrier"
+        )
+    if include_estimates and since is not None:
+        raise HTTPException(
+            status_code=400,
+            detail="include_estimates cannot be combined with since"
+        )
+    
+    # Check cache (keyed by center cell: every point in a cell sees the same area)
     redis = await get_redis()
-    cache_key = f"heatmap:{lat:.5f}:{lon:.5f}:{radius_meters}"
+    center_h3 = geo_service.lat_lon_to_h3(lat, lon)
+    cache_key = f"heatmap:{center_h3}:{radius_meters}"
+    if hour_slot is not None:
+        cache_key += f":h{hour_slot}"
+    if dimension:
+        cache_key += f":{dimension[0]}={dimension[1]}"
+    if include_estimates:
+        cache_key += ":est"
+    if since is not None:
+        cache_key += f":since={since}"
     
-    cached_result = await redis.get(cache_key)
-    if cached_result:
-        return HeatmapResponse(**json.loads(cached_result))
+    cached_result = await heatmap_cache.get(redis, cache_key, HeatmapResponse.model_validate_json)
+    if cached_result is not None:
+        HEATMAP_CACHE_HIT.inc()
+        return cached_result
+    HEATMAP_CACHE_MISS.inc()
     
-    # Get H3 cells in radius
-    geo_service = GeospatialService()
-    h3_cells = geo_service.get_cells_in_radius(lat, lon, radius_meters)
+    # Read the version first: anything committed after it is at or above it
+    sync = await sync_version(db)
+    version = sync.version
+    requested_since = since
+    if since is not None and not sync.reset_version <= since <= version:
+        # From before a rebuild (or not one of ours): resend everything
+        since = None
     
-    # Query aggregates
-    query = select(SignalAggregate).where(
-        SignalAggregate.h3_index.in_(h3_cells),
-        SignalAggregate.confidence_score >= 0.2
+    # Get H3 cells in radius as compacted id ranges
+    ranges = h3_range_table(
+        geo_service.get_cell_ranges_in_radius(lat, lon, radius_meters)
     )
     
-    result = await db.execute(query)
-    aggregates = result.scalars().all()
+    # Source table and columns: a network/carrier slice, the requested
+    # hour-of-week bucket, or the blended 7-day aggregate
+    source = SignalAggregate
+    filters = []
+    signal_column = SignalAggregate.avg_signal_dbm
+    count_column = SignalAggregate.sample_count
+    percentile_columns = [
+        SignalAggregate.p10_signal_dbm,
+        SignalAggregate.median_signal_dbm,
+        SignalAggregate.p90_signal_dbm
+    ]
+    
+    if dimension is not None or hour_slot is not None:
+        # Percentiles are only kept for the blended aggregate
+        percentile_columns = [null(), null(), null()]
+    
+    if dimension is not None:
+        source = SignalAggregateSlice
+        filters = [
+            SignalAggregateSlice.dimension == dimension[0],
+            SignalAggregateSlice.dimension_value == dimension[1]
+        ]
+        signal_column = SignalAggregateSlice.avg_signal_dbm
+        count_column = SignalAggregateSlice.sample_count
+    elif hour_slot is not None:
+        slot = hour_slot + 1  # Postgres arrays are 1-based
+        count_column = SignalAggregate.hour_of_week_counts[slot]
+        signal_column = (
+            cast(SignalAggregate.hour_of_week_sums[slot], Float) / cast(count_column, Float)
+        )
+    
+    columns = [
+        signal_column.label("avg_signal_dbm"),
+        source.confidence_score,
+        count_column.label("sample_count"),
+        percentile_columns[0].label("p10_signal_dbm"),
+        percentile_columns[1].label("median_signal_dbm"),
+        percentile_columns[2].label("p90_signal_dbm")
+    ]
+    
+    removed = []
+    if since is None:
+        # Query aggregates
+        query = select(source.h3_index, *columns).join(
+            ranges,
+            source.h3_index.between(ranges.c.low, ranges.c.high)
+        ).where(
+            *filters,
+            source.confidence_score >= geo_service.HEATMAP_MIN_CONFIDENCE,
+            count_column > 0
+        )
+        
+        result = await db.execute(query)
+        aggregates = result.all()
+    else:
+        # Delta: every aggregate in the area written by a transaction not
+        # finished when `since` was read (slices are rewritten together
+        # with their aggregate)
+        query = select(SignalAggregate.h3_index, *columns).join(
+            ranges,
+            SignalAggregate.h3_index.between(ranges.c.low, ranges.c.high)
+        )
+        if source is SignalAggregateSlice:
+            query = query.outerjoin(
+                SignalAggregateSlice,
+                and_(SignalAggregateSlice.h3_index == SignalAggregate.h3_index, *filters)
+            )
+        query = query.where(
+            SignalAggregate.change_xid >= since - sync.xid_offset
+        )
+        
+        result = await db.execute(query)
+        aggregates = []
+        for row in result.all():
+            if (
+                row.confidence_score is not None
+                and row.confidence_score >= geo_service.HEATMAP_MIN_CONFIDENCE
+                and row.sample_count
+            ):
+                aggregates.append(row)
+            else:
+                removed.append(geo_service.h3_to_string(row.h3_index))
+    
+    estimates = []
+    if include_estimates:
+        result = await db.execute(
+            select(SignalEstimate).join(
+                ranges,
+                SignalEstimate.h3_index.between(ranges.c.low, ranges.c.high)
+            ).where(
+                SignalEstimate.confidence_score >= geo_service.ESTIMATE_MIN_CONFIDENCE
+            )
+        )
+        # Cells measured since the surface was computed win over their estimate
+        measured = {agg.h3_index for agg in aggregates}
+        estimates = [
+            est for est in result.scalars().all()
+            if est.h3_index not in measured
+        ]
     
-    if not aggregates:
+    if not aggregates and not estimates and requested_since is None:
         raise HTTPException(
             status_code=404,
             detail="No heatmap data available in this area"
@@ -102,12 +400,15 @@ async def get_heatmap(
         cell_lat, cell_lon = geo_service.h3_to_lat_lon(agg.h3_index)
         
         cells.append(HeatmapCell(
-            h3_index=agg.h3_index,
+            h3_index=geo_service.h3_to_string(agg.h3_index),
             latitude=cell_lat,
             longitude=cell_lon,
             avg_signal_dbm=float(agg.avg_signal_dbm),
             confidence_score=float(agg.confidence_score),
-            sample_count=agg.sample_count
+            sample_count=agg.sample_count,
+            p10_signal_dbm=agg.p10_signal_dbm,
+            median_signal_dbm=agg.median_signal_dbm,
+            p90_signal_dbm=agg.p90_signal_dbm
         ))
         
         # Track bounds
@@ -116,6 +417,24 @@ async def get_heatmap(
         min_lon = min(min_lon, cell_lon)
         max_lon = max(max_lon, cell_lon)
     
+    for est in estimates:
+        cell_lat, cell_lon = geo_service.h3_to_lat_lon(est.h3_index)
+        
+        cells.append(HeatmapCell(
+            h3_index=geo_service.h3_to_string(est.h3_index),
+            latitude=cell_lat,
+            longitude=cell_lon,
+            avg_signal_dbm=float(est.estimated_signal_dbm),
+            confidence_score=float(est.confidence_score),
+            sample_count=0,
+            interpolated=True
+        ))
+        
+        min_lat = min(min_lat, cell_lat)
+        max_lat = max(max_lat, cell_lat)
+        min_lon = min(min_lon, cell_lon)
+        max_lon = max(max_lon, cell_lon)
+    
     response = HeatmapResponse(
         cells=cells,
         bounds={
@@ -123,19 +442,59 @@ async def get_heatmap(
             "max_lat": max_lat,
             "min_lon": min_lon,
             "max_lon": max_lon
-        }
+        } if cells else {},
+        version=version,
+        since=since,
+        removed=removed
     )
     
     # Cache for 5 minutes
-    await redis.setex(
+    await heatmap_cache.set(
+        redis,
         cache_key,
-        300,
-        response.model_dump_json()
+        response,
+        response.model_dump_json(),
+        300
     )
     
     return response
 
 
+@router.get("/percentiles", response_model=SignalPercentiles)
+async def get_area_percentiles(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude"),
+    resolution: int = Query(8, ge=5, le=10, description="H3 resolution of the area"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get robust signal percentiles for the H3 cell containing a point
+    
+    Merges the per-cell histograms of every aggregate under that cell, so
+    coarse areas (resolution 8 is ~0.7 km²) need no raw-reading scan.
+    """
+    geo_service = GeospatialService()
+    parent_h3 = geo_service.lat_lon_to_h3(lat, lon, resolution)
+    
+    aggregator = SignalAggregator(db)
+    histogram = await aggregator.get_parent_histogram(parent_h3)
+    
+    if histogram.total == 0:
+        raise HTTPException(
+            status_code=404,
+            detail="No signal data available in this area"
+        )
+    
+    return SignalPercentiles(
+        h3_index=geo_service.h3_to_string(parent_h3),
+        resolution=resolution,
+        sample_count=histogram.total,
+        p10_signal_dbm=histogram.quantile(0.1),
+        median_signal_dbm=histogram.quantile(0.5),
+        p90_signal_dbm=histogram.quantile(0.9)
+    )
+
+
 @router.post("/aggregate-area")
 async def trigger_area_aggregation(
     lat: float = Query(..., ge=-90, le=90),
@@ -146,13 +505,25 @@ async def trigger_area_aggregation(
     """
     Manually trigger aggregation for an area (admin only in production)
     
-    Useful for initial data seeding or refreshing stale areas.
+    Useful for initial data seeding or refreshing stale areas. With
+    aggregation sharding on, the cells are queued for their shards'
+    aggregation workers (the single writer per cell) instead.
     """
-    aggregator = SignalAggregator(db)
-    cells_aggregated = await aggregator.aggregate_area(lat, lon, radius_meters)
+    redis = await get_redis()
+    if settings.aggregation_sharding:
+        cells = GeospatialService().get_cells_in_radius(lat, lon, radius_meters)
+        try:
+            await AggregationShards.mark_dirty(redis, cells)
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"Aggregation queue unavailable: {e}")
+        message = f"Queued {len(cells)} cells for aggregation"
+    else:
+        aggregator = SignalAggregator(db, redis=redis)
+        cells_aggregated = await aggregator.aggregate_area(lat, lon, radius_meters)
+        message = f"Successfully aggregated {cells_aggregated} cells"
     
     return {
-        "message": f"Successfully aggregated {cells_aggregated} cells",
+        "message": message,
         "center": {"lat": lat, "lon": lon},
         "radius_meters": radius_meters
     }
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Query
+from db.database import get_redis
+from schemas.signal import OutageAlert, OutageResponse
+from services.anonymizer import Anonymizer
+from services.outages import OutageDetector
+from typing import Optional
+
+router = APIRouter(prefix="/api/v1/outages", tags=["Outages"])
+
+
+@router.get("/", response_model=OutageResponse)
+async def list_active_outages(
+    carrier: Optional[str] = Query(None, max_length=32, description="Only show this carrier's outages")
+):
+    """
+    List active signal outages
+    
+    Outages are detected as ingest batches arrive (see OutageDetector) and
+    expire unless new readings keep confirming them.
+    """
+    redis = await get_redis()
+    outages = await OutageDetector.active(redis)
+    
+    if carrier:
+        carrier_hash = Anonymizer.hash_carrier(carrier)
+        outages = [outage for outage in outages if outage["carrier_hash"] == carrier_hash]
+    
+    return OutageResponse(
+        outages=[OutageAlert(**outage) for outage in outages]
+    )
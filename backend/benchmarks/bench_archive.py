@@ -0,0 +1,139 @@
+"""
+Benchmark: Parquet archive storage per million readings and scan throughput
+
+Generates a synthetic day of readings for one city (devices walking around
+clustered hotspots, mixed network types and carriers), writes it through
+ReadingArchive exactly as jobs.archive_readings does, then reports bytes
+per million readings (total and per column) and scan throughput for a
+full scan, a two-column projection, and an area + time-window query that
+exercises partition and row-group pruning. No database needed.
+
+Usage (from backend/):
+    python -m benchmarks.bench_archive --readings 1000000
+"""
+import argparse
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from services.anonymizer import Anonymizer
+from services.archive import ARCHIVE_RESOLUTION, SCHEMA, ReadingArchive, build_table
+from services.geospatial import GeospatialService
+
+NETWORK_TYPES = ["4G", "5G", "LTE", "WiFi"]
+NETWORK_WEIGHTS = [0.35, 0.25, 0.2, 0.2]
+
+
+def synthetic_day(rng: np.random.Generator, n: int, lat: float, lon: float, day: date) -> dict:
+    """Column lists for n readings on one day around (lat, lon)"""
+    devices = [Anonymizer.hash_device_id(f"bench-device-{i}") for i in range(max(n // 200, 1))]
+    carriers = [Anonymizer.hash_carrier(name) for name in ("Verizon", "AT&T", "T-Mobile")]
+    ssids = [Anonymizer.hash_ssid(f"bench-ssid-{i}") for i in range(max(n // 1000, 1))]
+    
+    # Each device walks from one of a few hundred hotspots
+    hotspots = rng.normal(0, 0.05, size=(300, 2)) + (lat, lon)
+    device_ids = rng.integers(0, len(devices), n)
+    starts = hotspots[device_ids % len(hotspots)]
+    positions = np.round(starts + rng.normal(0, 0.002, size=(n, 2)), 5)
+    
+    network = rng.choice(len(NETWORK_TYPES), n, p=NETWORK_WEIGHTS)
+    signal = np.clip(rng.normal(-85, 12, n), -120, -20).astype(int)
+    seconds = np.sort(rng.integers(0, 86400, n))
+    day_start = datetime.combine(day, datetime.min.time(), timezone.utc)
+    carrier_ids = rng.integers(0, len(carriers) + 1, n)
+    ssid_ids = rng.integers(0, len(ssids), n)
+    accuracy = np.round(rng.gamma(2.0, 4.0, n), 2)
+    
+    timestamps = [day_start + timedelta(seconds=int(s)) for s in seconds]
+    return {
+        "id": [rng.bytes(16) for _ in range(n)],
+        "h3_index": [GeospatialService.lat_lon_to_h3(p[0], p[1]) for p in positions],
+        "latitude": positions[:, 0].tolist(),
+        "longitude": positions[:, 1].tolist(),
+        "signal_dbm": signal.tolist(),
+        "network_type": [NETWORK_TYPES[i] for i in network],
+        "ssid_hash": [ssids[s] if NETWORK_TYPES[t] == "WiFi" else None for t, s in zip(network, ssid_ids)],
+        "gps_accuracy_meters": accuracy.tolist(),
+        "device_id_hash": [devices[d] for d in device_ids],
+        "carrier_hash": [carriers[c] if c < len(carriers) else None for c in carrier_ids],
+        "timestamp": timestamps,
+        "created_at": timestamps,
+    }
+
+
+def timed_scan(archive: ReadingArchive, **kwargs) -> tuple:
+    start = time.perf_counter()
+    rows = sum(batch.num_rows for batch in archive.scan(**kwargs))
+    return rows, time.perf_counter() - start
+
+
+def main(args) -> None:
+    rng = np.random.default_rng(args.seed)
+    day = date(2026, 10, 1)
+    
+    start = time.perf_counter()
+    columns = synthetic_day(rng, args.readings, args.lat, args.lon, day)
+    print(f"generated {args.readings} readings in {time.perf_counter() - start:.1f}s")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        archive = ReadingArchive(directory)
+        
+        # Split by parent region like the archive job
+        parents = np.array([GeospatialService.get_parent(h, ARCHIVE_RESOLUTION) for h in columns["h3_index"]])
+        start = time.perf_counter()
+        raw_bytes = 0
+        for parent in np.unique(parents):
+            rows = np.flatnonzero(parents == parent)
+            table = build_table({name: [values[i] for i in rows] for name, values in columns.items()})
+            raw_bytes += table.nbytes
+            ReadingArchive.commit(archive.write(day, int(parent), table))
+        write_s = time.perf_counter() - start
+        
+        size = archive.size_bytes()
+        per_million = size / args.readings * 1_000_000
+        print(f"write: {args.readings / write_s:,.0f} readings/s, {len(archive.files())} files")
+        print(f"size: {size / 1024 / 1024:.1f} MiB ({per_million / 1024 / 1024:.1f} MiB per million readings, "
+              f"{size / args.readings:.1f} B/reading, {raw_bytes / size:.1f}x smaller than Arrow in memory)")
+        
+        # Compressed bytes per column across all files and row groups
+        column_bytes = dict.fromkeys(SCHEMA.names, 0)
+        for path in archive.files():
+            metadata = pq.ParquetFile(path).metadata
+            for g in range(metadata.num_row_groups):
+                group = metadata.row_group(g)
+                for c in range(group.num_columns):
+                    chunk = group.column(c)
+                    column_bytes[chunk.path_in_schema] += chunk.total_compressed_size
+        for name, nbytes in column_bytes.items():
+            print(f"  {name:<20} {nbytes / args.readings:6.2f} B/reading")
+        
+        rows, elapsed = timed_scan(archive)
+        print(f"full scan:        {rows / elapsed:>12,.0f} rows/s ({elapsed * 1000:.0f} ms)")
+        rows, elapsed = timed_scan(archive, columns=["h3_index", "signal_dbm"])
+        print(f"2-column scan:    {rows / elapsed:>12,.0f} rows/s ({elapsed * 1000:.0f} ms)")
+        
+        # One neighbourhood over six hours: most row groups are skipped by statistics
+        ranges = GeospatialService.get_cell_ranges_in_radius(args.lat, args.lon, args.radius)
+        window_start = datetime.combine(day, datetime.min.time(), timezone.utc) + timedelta(hours=12)
+        rows, elapsed = timed_scan(
+            archive,
+            columns=["h3_index", "signal_dbm", "timestamp"],
+            start=window_start,
+            end=window_start + timedelta(hours=6),
+            ranges=ranges
+        )
+        print(f"area+window scan: {rows} rows in {elapsed * 1000:.1f} ms "
+              f"({len(ranges)} H3 ranges, {args.radius} m radius, 6 h)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--readings", type=int, default=1_000_000)
+    parser.add_argument("--lat", type=float, default=40.7128)
+    parser.add_argument("--lon", type=float, default=-74.0060)
+    parser.add_argument("--radius", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
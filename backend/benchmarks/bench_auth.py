@@ -0,0 +1,117 @@
+"""
+Benchmark: JWT verification per request with and without the token cache
+
+Times AuthMiddleware.verify_token for HS256 tokens:
+
+1. Uncached: every call decodes and HMAC-verifies (the cache disabled).
+2. Cached: clients reusing their token, --clients distinct tokens.
+3. Churn: more distinct tokens than the cache holds (LRU evictions).
+
+Also checks that an expired cached token, a revoked subject and a
+revoked token are rejected, and that revoking a token without jti or
+iat leaves the subject's other tokens alone. No database needed.
+
+Usage (from backend/):
+    python -m benchmarks.bench_auth --calls 50000
+"""
+import argparse
+import random
+import time
+
+from fastapi import HTTPException
+from jose import jwt
+
+from config import settings
+from middleware.auth import AuthMiddleware, token_cache
+
+
+def make_tokens(count: int, lifetime: float = 3600) -> list:
+    now = int(time.time())
+    return [
+        jwt.encode(
+            {"sub": f"user-{i}", "role": "user", "iat": now, "exp": now + lifetime},
+            settings.secret_key,
+            algorithm="HS256"
+        )
+        for i in range(count)
+    ]
+
+
+def us_per_call(tokens: list, calls: int, seed: int) -> float:
+    rng = random.Random(seed)
+    order = [rng.choice(tokens) for _ in range(calls)]
+    start = time.perf_counter()
+    for token in order:
+        AuthMiddleware.verify_token(token)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def rejected(token: str) -> str:
+    try:
+        AuthMiddleware.verify_token(token)
+    except HTTPException as e:
+        return e.detail
+    return "accepted"
+
+
+def reset() -> None:
+    token_cache.clear()
+    token_cache.hits = token_cache.misses = 0
+
+
+def hit_rate() -> float:
+    return token_cache.hits / max(token_cache.hits + token_cache.misses, 1)
+
+
+def main(args) -> None:
+    tokens = make_tokens(args.clients)
+    max_entries = token_cache.max_entries
+    print(f"verify_token, {args.calls} calls, µs per call:")
+    
+    token_cache.max_entries = 0
+    reset()
+    uncached = us_per_call(tokens, args.calls, args.seed)
+    print(f"  uncached (every call decodes)         {uncached:7.2f}")
+    
+    token_cache.max_entries = max_entries
+    reset()
+    for token in tokens:
+        AuthMiddleware.verify_token(token)  # Each client's first request
+    token_cache.hits = token_cache.misses = 0
+    cached = us_per_call(tokens, args.calls, args.seed)
+    print(f"  cached ({args.clients} clients reusing tokens) {cached:7.2f}  "
+          f"{uncached / cached:.0f}x faster, hit rate {hit_rate():.1%}")
+    
+    churn_tokens = make_tokens(max_entries * 2)
+    reset()
+    churn = us_per_call(churn_tokens, args.calls, args.seed)
+    print(f"  churn ({len(churn_tokens)} tokens, {max_entries} entries) {churn:7.2f}  hit rate {hit_rate():.1%}")
+    
+    print("Correctness:")
+    short_lived = make_tokens(1, lifetime=1)[0]
+    AuthMiddleware.verify_token(short_lived)
+    time.sleep(2.1)
+    print(f"  cached token past exp: {rejected(short_lived)}")
+    token = tokens[0]
+    AuthMiddleware.verify_token(token)
+    token_cache.revoke_subject("user-0")
+    print(f"  revoked subject:       {rejected(token)}")
+    token = tokens[1]
+    AuthMiddleware.verify_token(token)
+    token_cache.revoke(token)
+    print(f"  revoked token:         {rejected(token)}")
+    exp = int(time.time()) + 3600
+    first, second = (
+        jwt.encode({"sub": "user-x", "role": role, "exp": exp}, settings.secret_key, algorithm="HS256")
+        for role in ("user", "admin")
+    )
+    token_cache.revoke(first)
+    print(f"  revoked, no jti/iat:   {rejected(first)}; sibling {rejected(second)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=50000)
+    parser.add_argument("--clients", type=int, default=1000, help="Distinct tokens in the cached run")
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
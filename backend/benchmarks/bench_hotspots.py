@@ -0,0 +1,83 @@
+"""
+Benchmark: nearest-hotspot lookups in the in-memory WiFi index
+
+Fills a HotspotIndex with synthetic access points over a city-sized box
+(several readings each) and reports k-nearest query latency against a
+brute-force scan of every hotspot, checking both return the same result.
+No database needed.
+
+Usage (from backend/):
+    python -m benchmarks.bench_hotspots --hotspots 50000 --queries 1000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+
+from services.geospatial import GeospatialService
+from services.hotspots import HotspotIndex
+
+
+def brute_force(index: HotspotIndex, lat: float, lon: float, k: int, min_signal_dbm: int) -> list:
+    distances = sorted(
+        (GeospatialService.calculate_distance(lat, lon, hotspot.latitude, hotspot.longitude), key)
+        for key, hotspot in index.hotspots.items()
+        if hotspot.max_signal_dbm >= min_signal_dbm
+    )
+    return [key for _, key in distances[:k]]
+
+
+def main(args) -> None:
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    index = HotspotIndex()
+    
+    start = time.perf_counter()
+    for i in range(args.hotspots):
+        lat = 40.6 + rng.random() * 0.2
+        lon = -74.1 + rng.random() * 0.2
+        for _ in range(args.readings):
+            index.add_reading(
+                f"ap{i}",
+                lat + rng.gauss(0, 2e-4),
+                lon + rng.gauss(0, 2e-4),
+                rng.randint(-90, -40),
+                now
+            )
+    load_seconds = time.perf_counter() - start
+    print(f"loaded {args.hotspots * args.readings} readings in {load_seconds:.2f}s "
+          f"({args.hotspots * args.readings / load_seconds:,.0f} readings/s)")
+    
+    queries = [(40.62 + rng.random() * 0.16, -74.08 + rng.random() * 0.16) for _ in range(args.queries)]
+    
+    timings = []
+    for lat, lon in queries:
+        start = time.perf_counter()
+        index.nearest(lat, lon, k=args.k)
+        timings.append((time.perf_counter() - start) * 1000)
+    
+    brute_timings = []
+    mismatches = 0
+    for lat, lon in queries[:args.verify]:
+        start = time.perf_counter()
+        expected = brute_force(index, lat, lon, args.k, HotspotIndex.STRONG_SIGNAL_DBM)
+        brute_timings.append((time.perf_counter() - start) * 1000)
+        found = [hotspot.ssid_hash for hotspot in index.nearest(lat, lon, k=args.k)]
+        mismatches += found != expected
+    
+    timings.sort()
+    print(f"index  p50={statistics.median(timings):.3f} ms  p99={timings[int(len(timings) * 0.99) - 1]:.3f} ms")
+    print(f"brute  p50={statistics.median(brute_timings):.3f} ms")
+    print(f"mismatches={mismatches}/{len(brute_timings)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hotspots", type=int, default=50_000)
+    parser.add_argument("--readings", type=int, default=3, help="Readings per hotspot")
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--verify", type=int, default=50, help="Queries checked against brute force")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    main(parser.parse_args())
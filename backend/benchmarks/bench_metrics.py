@@ -0,0 +1,162 @@
+"""
+Benchmark: cost of the in-process metrics on the request path
+
+Reports:
+
+1. Recording: ns per counter increment and histogram observation, with a
+   held child and with a labels() lookup per call.
+2. Per request: µs added by MetricsMiddleware plus the hooks a cached
+   /navigate/vector request runs (one cache counter, two Redis command
+   timings), around a no-op ASGI app (the exact cost) and around a minimal
+   FastAPI endpoint (end to end, noisier). Both are called directly over
+   ASGI: no sockets, no database.
+3. Scrape: time to render /metrics with a realistic number of series.
+
+No database or Redis needed.
+
+Usage (from backend/):
+    python -m benchmarks.bench_metrics --requests 20000
+"""
+import argparse
+import asyncio
+from types import SimpleNamespace
+import time
+
+from fastapi import FastAPI
+
+from middleware.metrics import MetricsMiddleware
+from services.metrics import (
+    MetricsRegistry, registry, cache_requests, http_requests, http_request_duration, redis_command_duration
+)
+
+
+def ns_per_call(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def recording(calls: int) -> None:
+    scratch = MetricsRegistry()
+    counter = scratch.counter("bench_counter", "Counter", ("cache", "result"))
+    histogram = scratch.histogram("bench_seconds", "Histogram", ("command",))
+    child_counter = counter.labels("vector", "hit")
+    child_histogram = histogram.labels("GET")
+    
+    print("Recording (ns per call):")
+    print(f"  counter, held child        {ns_per_call(child_counter.inc, calls):7.0f}")
+    print(f"  counter, labels() lookup   {ns_per_call(lambda: counter.labels('vector', 'hit').inc(), calls):7.0f}")
+    print(f"  histogram, held child      {ns_per_call(lambda: child_histogram.observe(0.0004), calls):7.0f}")
+    print(f"  histogram, labels() lookup {ns_per_call(lambda: histogram.labels('GET').observe(0.0004), calls):7.0f}")
+    print(f"  empty loop + lambda        {ns_per_call(lambda: None, calls):7.0f}")
+
+
+def build_app(instrumented: bool):
+    app = FastAPI()
+    hit = cache_requests.labels("vector", "hit")
+    
+    @app.get("/api/v1/navigate/vector")
+    async def vector(lat: float, lon: float):
+        if instrumented:
+            record_cached_vector_hooks(hit)
+        return {"bearing": 90.0, "distance_meters": 120.0}
+    
+    return MetricsMiddleware(app) if instrumented else app
+
+
+def record_cached_vector_hooks(hit) -> None:
+    # What a cached vector request records besides the middleware
+    redis_command_duration.labels("GET").observe(0.0003)
+    redis_command_duration.labels("EXISTS").observe(0.0002)
+    hit.inc()
+
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def instrumented_noop_app(scope, receive, send):
+    scope["route"] = VECTOR_ROUTE
+    record_cached_vector_hooks(cache_requests.labels("vector", "hit"))
+    await noop_app(scope, receive, send)
+
+
+VECTOR_ROUTE = SimpleNamespace(path="/api/v1/navigate/vector")  # What the router leaves in the scope
+
+
+async def call(app, query: bytes) -> None:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/api/v1/navigate/vector",
+        "raw_path": b"/api/v1/navigate/vector", "query_string": query,
+        "root_path": "", "headers": [(b"host", b"bench")], "server": ("bench", 80), "client": ("127.0.0.1", 1),
+    }
+    
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        pass
+    
+    await app(scope, receive, send)
+
+
+async def time_apps(apps: dict, queries: list, rounds: int) -> dict:
+    """Best µs/request per app; rounds alternate apps so drift hits all of them"""
+    timings = {name: [] for name in apps}
+    for _ in range(rounds):
+        for name, app in apps.items():
+            start = time.perf_counter()
+            for query in queries:
+                await call(app, query)
+            timings[name].append((time.perf_counter() - start) / len(queries) * 1e6)
+    return {name: min(values) for name, values in timings.items()}
+
+
+async def per_request(requests: int, rounds: int) -> None:
+    queries = [f"lat=40.{i % 9999:04d}&lon=-74.{i % 7777:04d}".encode() for i in range(requests)]
+    
+    # Isolated: the metrics work against an app that does nothing else
+    isolated = await time_apps(
+        {"plain": noop_app, "instrumented": MetricsMiddleware(instrumented_noop_app)},
+        queries * 5, rounds
+    )
+    # End to end through FastAPI routing, validation and serialization
+    full = await time_apps({"plain": build_app(False), "instrumented": build_app(True)}, queries, rounds)
+    
+    print(f"Per request (best of {rounds} rounds, µs/request):")
+    for label, timings in (("no-op ASGI app", isolated), ("FastAPI endpoint", full)):
+        overhead = timings["instrumented"] - timings["plain"]
+        print(f"  {label:<17} without {timings['plain']:7.1f}  with {timings['instrumented']:7.1f}  "
+              f"overhead {overhead:5.1f}")
+
+
+def scrape() -> None:
+    # Typical series count after a while in production
+    for method, route in [("GET", f"/api/v1/route{i}") for i in range(20)]:
+        for status in ("200", "404", "500"):
+            http_requests.labels(method, route, status).inc()
+        http_request_duration.labels(method, route).observe(0.01)
+    
+    renders = 200
+    start = time.perf_counter()
+    for _ in range(renders):
+        text = registry.render()
+    elapsed = (time.perf_counter() - start) / renders
+    print(f"Scrape: {text.count(chr(10))} lines, {len(text) / 1024:.0f} KiB, {elapsed * 1000:.2f} ms to render")
+
+
+def main(args) -> None:
+    recording(args.calls)
+    asyncio.run(per_request(args.requests, args.rounds))
+    scrape()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=1_000_000, help="Recording calls per measurement")
+    parser.add_argument("--requests", type=int, default=20000, help="Requests per round")
+    parser.add_argument("--rounds", type=int, default=7)
+    main(parser.parse_args())
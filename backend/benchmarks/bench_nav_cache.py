@@ -0,0 +1,193 @@
+"""
+Benchmark: navigation cache lookups with and without the in-process L1
+
+Uses real Redis and the navigation response models:
+
+1. Hot keys: p50/p99 µs per lookup of a vector and a heatmap response
+   from Redis alone (GET + parse, the previous path) vs a TieredCache L1
+   hit.
+2. Mixed load: --workers simulated workers (each its own L1 and
+   invalidation subscriber) serving Zipf-distributed keys, missing keys
+   filled like the endpoints do; per-tier hit ratios and p50 per lookup.
+3. Coherence: a worker rewrites a key, and the benchmark times how long
+   until no other worker serves the old value from its L1.
+
+Use a scratch Redis database: the script flushes it.
+
+Usage (from backend/):
+    python -m benchmarks.bench_nav_cache --redis-url redis://localhost:6379/15
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from collections import Counter
+
+import redis.asyncio as aioredis
+
+from schemas.signal import HeatmapCell, HeatmapResponse, NavigationVector
+from services.cache import CacheInvalidator, TieredCache
+from services.metrics import cache_tier_requests
+
+
+def vector(i: int) -> NavigationVector:
+    return NavigationVector(
+        bearing_degrees=i % 360, distance_meters=120.5, confidence_score=0.8,
+        target_signal_dbm=-70, current_signal_dbm=-95, target_p10_signal_dbm=-82, target_median_signal_dbm=-71
+    )
+
+
+def heatmap(cells: int) -> HeatmapResponse:
+    return HeatmapResponse(
+        cells=[
+            HeatmapCell(
+                h3_index=f"89283082{i:07x}", latitude=40.7 + i * 1e-4, longitude=-74.0 - i * 1e-4,
+                avg_signal_dbm=-80.5, confidence_score=0.7, sample_count=40,
+                p10_signal_dbm=-95, median_signal_dbm=-80, p90_signal_dbm=-66
+            )
+            for i in range(cells)
+        ],
+        bounds={"min_lat": 40.7, "max_lat": 40.8, "min_lon": -74.1, "max_lon": -74.0},
+        version=1234
+    )
+
+
+def percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"p50 {statistics.median(samples):8.1f} µs  p99 {p99:8.1f} µs"
+
+
+async def start_worker(redis, local_seconds: float):
+    """A worker's invalidator, subscribed, with its vector cache"""
+    invalidator = CacheInvalidator()
+    cache = TieredCache("vector", local_ttl_seconds=local_seconds, invalidator=invalidator)
+    task = asyncio.create_task(invalidator.run_forever(redis))
+    while not invalidator.listening:
+        await asyncio.sleep(0.001)
+    return invalidator, cache, task
+
+
+async def time_lookups(calls: int, lookup) -> list:
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await lookup()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+async def hot_keys(redis, args) -> None:
+    calls = args.calls
+    print(f"Hot key lookups ({calls} each):")
+    for label, model, value in (
+        ("vector", NavigationVector, vector(1)),
+        (f"heatmap ({args.heatmap_cells} cells)", HeatmapResponse, heatmap(args.heatmap_cells)),
+    ):
+        key = f"bench:{label}"
+        serialized = value.model_dump_json()
+        await redis.setex(key, 300, serialized)
+        
+        async def redis_only():
+            return model.model_validate_json(await redis.get(key))
+        
+        _, cache, task = await start_worker(redis, args.local_seconds)
+        await cache.set(redis, key, value, serialized, 300)
+        before = await time_lookups(calls, redis_only)
+        after = await time_lookups(calls, lambda: cache.get(redis, key, model.model_validate_json))
+        task.cancel()
+        print(f"  {label:<22} Redis only {percentiles(before)}   L1 hit {percentiles(after)}  "
+              f"({statistics.median(before) / statistics.median(after):.0f}x at p50, {len(serialized)} bytes)")
+
+
+async def mixed_load(redis, args) -> None:
+    await redis.flushdb()
+    workers = [await start_worker(redis, args.local_seconds) for _ in range(args.workers)]
+    rng = random.Random(args.seed)
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(args.keys)]
+    keys = rng.choices(range(args.keys), weights=weights, k=args.requests)
+    samples = []
+    counters = {
+        (tier, result): cache_tier_requests.labels("vector", tier, result)
+        for tier in ("l1", "l2") for result in ("hit", "miss")
+    }
+    before = {label: child.value for label, child in counters.items()}
+    for n, key_id in enumerate(keys):
+        _, cache, _ = workers[n % len(workers)]
+        key = f"bench:nav:{key_id}"
+        start = time.perf_counter()
+        value = await cache.get(redis, key, NavigationVector.model_validate_json)
+        if value is None:
+            value = vector(key_id)
+            await cache.set(redis, key, value, value.model_dump_json(), 120)
+        samples.append((time.perf_counter() - start) * 1e6)
+    for _, _, task in workers:
+        task.cancel()
+    
+    # Read back from signaltrail_cache_tier_requests, as a dashboard would
+    counts = Counter({label: child.value - before[label] for label, child in counters.items()})
+    
+    def ratio(tier: str) -> float:
+        return counts[(tier, "hit")] / max(counts[(tier, "hit")] + counts[(tier, "miss")], 1)
+    
+    print(f"Mixed load: {len(keys)} lookups, {args.keys} keys (Zipf s={args.zipf}), {args.workers} workers, "
+          f"L1 {args.local_seconds:g} s")
+    print(f"  L1 hit ratio {ratio('l1'):.1%}   L2 hit ratio {ratio('l2'):.1%} (of L1 misses)   "
+          f"filled {counts[('l2', 'miss')]:.0f}")
+    print(f"  per lookup {percentiles(samples)}")
+
+
+async def coherence(redis, args) -> None:
+    await redis.flushdb()
+    workers = [await start_worker(redis, args.local_seconds) for _ in range(args.workers)]
+    key = "bench:nav:coherence"
+    old, new = vector(1), vector(2)
+    writer = workers[0][1]
+    await writer.set(redis, key, old, old.model_dump_json(), 120)
+    for _, cache, _ in workers[1:]:
+        await cache.get(redis, key, NavigationVector.model_validate_json)  # Now in every L1
+    
+    delays = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        await writer.set(redis, key, new, new.model_dump_json(), 120)
+        for _, cache, _ in workers[1:]:
+            while cache.local.get(key) is not None:
+                await asyncio.sleep(0)
+        delays.append((time.perf_counter() - start) * 1e6)
+        stale = [cache for _, cache, _ in workers[1:]
+                 if (await cache.get(redis, key, NavigationVector.model_validate_json)) != new]
+        if stale:
+            print(f"  {len(stale)} workers read a stale value")
+        old, new = new, old
+    for _, _, task in workers:
+        task.cancel()
+    print(f"Coherence: key rewritten {args.rounds} times, every other L1 dropped it within "
+          f"{percentiles(delays)} of the write")
+
+
+async def main(args) -> None:
+    redis = aioredis.from_url(args.redis_url, decode_responses=True)
+    await redis.flushdb()
+    await hot_keys(redis, args)
+    await mixed_load(redis, args)
+    await coherence(redis, args)
+    await redis.flushdb()
+    await redis.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--redis-url", default=os.environ.get("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--heatmap-cells", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--keys", type=int, default=5000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--local-seconds", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
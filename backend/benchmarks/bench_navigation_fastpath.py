@@ -0,0 +1,103 @@
+"""
+Microbenchmark: ORM vs asyncpg fast path for the /navigate/vector query
+
+Runs the best-cell lookup both ways against the configured DATABASE_URL
+and reports per-call latency. The ORM variant selects full SignalAggregate
+entities (JSONB distribution included) and converts Decimals, as the
+endpoint did before db/fastpath.py.
+
+Use a scratch database migrated to head; --seed fills signal_aggregates
+with synthetic cells around the benchmark location.
+
+Usage (from backend/):
+    python -m benchmarks.bench_navigation_fastpath --seed --iterations 2000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from db.database import AsyncSessionLocal
+from db.fastpath import fetch_best_cell
+from db.models import SignalAggregate
+from db.queries import h3_range_table
+from services.geospatial import GeospatialService
+
+LAT, LON = 40.7128, -74.0060
+
+
+async def seed(radius_meters: int) -> None:
+    geo = GeospatialService()
+    rng = random.Random(42)
+    rows = []
+    for cell in geo.get_cells_in_radius(LAT, LON, radius_meters * 2):
+        cell_lat, cell_lon = geo.h3_to_lat_lon(cell)
+        rows.append({
+            "h3_index": cell,
+            "center_location": f"SRID=4326;POINT({cell_lon} {cell_lat})",
+            "avg_signal_dbm": round(-60 - rng.random() * 50, 2),
+            "max_signal_dbm": -50,
+            "min_signal_dbm": -115,
+            "sample_count": rng.randint(1, 200),
+            "network_type_distribution": {"4G": 10, "5G": 5, "WiFi": 3},
+            "confidence_score": round(rng.random(), 2),
+        })
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            insert(SignalAggregate).on_conflict_do_nothing(), rows
+        )
+        await session.commit()
+    print(f"seeded {len(rows)} cells")
+
+
+async def orm_best_cell(session, ranges):
+    range_table = h3_range_table(ranges)
+    query = select(SignalAggregate).join(
+        range_table,
+        SignalAggregate.h3_index.between(range_table.c.low, range_table.c.high)
+    ).where(
+        SignalAggregate.confidence_score >= 0.3
+    ).order_by(SignalAggregate.avg_signal_dbm.desc())
+    result = await session.execute(query)
+    best = result.scalars().first()
+    return best.h3_index, float(best.avg_signal_dbm), float(best.confidence_score)
+
+
+async def fast_best_cell(session, ranges):
+    return await fetch_best_cell(session, ranges, min_confidence=0.3)
+
+
+async def measure(name: str, func, ranges, iterations: int) -> None:
+    async with AsyncSessionLocal() as session:
+        for _ in range(50):  # warm up pool, type cache and statement caches
+            await func(session, ranges)
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await func(session, ranges)
+            timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    print(
+        f"{name:9s} p50={statistics.median(timings):8.1f} us  "
+        f"p99={timings[int(len(timings) * 0.99)]:8.1f} us"
+    )
+
+
+async def main(args) -> None:
+    if args.seed:
+        await seed(args.radius)
+    ranges = GeospatialService.get_cell_ranges_in_radius(LAT, LON, args.radius)
+    await measure("orm", orm_best_cell, ranges, args.iterations)
+    await measure("fastpath", fast_best_cell, ranges, args.iterations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seed", action="store_true", help="Insert synthetic aggregates first")
+    parser.add_argument("--radius", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
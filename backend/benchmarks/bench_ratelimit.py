@@ -0,0 +1,138 @@
+"""
+Benchmark: rate limiter cost per request and budget enforcement across workers
+
+Runs RateLimiter instances (one per simulated API worker) against a real
+Redis and reports:
+
+1. Cost: µs per check when tokens come from the local lease vs when every
+   check goes to Redis (LOCAL_SHARE = 0), and the share of checks
+   decided without Redis.
+2. Enforcement: clients flooding random workers for --seconds; requests
+   admitted vs the most the budget allows (burst + refill), per client.
+3. Responses: 429 status and Retry-After from RateLimitMiddleware, for a
+   client rotating device ids and prepending fake X-Forwarded-For entries.
+4. Fallback: with Redis unreachable, each worker still limits locally.
+
+Use a scratch Redis database: the script flushes it.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ratelimit --redis-url redis://localhost:6379/15
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import Counter
+
+import httpx
+import redis.asyncio as aioredis
+from fastapi import FastAPI
+
+from middleware.ratelimit import RateLimitMiddleware
+from services.ratelimit import RateLimiter, parse_networks
+
+
+async def cost(redis, calls: int, per_minute: int) -> None:
+    print(f"Cost per check ({calls} checks, budget large enough to allow all):")
+    for label, share in (("local lease (default)", RateLimiter.LOCAL_SHARE), ("Redis every check", 0.0)):
+        limiter = RateLimiter(redis)
+        limiter.LOCAL_SHARE = share
+        sources = Counter()
+        start = time.perf_counter()
+        for i in range(calls):
+            decision = await limiter.check("bench", f"ip:10.0.{i % 50}.1", per_minute)
+            sources[decision.source] += 1
+        elapsed = (time.perf_counter() - start) / calls * 1e6
+        print(f"  {label:<22} {elapsed:7.1f} µs  decided locally {sources['local'] / calls:.0%}")
+
+
+async def enforcement(redis, args) -> None:
+    await redis.flushdb()
+    workers = [RateLimiter(redis) for _ in range(args.workers)]
+    admitted = Counter()
+    rng = random.Random(args.seed)
+    deadline = time.monotonic() + args.seconds
+    start = time.monotonic()
+    
+    async def client(name: str) -> None:
+        while time.monotonic() < deadline:
+            decision = await rng.choice(workers).check("bench", name, args.per_minute)
+            if decision.allowed:
+                admitted[name] += 1
+            await asyncio.sleep(args.interval_ms / 1000)
+    
+    names = [f"ip:10.0.0.{i}" for i in range(args.clients)]
+    await asyncio.gather(*[client(name) for name in names])
+    elapsed = time.monotonic() - start
+    ceiling = args.per_minute + args.per_minute / 60 * elapsed
+    counts = [admitted[name] for name in names]
+    print(f"Enforcement: {args.clients} clients x 1 request / {args.interval_ms:g} ms over {args.workers} workers, "
+          f"{elapsed:.1f} s, budget {args.per_minute}/min")
+    print(f"  admitted per client min {min(counts)} max {max(counts)}  (budget allows {ceiling:.0f}: "
+          f"{args.per_minute} burst + refill)  over budget: {sum(c > ceiling for c in counts)} clients")
+
+
+async def responses(redis) -> None:
+    await redis.flushdb()
+    app = FastAPI()
+    
+    @app.get("/api/v1/navigate/vector")
+    async def vector():
+        return {"ok": True}
+    
+    limited = RateLimitMiddleware(app, RateLimiter(redis))
+    limited.budgets = {"/api/v1/navigate/": 5}
+    limited.trusted_proxies = parse_networks("127.0.0.1")  # The test client's address plays the proxy
+    statuses = Counter()
+    retry_after = None
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=limited), base_url="http://bench") as client:
+        async def get(forwarded_for: str, device_id: str):
+            return await client.get(
+                "/api/v1/navigate/vector",
+                headers={"X-Forwarded-For": forwarded_for, "X-Device-Id": device_id}
+            )
+        
+        for i in range(8):
+            # A client rotating device ids and spoofing its own X-Forwarded-For entry
+            response = await get(f"10.{i}.0.1, 203.0.113.7", f"device-{i}")
+            statuses[response.status_code] += 1
+            retry_after = response.headers.get("retry-after", retry_after)
+        other = await get("203.0.113.8", "device-0")
+    print(f"Responses (budget 5/min, 8 requests rotating spoofed ids): {dict(statuses)}  "
+          f"Retry-After {retry_after} s  other client {other.status_code}")
+
+
+async def fallback(per_minute: int) -> None:
+    unreachable = aioredis.from_url("redis://127.0.0.1:1/0", socket_connect_timeout=0.1)
+    limiter = RateLimiter(unreachable)
+    decisions = Counter()
+    for _ in range(per_minute * 2):
+        decision = await limiter.check("bench", "ip:10.9.9.9", per_minute)
+        decisions[(decision.allowed, decision.source)] += 1
+    print(f"Fallback (Redis down, {per_minute * 2} requests, budget {per_minute}/min): "
+          f"allowed {decisions[(True, 'fallback')]}, limited {decisions[(False, 'fallback')]}")
+
+
+async def main(args) -> None:
+    redis = aioredis.from_url(args.redis_url, decode_responses=True)
+    await redis.flushdb()
+    await cost(redis, args.calls, 10 ** 9)
+    await enforcement(redis, args)
+    await responses(redis)
+    await fallback(args.per_minute)
+    await redis.flushdb()
+    await redis.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--redis-url", default=os.environ.get("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--per-minute", type=int, default=60)
+    parser.add_argument("--interval-ms", type=float, default=20, help="Gap between a client's requests")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,81 @@
+"""
+Benchmark: offline region pack size and mmap read path
+
+Encodes a synthetic city (every res-10 cell within --radius of a center,
+with --coverage of them measured) into a region pack, then reports file
+size, open time, and single-cell / best-in-radius lookup latency through
+the memory-mapped reader. No database needed (reader correctness is
+covered by tests/test_packs.py).
+
+Usage (from backend/):
+    python -m benchmarks.bench_region_packs --radius 8000 --coverage 0.6
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from services.geospatial import GeospatialService
+from services.packs import RegionPack, encode_pack, write_pack
+
+
+def main(args) -> None:
+    rng = random.Random(args.seed)
+    geo = GeospatialService()
+    
+    cells = [
+        cell for cell in geo.get_cells_in_radius(args.lat, args.lon, args.radius)
+        if rng.random() < args.coverage
+    ]
+    dbm = np.array([rng.uniform(-115, -50) for _ in cells])
+    confidence = np.array([rng.uniform(0.2, 1.0) for _ in cells])
+    
+    start = time.perf_counter()
+    data = encode_pack(np.array(cells, dtype=np.uint64), dbm, confidence, data_version=1)
+    encode_ms = (time.perf_counter() - start) * 1000
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.stpk")
+        write_pack(path, data)
+        
+        start = time.perf_counter()
+        pack = RegionPack(path, verify=True)
+        open_ms = (time.perf_counter() - start) * 1000
+        
+        print(f"cells={len(pack)} size={os.path.getsize(path) / 1024:.1f} KiB "
+              f"({os.path.getsize(path) / len(pack):.1f} B/cell) encode={encode_ms:.1f} ms open+verify={open_ms:.2f} ms")
+        
+        lookups = rng.sample(cells, min(args.queries, len(cells)))
+        timings = []
+        for cell in lookups:
+            start = time.perf_counter()
+            pack.get(cell)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"get          p50={statistics.median(timings) * 1000:.1f} us")
+        
+        timings = []
+        for _ in range(args.queries):
+            lat = args.lat + rng.uniform(-0.03, 0.03)
+            lon = args.lon + rng.uniform(-0.03, 0.03)
+            ranges = geo.get_cell_ranges_in_radius(lat, lon, 500)
+            start = time.perf_counter()
+            pack.best_in_ranges(ranges, geo.NAVIGATION_MIN_CONFIDENCE)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"best (500 m) p50={statistics.median(timings):.3f} ms")
+        
+        del pack
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lat", type=float, default=40.7128)
+    parser.add_argument("--lon", type=float, default=-74.0060)
+    parser.add_argument("--radius", type=int, default=8000)
+    parser.add_argument("--coverage", type=float, default=0.6, help="Fraction of cells with aggregates")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    main(parser.parse_args())
@@ -0,0 +1,192 @@
+"""
+Benchmark: sharded aggregation throughput and single-writer ownership
+
+Runs AggregationWorker in separate processes against a real Redis with a
+simulated per-cell aggregation (--cell-ms of I/O wait plus --cpu-ms of
+CPU, roughly what aggregate_cell spends on its queries). Reports:
+
+1. Scaling: cells/s to drain the same dirty set with 1, 2, 4... workers.
+2. Rebalancing: a producer keeps re-marking hot cells while a worker
+   joins and another is killed; every aggregation checks that no other
+   worker is writing the same cell at the same time, and no popped cell
+   may be left in flight once the dirty set drains.
+
+Use a scratch Redis database: the script flushes it.
+
+Usage (from backend/):
+    python -m benchmarks.bench_sharding --redis-url redis://localhost:6379/15
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import time
+
+import redis.asyncio as aioredis
+
+from services.geospatial import GeospatialService
+from services.sharding import AggregationShards, AggregationWorker
+
+VIOLATIONS_KEY = "bench:violations"
+PROCESSED_KEY = "bench:processed"
+
+
+def run_worker(redis_url: str, worker_id: str, cell_ms: float, cpu_ms: float, lease_seconds: float) -> None:
+    async def simulated_aggregate(h3_index: int, redis) -> None:
+        # Expires before the lease, so a killed writer's marker doesn't count against its successor
+        writing_key = f"bench:writing:{h3_index:x}"
+        if not await redis.set(writing_key, worker_id, nx=True, px=int(lease_seconds * 1000 * 0.8)):
+            await redis.incr(VIOLATIONS_KEY)
+        
+        if cpu_ms:
+            deadline = time.perf_counter() + cpu_ms / 1000
+            while time.perf_counter() < deadline:
+                pass
+        await asyncio.sleep(cell_ms / 1000)
+        
+        await redis.delete(writing_key)
+        await redis.hincrby(PROCESSED_KEY, worker_id, 1)
+    
+    async def main() -> None:
+        redis = aioredis.from_url(redis_url, decode_responses=True)
+        worker = AggregationWorker(worker_id=worker_id, aggregate=simulated_aggregate, concurrency=1)
+        worker.LEASE_SECONDS = lease_seconds
+        worker.POLL_SECONDS = 0.05
+        await worker.run_forever(redis)
+    
+    asyncio.run(main())
+
+
+def start_worker(args, worker_id: str):
+    process = multiprocessing.get_context("spawn").Process(
+        target=run_worker,
+        args=(args.redis_url, worker_id, args.cell_ms, args.cpu_ms, args.lease_seconds),
+        daemon=True
+    )
+    process.start()
+    return process
+
+
+async def wait_for_members(redis, count: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if await redis.zcount(AggregationShards.WORKERS_KEY, time.time(), "+inf") == count:
+            # Every worker must also have rebuilt its ring from the full membership
+            await asyncio.sleep(AggregationWorker.HEARTBEAT_SECONDS + 0.5)
+            return
+        await asyncio.sleep(0.1)
+    raise TimeoutError(f"expected {count} workers in the ring")
+
+
+async def wait_drained(redis, timeout: float = 300.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not await redis.exists(AggregationShards.DIRTY_KEY):
+            return
+        await asyncio.sleep(0.02)
+    raise TimeoutError("dirty cells were not drained")
+
+
+async def processed_by_worker(redis) -> dict:
+    return {worker: int(count) for worker, count in (await redis.hgetall(PROCESSED_KEY)).items()}
+
+
+def stop(processes) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+async def scaling(redis, args, cells) -> None:
+    print(f"Scaling: {len(cells)} cells over "
+          f"{len({AggregationShards.shard_of(c) for c in cells})} shards, "
+          f"{args.cell_ms} ms I/O + {args.cpu_ms} ms CPU per cell, 1 shard at a time per worker")
+    baseline = None
+    for count in args.workers:
+        await redis.flushdb()
+        processes = [start_worker(args, f"w{i}") for i in range(count)]
+        try:
+            await wait_for_members(redis, count)
+            start = time.perf_counter()
+            await AggregationShards.mark_dirty(redis, cells)
+            await wait_drained(redis)
+            # The last popped batch may still be in flight
+            while sum((await processed_by_worker(redis)).values()) < len(cells):
+                await asyncio.sleep(0.01)
+            elapsed = time.perf_counter() - start
+        finally:
+            stop(processes)
+        
+        rate = len(cells) / elapsed
+        baseline = baseline or rate
+        shares = sorted((await processed_by_worker(redis)).values(), reverse=True)
+        print(f"  {count} workers: {rate:8.0f} cells/s  speedup {rate / baseline:4.2f}x  "
+              f"per-worker cells {shares}  violations {int(await redis.get(VIOLATIONS_KEY) or 0)}")
+
+
+async def rebalancing(redis, args, cells, rng) -> None:
+    print("Rebalancing: 3 workers, +1 joins at 3 s, 1 is killed at 6 s, producer runs 10 s")
+    await redis.flushdb()
+    hot = rng.sample(cells, 20)
+    processes = [start_worker(args, f"w{i}") for i in range(3)]
+    try:
+        await wait_for_members(redis, 3)
+        start = time.monotonic()
+        marks = 0
+        joined = killed = False
+        while time.monotonic() - start < 10:
+            batch = hot + rng.sample(cells, 30)
+            await AggregationShards.mark_dirty(redis, batch)
+            marks += len(batch)
+            elapsed = time.monotonic() - start
+            if elapsed > 3 and not joined:
+                processes.append(start_worker(args, "w3"))
+                joined = True
+                print(f"  {elapsed:4.1f}s w3 started     processed so far {await processed_by_worker(redis)}")
+            if elapsed > 6 and not killed:
+                processes[0].kill()  # No clean leave: its leases must expire
+                killed = True
+                print(f"  {elapsed:4.1f}s w0 killed      processed so far {await processed_by_worker(redis)}")
+            await asyncio.sleep(0.02)
+        
+        drain_start = time.monotonic()
+        await wait_drained(redis)
+        print(f"  drained {time.monotonic() - drain_start:.1f}s after the producer stopped "
+              f"(membership TTL {AggregationWorker.MEMBER_TTL_SECONDS:.0f}s, lease {args.lease_seconds:.0f}s)")
+        processed = await processed_by_worker(redis)
+        print(f"  {marks} marks coalesced into {sum(processed.values())} aggregations {processed}")
+        print(f"  concurrent writers on one cell: {int(await redis.get(VIOLATIONS_KEY) or 0)}")
+        stranded = [key async for key in redis.scan_iter("aggregation:inflight:*")]
+        print(f"  shards with cells left in flight after draining: {len(stranded)}")
+    finally:
+        stop(processes)
+
+
+async def main(args) -> None:
+    rng = random.Random(args.seed)
+    redis = aioredis.from_url(args.redis_url, decode_responses=True)
+    
+    # Cells spread over a city so shards vary in size
+    cells = rng.sample(GeospatialService.get_cells_in_radius(args.lat, args.lon, args.radius), args.cells)
+    
+    await scaling(redis, args, cells)
+    await rebalancing(redis, args, cells, rng)
+    await redis.flushdb()
+    await redis.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--redis-url", default=os.environ.get("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--cells", type=int, default=2000)
+    parser.add_argument("--cell-ms", type=float, default=20.0, help="Simulated DB time per cell")
+    parser.add_argument("--cpu-ms", type=float, default=0.0, help="Simulated CPU time per cell")
+    parser.add_argument("--lease-seconds", type=float, default=3.0)
+    parser.add_argument("--lat", type=float, default=40.7128)
+    parser.add_argument("--lon", type=float, default=-74.0060)
+    parser.add_argument("--radius", type=int, default=8000)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
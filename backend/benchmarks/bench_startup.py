@@ -0,0 +1,126 @@
+"""
+Benchmark: API worker cold start (import time and lifespan startup)
+
+Starts --runs fresh interpreters that import `main` the way a uvicorn
+worker does and reports:
+
+1. Process start to exit and `import main` time (median / min).
+2. Modules that must load lazily (--lazy) but were imported anyway.
+3. Lifespan startup (schema version check, background tasks) with
+   --lifespan; needs the database in DATABASE_URL to be migrated.
+4. Import time per top-level package (-X importtime, one run).
+
+Exits non-zero when the median import time is over --target-ms or a lazy
+module was loaded, so CI can hold startup to a budget.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup --runs 7 --target-ms 2500
+    python -m benchmarks.bench_startup --lifespan
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+# Runs in each child interpreter; argv[1] is {"lazy": [...], "lifespan": bool}
+CHILD = """
+import json, sys, time
+options = json.loads(sys.argv[1])
+start = time.perf_counter()
+import main
+result = {
+    "import_ms": (time.perf_counter() - start) * 1000,
+    "loaded": [name for name in options["lazy"] if name in sys.modules],
+}
+if options["lifespan"]:
+    import asyncio
+    
+    async def startup():
+        began = time.perf_counter()
+        async with main.app.router.lifespan_context(main.app):
+            return (time.perf_counter() - began) * 1000
+    
+    try:
+        result["lifespan_ms"] = asyncio.run(startup())
+    except Exception as e:
+        result["lifespan_error"] = f"{type(e).__name__}: {e}"
+print(json.dumps(result))
+"""
+
+
+def run_child(lazy: list, lifespan: bool) -> dict:
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD, json.dumps({"lazy": lazy, "lifespan": lifespan})],
+        capture_output=True, text=True
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    if completed.returncode != 0:
+        raise SystemExit(f"Child failed:\n{completed.stderr}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_ms"] = elapsed
+    return result
+
+
+def import_time_by_package() -> Counter:
+    """Self import time (ms) per top-level package, from -X importtime"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], capture_output=True, text=True
+    )
+    totals = Counter()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        totals[name.strip().split(".")[0]] += int(self_us) / 1000
+    return totals
+
+
+def summary(values: list) -> str:
+    return f"median {statistics.median(values):7.0f} ms  min {min(values):7.0f} ms"
+
+
+def main(args) -> int:
+    lazy = [name for name in args.lazy.split(",") if name]
+    results = [run_child(lazy, args.lifespan) for _ in range(args.runs)]
+    
+    import_ms = [result["import_ms"] for result in results]
+    print(f"Cold start over {args.runs} fresh interpreters:")
+    print(f"  process start to exit  {summary([result['process_ms'] for result in results])}")
+    print(f"  import main            {summary(import_ms)}  (target {args.target_ms:g} ms)")
+    if args.lifespan:
+        errors = [result["lifespan_error"] for result in results if "lifespan_error" in result]
+        if errors:
+            print(f"  lifespan startup       failed: {errors[0]}")
+        else:
+            print(f"  lifespan startup       {summary([result['lifespan_ms'] for result in results])}")
+    
+    loaded = sorted({name for result in results for name in result["loaded"]})
+    print(f"  lazy modules loaded at import: {', '.join(loaded) or 'none'} (checked: {', '.join(lazy)})")
+    
+    print(f"Import time by package (self, one run), top {args.top}:")
+    for package, ms in import_time_by_package().most_common(args.top):
+        print(f"  {package:<24} {ms:7.1f} ms")
+    
+    failures = []
+    if statistics.median(import_ms) > args.target_ms:
+        failures.append(f"median import {statistics.median(import_ms):.0f} ms over {args.target_ms:g} ms")
+    if loaded:
+        failures.append(f"loaded at import: {', '.join(loaded)}")
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=2500, help="Allowed median `import main` time")
+    parser.add_argument("--lazy", default="jose,pyarrow,alembic", help="Modules that must not load at import")
+    parser.add_argument("--lifespan", action="store_true", help="Also time lifespan startup (needs the database)")
+    parser.add_argument("--top", type=int, default=12)
+    sys.exit(main(parser.parse_args()))
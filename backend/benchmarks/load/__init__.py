@@ -0,0 +1,7 @@
+"""
+End-to-end load benchmarks
+
+dataset.py generates a synthetic city (bulk-loaded into Postgres or sent
+through the ingest API); runner.py drives the API with it and writes
+machine-readable results that can be compared between runs.
+"""
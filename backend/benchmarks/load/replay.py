@@ -0,0 +1,253 @@
+"""
+Replay captured production traffic against a build
+
+Reads the capture files written by services/traffic.py (set
+TRAFFIC_CAPTURE_DIR on a deployment) and sends the requests open-loop
+with their original spacing, compressed or stretched by --speed.
+--full-rate also undoes the capture's sampling, replaying the load the
+sample stands for. Reading timestamps are moved to the replay time, each
+keeping its original age, so offline uploads stay offline uploads.
+Captured carrier hashes are replayed as carrier names from --carriers
+(the carriers the target's data was loaded with), so carrier filters
+and slices hit real data.
+
+Per route it prints the replay's latency and error rate next to what was
+recorded at capture time. Results are JSON in the runner's format, so
+--compare against an earlier replay of the same capture flags
+regressions between two builds.
+
+Usage (from backend/):
+    python -m benchmarks.load.replay captures/ --output replay-main.json
+    python -m benchmarks.load.replay captures/ --compare replay-main.json
+    python -m benchmarks.load.replay captures/ --base-url http://localhost:8000 --full-rate
+"""
+import argparse
+import asyncio
+import glob
+import json
+import math
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+import httpx
+
+from benchmarks.load.dataset import CARRIERS
+from benchmarks.load.runner import RESULTS_VERSION, Recorder, Request, compare, target, _git_commit
+from services.traffic import carrier_pseudonyms, read_capture, resolve_carrier
+
+
+def capture_paths(inputs: List[str]) -> List[str]:
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths.extend(sorted(glob.glob(os.path.join(path, "*.jsonl.gz"))))
+        else:
+            paths.append(path)
+    return paths
+
+
+def load_records(paths: List[str], limit: int = None) -> Tuple[List[dict], float]:
+    """
+    Captured requests of all files in arrival order
+    
+    Returns:
+        (records, sample rate of the capture)
+    """
+    records = []
+    sample_rates = set()
+    for header, record in read_capture(paths):
+        records.append(record)
+        sample_rates.add(header.get("sample_rate", 1.0))
+    records.sort(key=lambda record: record["t"])
+    if len(sample_rates) > 1:
+        print(f"Captures were sampled at different rates {sorted(sample_rates)}; --full-rate uses the lowest")
+    return records[:limit] if limit else records, min(sample_rates, default=1.0)
+
+
+def route_of(record: dict) -> str:
+    return f"{record['m']} {record.get('r') or record['p']}"
+
+
+def build_request(record: dict, sent_at: float, pseudonyms: Dict[str, str]) -> Request:
+    """
+    Captured request as runner Request
+    
+    Reading timestamps are moved to sent_at, and carrier hashes become
+    carrier names (see services.traffic.resolve_carrier).
+    """
+    params = dict(record.get("q") or {})
+    if params.get("carrier"):
+        carrier = resolve_carrier(params["carrier"], pseudonyms)
+        if carrier:
+            params["carrier"] = carrier
+        else:
+            del params["carrier"]
+    kwargs = {"params": params}
+    units = 1
+    body = record.get("b")
+    if body is not None:
+        readings = []
+        for reading in body.get("readings", []):
+            reading = dict(reading)
+            offset = reading.pop("timestamp_offset", None)
+            if offset is not None:
+                reading["timestamp"] = datetime.fromtimestamp(sent_at + offset, timezone.utc).isoformat()
+            if reading.get("carrier"):
+                reading["carrier"] = resolve_carrier(reading["carrier"], pseudonyms)
+            readings.append(reading)
+        kwargs["json"] = {"readings": readings}
+        units = len(readings)
+    return record["m"], record["p"], kwargs, units
+
+
+def captured_summaries(records: List[dict]) -> Dict[str, dict]:
+    """What each route looked like when it was captured, in Recorder.summary() form"""
+    recorders: Dict[str, Recorder] = {}
+    for record in records:
+        recorder = recorders.setdefault(route_of(record), Recorder(-math.inf, math.inf))
+        recorder.latencies.append(record["d"])
+        recorder.statuses[str(record["s"])] += 1
+        if record["s"] >= 400:
+            recorder.errors += 1
+        else:
+            recorder.units += len((record.get("b") or {}).get("readings", [])) or 1
+    duration = max(records[-1]["t"] - records[0]["t"], 1e-9) if records else 1.0
+    return {route: recorder.summary(duration) for route, recorder in recorders.items()}
+
+
+async def replay(
+    client,
+    records: List[dict],
+    speed: float,
+    max_in_flight: int,
+    pseudonyms: Dict[str, str]
+) -> Tuple[Dict[str, Recorder], float]:
+    """
+    Send the records on their (scaled) original schedule
+    
+    Returns:
+        (recorder per route, seconds from first send to last response)
+    """
+    recorders: Dict[str, Recorder] = {}
+    in_flight = set()
+    first = records[0]["t"]
+    start = time.perf_counter()
+    wall_start = time.time()
+    
+    for record in records:
+        recorder = recorders.setdefault(route_of(record), Recorder(-math.inf, math.inf))
+        scheduled = start + (record["t"] - first) / speed
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            # Client-side saturation: count it against the server, don't queue forever
+            recorder.statuses["client_saturated"] += 1
+            recorder.errors += 1
+            continue
+        request = build_request(record, wall_start + (scheduled - start), pseudonyms)
+        task = asyncio.create_task(recorder.send(client, request, scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    return recorders, time.perf_counter() - start
+
+
+def print_side_by_side(captured: Dict[str, dict], replayed: Dict[str, dict]) -> None:
+    print(f"{'route':<40} {'requests':>8}  {'p50 ms (capture -> replay)':>28}  "
+          f"{'p99 ms (capture -> replay)':>28}  errors")
+    for route, result in sorted(replayed.items()):
+        before = captured.get(route)
+        latency = result["latency_ms"]
+        old = before["latency_ms"] if before else {}
+        p50 = f"{old.get('p50') or 0:9.1f} -> {latency['p50'] or 0:9.1f}"
+        p99 = f"{old.get('p99') or 0:9.1f} -> {latency['p99'] or 0:9.1f}"
+        error_delta = (result["error_rate"] - before["error_rate"]) * 100 if before else 0.0
+        print(f"{route:<40} {result['requests']:>8}  {p50:>28}  {p99:>28}  "
+              f"{result['error_rate']:.2%} ({error_delta:+.2f} pp)  {result['status_counts']}")
+
+
+async def main(args) -> int:
+    paths = capture_paths(args.captures)
+    records, sample_rate = load_records(paths, args.limit)
+    if not records:
+        print("No captured requests found")
+        return 1
+    
+    speed = args.speed / sample_rate if args.full_rate else args.speed
+    span = records[-1]["t"] - records[0]["t"]
+    print(f"{len(records)} requests from {len(paths)} files, captured over {span:.0f} s "
+          f"at {sample_rate:.1%} sampling; replaying at {speed:g}x ({span / speed:.0f} s)")
+    
+    pseudonyms = carrier_pseudonyms([name for name in args.carriers.split(",") if name])
+    transport, lifespan, base_url = target(args.base_url)
+    if lifespan is not None:
+        await lifespan.__aenter__()
+    try:
+        limits = httpx.Limits(max_connections=args.max_in_flight)
+        async with httpx.AsyncClient(
+            transport=transport, base_url=base_url, timeout=args.timeout, limits=limits
+        ) as client:
+            recorders, elapsed = await replay(client, records, speed, args.max_in_flight, pseudonyms)
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+    
+    captured = captured_summaries(records)
+    replayed = {route: recorder.summary(elapsed) for route, recorder in recorders.items()}
+    print_side_by_side(captured, replayed)
+    
+    result = {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "target": args.base_url or "in-process",
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+            "captures": paths,
+            "sample_rate": sample_rate,
+            "speed": speed,
+        },
+        "scenarios": replayed,
+        "captured": captured,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, default=str)
+        print(f"Results written to {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        if regressions:
+            print("REGRESSION: " + "; ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("captures", nargs="+", help="Capture files or directories")
+    parser.add_argument("--base-url", help="Running server (default: the app in-process)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay rate relative to the capture")
+    parser.add_argument("--full-rate", action="store_true", help="Scale up by 1 / capture sample rate")
+    parser.add_argument("--limit", type=int, help="Replay only the first N requests")
+    parser.add_argument(
+        "--carriers",
+        default=",".join(CARRIERS),
+        help="Carrier names of the target's data, comma-separated (default: the load dataset's)"
+    )
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="Write JSON results here")
+    parser.add_argument("--compare", help="Earlier replay results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed regression (fraction)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,293 @@
+"""
+End-to-end load test of ingest, /navigate/vector and /navigate/heatmap
+
+Drives the API with the synthetic city from benchmarks.load.dataset,
+either in-process (the FastAPI app through httpx's ASGI transport, no
+server or sockets) or against a running server (--base-url). Postgres
+and Redis are whatever DATABASE_URL / REDIS_URL point at; seed the
+database first (benchmarks.load.dataset, then jobs.reaggregate).
+
+Each scenario runs closed-loop with --concurrency clients, or open-loop
+at a fixed --rate (latency then counts from the scheduled send time, so
+a stalled server can't hide queueing). Results are written as JSON;
+--compare prints the change against an earlier result and exits non-zero
+when a latency percentile, throughput or error rate regresses past
+--threshold.
+
+Usage (from backend/):
+    python -m benchmarks.load.runner --duration 30 --concurrency 32 --output results.json
+    python -m benchmarks.load.runner --base-url http://localhost:8000 --rate 200 --compare baseline.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from benchmarks.load.dataset import SyntheticCity
+
+RESULTS_VERSION = 1
+SCENARIOS = ("ingest", "vector", "heatmap")
+
+# (method, path, request kwargs, units of work e.g. readings in a batch)
+Request = Tuple[str, str, dict, int]
+
+
+def ingest_requests(city: SyntheticCity) -> Iterator[Request]:
+    for batch in city.ingest_batches(rows=10 ** 9):
+        yield "POST", "/api/v1/ingest/", {"json": batch}, len(batch["readings"])
+
+
+def vector_requests(city: SyntheticCity) -> Iterator[Request]:
+    for lat, lon in itertools.cycle(city.query_points(5000, seed=1)):
+        yield "GET", "/api/v1/navigate/vector", {"params": {"lat": lat, "lon": lon, "radius_meters": 500}}, 1
+
+
+def heatmap_requests(city: SyntheticCity) -> Iterator[Request]:
+    for lat, lon in itertools.cycle(city.query_points(2000, seed=2)):
+        yield "GET", "/api/v1/navigate/heatmap", {"params": {"lat": lat, "lon": lon, "radius_meters": 1000}}, 1
+
+
+REQUEST_GENERATORS: Dict[str, Callable[[SyntheticCity], Iterator[Request]]] = {
+    "ingest": ingest_requests,
+    "vector": vector_requests,
+    "heatmap": heatmap_requests,
+}
+
+
+class Recorder:
+    """Latencies and outcomes of the requests that completed inside the measured window"""
+    
+    def __init__(self, measure_from: float, measure_until: float):
+        self.measure_from = measure_from
+        self.measure_until = measure_until
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+        self.units = 0
+    
+    async def send(self, client: httpx.AsyncClient, request: Request, started: float) -> None:
+        method, path, kwargs, units = request
+        try:
+            response = await client.request(method, path, **kwargs)
+            status = str(response.status_code)
+            failed = response.status_code >= 400
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+            failed = True
+        finished = time.perf_counter()
+        
+        if self.measure_from <= started and finished <= self.measure_until:
+            self.latencies.append(finished - started)
+            self.statuses[status] += 1
+            if failed:
+                self.errors += 1
+            else:
+                self.units += units
+    
+    def summary(self, duration: float) -> dict:
+        latencies = np.array(self.latencies) * 1000
+        count = len(latencies)
+        requests = sum(self.statuses.values())  # Includes sends skipped at the in-flight cap
+        return {
+            "requests": requests,
+            "errors": self.errors,
+            "error_rate": self.errors / requests if requests else 0.0,
+            "throughput_rps": count / duration,
+            "units_per_second": self.units / duration,
+            "latency_ms": {
+                "mean": float(latencies.mean()) if count else None,
+                "p50": float(np.percentile(latencies, 50)) if count else None,
+                "p90": float(np.percentile(latencies, 90)) if count else None,
+                "p99": float(np.percentile(latencies, 99)) if count else None,
+                "max": float(latencies.max()) if count else None,
+            },
+            "status_counts": dict(self.statuses),
+        }
+
+
+async def run_closed_loop(client, requests: Iterator[Request], recorder: Recorder, concurrency: int) -> None:
+    async def client_loop() -> None:
+        while time.perf_counter() < recorder.measure_until:
+            await recorder.send(client, next(requests), time.perf_counter())
+    
+    await asyncio.gather(*[client_loop() for _ in range(concurrency)])
+
+
+async def run_open_loop(
+    client,
+    requests: Iterator[Request],
+    recorder: Recorder,
+    rate: float,
+    max_in_flight: int
+) -> None:
+    start = time.perf_counter()
+    in_flight = set()
+    for k in itertools.count():
+        scheduled = start + k / rate
+        if scheduled >= recorder.measure_until:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            # Client-side saturation: count it against the server, don't queue forever
+            if scheduled >= recorder.measure_from:
+                recorder.statuses["client_saturated"] += 1
+                recorder.errors += 1
+            continue
+        task = asyncio.create_task(recorder.send(client, next(requests), scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+
+async def run_scenario(client, name: str, city: SyntheticCity, args) -> dict:
+    start = time.perf_counter()
+    recorder = Recorder(start + args.warmup, start + args.warmup + args.duration)
+    requests = REQUEST_GENERATORS[name](city)
+    
+    if args.rate:
+        await run_open_loop(client, requests, recorder, args.rate, args.max_in_flight)
+    else:
+        await run_closed_loop(client, requests, recorder, args.concurrency)
+    
+    summary = recorder.summary(args.duration)
+    latency = summary["latency_ms"]
+    print(f"{name:<8} {summary['requests']:>7} req  {summary['throughput_rps']:8.1f} req/s  "
+          f"p50 {latency['p50'] or 0:7.1f} ms  p99 {latency['p99'] or 0:7.1f} ms  "
+          f"errors {summary['error_rate']:.1%}  {summary['status_counts']}")
+    return summary
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """
+    Print per-scenario changes against a baseline result
+    
+    Returns:
+        Descriptions of regressions beyond the threshold
+    """
+    regressions = []
+    print(f"\nvs {baseline['meta'].get('commit') or 'baseline'} ({baseline['meta']['started_at']}):")
+    for name, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        changes = []
+        for metric in ("p50", "p99"):
+            old, new = before["latency_ms"][metric], result["latency_ms"][metric]
+            if old and new:
+                change = new / old - 1
+                changes.append(f"{metric} {old:.1f} -> {new:.1f} ms ({change:+.0%})")
+                if change > threshold:
+                    regressions.append(f"{name} {metric} {change:+.0%}")
+        old, new = before["throughput_rps"], result["throughput_rps"]
+        if old:
+            change = new / old - 1
+            changes.append(f"throughput {change:+.0%}")
+            if change < -threshold:
+                regressions.append(f"{name} throughput {change:+.0%}")
+        error_delta = result["error_rate"] - before["error_rate"]
+        changes.append(f"errors {error_delta * 100:+.2f} pp")
+        if error_delta > 0.001:
+            regressions.append(f"{name} error rate {error_delta * 100:+.2f} pp")
+        print(f"  {name:<8} " + ", ".join(changes))
+    return regressions
+
+
+def target(base_url: Optional[str]):
+    """
+    Transport, lifespan and base URL for a running server or the in-process app
+    
+    Returns:
+        (transport, lifespan, base_url); transport and lifespan are None for a server
+    """
+    if base_url:
+        return None, None, base_url
+    from main import app
+    return httpx.ASGITransport(app=app), app.router.lifespan_context(app), "http://loadtest"
+
+
+async def main(args) -> int:
+    city = SyntheticCity(args.lat, args.lon, args.radius, seed=args.seed)
+    transport, lifespan, base_url = target(args.base_url)
+    
+    result = {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "target": args.base_url or "in-process",
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "scenarios": {},
+    }
+    
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_in_flight))
+    if lifespan is not None:
+        await lifespan.__aenter__()
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url=base_url, timeout=args.timeout, limits=limits
+        ) as client:
+            for name in args.scenarios:
+                result["scenarios"][name] = await run_scenario(client, name, city, args)
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, default=str)
+        print(f"Results written to {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        if regressions:
+            print("REGRESSION: " + "; ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", help="Running server (default: the app in-process)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Closed-loop clients")
+    parser.add_argument("--rate", type=float, help="Open-loop requests/s (instead of closed-loop)")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Open-loop in-flight cap")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="Write JSON results here")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed regression (fraction)")
+    parser.add_argument("--lat", type=float, default=40.7128)
+    parser.add_argument("--lon", type=float, default=-74.0060)
+    parser.add_argument("--radius", type=float, default=8000)
+    parser.add_argument("--seed", type=int, default=7)
+    sys.exit(asyncio.run(main(parser.parse_args())))
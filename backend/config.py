@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -7,6 +7,16 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    schema_check_strict: bool = True  # Refuse to start on a database behind the newest migration
+    
+    # Read Replica (optional; reads use the primary when unset)
+    database_replica_url: Optional[str] = None
+    replica_pool_size: int = 10
+    replica_max_overflow: int = 20
+    replica_max_lag_seconds: float = 10.0
+    replica_lag_check_seconds: float = 5.0
     
     # Redis
     redis_url: str
@@ -14,6 +24,9 @@ class Settings(BaseSettings):
     # Security
     secret_key: str
     h3_salt_key: str
+    auth_token_cache_size: int = 10000  # Verified JWTs kept per worker (0 disables the cache)
+    auth_token_cache_seconds: float = 300.0  # Re-verify cached tokens at least this often
+    auth_revocation_retention_seconds: int = 2592000  # Longest token lifetime: subject revocations are kept this long
     
     # API
     api_host: str = "0.0.0.0"
@@ -24,8 +37,47 @@ class Settings(BaseSettings):
     max_signal_age_days: int = 90
     aggregation_interval_minutes: int = 5
     
-    # Rate Limiting
-    rate_limit_per_minute: int = 60
+    # Sharded Aggregation (see services/sharding.py)
+    aggregation_sharding: bool = True  # Off: each API worker aggregates its own ingests
+    aggregation_in_api: bool = True  # API workers join the ring; off: only jobs.aggregation_worker
+    
+    # Raw Reading Archive (jobs.archive_readings moves older readings to Parquet)
+    archive_dir: str = "archive"  # Archives days older than max_signal_age_days
+    
+    # Offline Region Packs (written by jobs.export_region_packs, served at /packs/)
+    region_pack_dir: str = "packs"
+    
+    # Local Cache (per-worker L1 in front of Redis for navigation; see services/cache.py)
+    local_cache_max_entries: int = 2000  # Per cache (vector, heatmap, outages); 0 disables
+    local_cache_max_bytes: int = 32 * 1024 * 1024  # Per cache, serialized size
+    local_cache_seconds: float = 5.0  # Longest an entry is served without asking Redis
+    
+    # Outage Detection
+    outage_navigation_penalty: bool = True  # Navigation avoids areas with active outages
+    
+    # Debug (adds X-DB-* query trace headers to responses)
+    debug: bool = False
+    sql_echo: bool = False  # Print every SQL statement (SQLAlchemy echo); very slow
+    
+    # Query Tracing (see db/tracing.py)
+    query_trace_enabled: bool = True
+    query_trace_log_ms: float = 500.0  # Log requests spending this long in the database
+    n_plus_one_threshold: int = 10  # Same statement this often in one request is flagged
+    slow_query_ms: float = 200.0
+    slow_query_sample_rate: float = 1.0  # Fraction of slow queries written to the log
+    
+    # Traffic Capture (sampled, anonymized requests for benchmarks/load/replay.py; off when unset)
+    traffic_capture_dir: Optional[str] = None
+    traffic_capture_sample_rate: float = 0.05
+    
+    # Metrics (GET /metrics); off: no per-request HTTP series, the other hooks still record
+    metrics_enabled: bool = True
+    
+    # Rate Limiting (per token subject, else client IP; see services/ratelimit.py)
+    rate_limit_enabled: bool = True
+    rate_limit_per_minute: int = 60  # Routes not listed below
+    rate_limit_routes: str = "/api/v1/ingest/=60,/api/v1/navigate/=120"  # prefix=per_minute,...
+    rate_limit_trusted_proxies: str = ""  # Load balancer IPs/CIDRs whose X-Forwarded-For is believed
     
     @property
     def cors_origins_list(self) -> List[str]:
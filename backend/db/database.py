@@ -1,20 +1,51 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import text
+from sqlalchemy import event, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from config import settings
+from db.tracing import instrument_engine
+from services.metrics import registry, db_pool_checkout_wait, db_pool_events, redis_command_duration, redis_errors
+from redis.asyncio.client import Pipeline
 import redis.asyncio as aioredis
+import asyncio
+import time
 
 # SQLAlchemy Base
 Base = declarative_base()
 
-# Async Engine
+
+def _instrumented_pool(engine_label: str):
+    """Queue pool class that records how long checkouts wait for a connection"""
+    wait = db_pool_checkout_wait.labels(engine_label)
+    
+    class InstrumentedPool(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                wait.observe(time.perf_counter() - start)
+    
+    return InstrumentedPool
+
+
+def _count_pool_events(engine, engine_label: str) -> None:
+    """Count checkouts, checkins and connection churn via SQLAlchemy pool events"""
+    for event_name in ("checkout", "checkin", "connect", "invalidate"):
+        child = db_pool_events.labels(engine_label, event_name)
+        event.listen(engine.sync_engine, event_name, lambda *args, child=child: child.inc())
+
+# Async Engine (primary, handles all writes)
 engine = create_async_engine(
     settings.database_url,
-    echo=True,
+    echo=settings.sql_echo,
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    poolclass=_instrumented_pool("primary")
 )
+_count_pool_events(engine, "primary")
+instrument_engine(engine)
 
 # Session Factory
 AsyncSessionLocal = async_sessionmaker(
@@ -23,15 +54,135 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
+# Read-only replica engine (None when no replica is configured)
+read_engine = None
+ReadSessionLocal = None
+
+if settings.database_replica_url:
+    read_engine = create_async_engine(
+        settings.database_replica_url,
+        echo=settings.sql_echo,
+        pool_pre_ping=True,
+        pool_size=settings.replica_pool_size,
+        max_overflow=settings.replica_max_overflow,
+        poolclass=_instrumented_pool("replica")
+    )
+    _count_pool_events(read_engine, "replica")
+    instrument_engine(read_engine)
+    ReadSessionLocal = async_sessionmaker(
+        read_engine,
+        class_=AsyncSession,
+        expire_on_commit=False
+    )
+
+
+
+class _InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        except Exception:
+            redis_errors.labels("PIPELINE").inc()
+            raise
+        finally:
+            redis_command_duration.labels("PIPELINE").observe(time.perf_counter() - start)
+
+
+class InstrumentedRedis(aioredis.Redis):
+    """Redis client recording round-trip time per command (pipelines as PIPELINE)"""
+    
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        except Exception:
+            redis_errors.labels(str(args[0])).inc()
+            raise
+        finally:
+            redis_command_duration.labels(str(args[0])).observe(time.perf_counter() - start)
+    
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> Pipeline:
+        return _InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
 # Redis Connection Pool
 redis_pool = None
 
 
+class ReplicaMonitor:
+    """
+    Tracks replica replication lag so reads can fall back to the primary
+    
+    Lag is measured at most once per `replica_lag_check_seconds` and shared
+    by all requests in the worker. A replica that is unreachable, not
+    streaming from the primary, or further behind than
+    `replica_max_lag_seconds` is treated as unhealthy until the next check.
+    """
+    
+    # Zero when the replica has replayed everything it received, otherwise
+    # the age of the last replayed transaction. A standalone database (not
+    # in recovery) reports zero. NULL when no WAL receiver is streaming: a
+    # disconnected replica has replayed all it received too, but that says
+    # nothing about the primary. (Without pg_read_all_stats the status
+    # column reads NULL; the receiver's existence still counts.)
+    LAG_QUERY = text("""
+        SELECT CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN NOT EXISTS (
+                SELECT 1 FROM pg_stat_wal_receiver WHERE COALESCE(status, 'streaming') = 'streaming'
+            ) THEN NULL
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END
+    """)
+    
+    def __init__(self):
+        self.lag_seconds = None
+        self.healthy = False
+        self.checked_at = 0.0
+        self._lock = asyncio.Lock()
+    
+    async def is_usable(self) -> bool:
+        """Return True if reads may be routed to the replica"""
+        if time.monotonic() - self.checked_at < settings.replica_lag_check_seconds:
+            return self.healthy
+        
+        async with self._lock:
+            # Another request refreshed the measurement while we waited
+            if time.monotonic() - self.checked_at < settings.replica_lag_check_seconds:
+                return self.healthy
+            
+            try:
+                async with read_engine.connect() as conn:
+                    lag = (await conn.execute(self.LAG_QUERY)).scalar()
+                if lag is None:
+                    if self.healthy or self.checked_at == 0.0:
+                        print("Replica is not streaming from the primary, routing reads to primary")
+                    self.lag_seconds = None
+                    self.healthy = False
+                else:
+                    self.lag_seconds = float(lag)
+                    self.healthy = self.lag_seconds <= settings.replica_max_lag_seconds
+            except Exception as e:
+                print(f"Replica lag check failed, routing reads to primary: {e}")
+                self.lag_seconds = None
+                self.healthy = False
+            
+            self.checked_at = time.monotonic()
+            return self.healthy
+
+
+replica_monitor = ReplicaMonitor()
+
+
 async def get_redis():
     """Get Redis connection from pool"""
     global redis_pool
     if redis_pool is None:
-        redis_pool = aioredis.from_url(
+        redis_pool = InstrumentedRedis.from_url(
             settings.redis_url,
             encoding="utf-8",
             decode_responses=True
@@ -40,7 +191,7 @@ async def get_redis():
 
 
 async def get_db():
-    """Dependency for database sessions"""
+    """Dependency for database sessions (primary, read-write)"""
     async with AsyncSessionLocal() as session:
         try:
             yield session
@@ -48,12 +199,61 @@ async def get_db():
             await session.close()
 
 
-async def init_db():
-    """Initialize database tables"""
-    async with engine.begin() as conn:
-        # Enable PostGIS extension
-        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS postgis"))
-        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pgcrypto"))
-        
-        # Create tables
-        await conn.run_sync(Base.metadata.create_all)
+async def get_read_db():
+    """
+    Dependency for read-only database sessions
+    
+    Routes to the replica when one is configured and within the allowed
+    lag, otherwise to the primary. Never use it for endpoints that write.
+    """
+    session_factory = AsyncSessionLocal
+    if read_engine is not None and await replica_monitor.is_usable():
+        session_factory = ReadSessionLocal
+    
+    async with session_factory() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+def _pool_stats(pool) -> dict:
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow()
+    }
+
+
+def get_pool_stats() -> dict:
+    """Connection pool usage per engine, for sizing pools"""
+    stats = {"primary": _pool_stats(engine.pool)}
+    
+    if read_engine is not None:
+        stats["replica"] = {
+            **_pool_stats(read_engine.pool),
+            "healthy": replica_monitor.healthy,
+            "lag_seconds": replica_monitor.lag_seconds
+        }
+    
+    return stats
+
+
+def _pool_connection_counts() -> dict:
+    return {
+        (engine_label, state): value
+        for engine_label, stats in get_pool_stats().items()
+        for state, value in stats.items()
+        if state in ("checked_in", "checked_out", "overflow")
+    }
+
+
+# Read at scrape time from the pools themselves
+registry.gauge(
+    "signaltrail_db_pool_connections",
+    "Pooled connections by state",
+    ("engine", "state"),
+    collect=_pool_connection_counts
+)
+
@@ -0,0 +1,211 @@
+"""
+Lean read path for the hottest navigation queries
+
+Bypasses SQLAlchemy compilation and ORM hydration: queries run directly on
+the session's underlying asyncpg connection, select only the columns the
+caller needs (cast to float8 so asyncpg returns floats, not Decimals) and
+come back as plain tuples. Percentiles are only kept for the blended
+aggregate, so slice and hour-of-week variants return them as NULL. asyncpg prepares each statement once per
+connection and reuses it from its statement cache on later calls.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.tracing import record_query
+from typing import List, NamedTuple, Optional, Tuple
+import time
+
+
+class CellSignal(NamedTuple):
+    """Minimal aggregate row used for navigation"""
+    h3_index: int
+    avg_signal_dbm: float
+    confidence_score: float
+    p10_signal_dbm: Optional[int]
+    median_signal_dbm: Optional[int]
+
+
+BEST_CELL_IN_RANGES = """
+    SELECT a.h3_index, a.avg_signal_dbm::float8, a.confidence_score::float8,
+        a.p10_signal_dbm::int, a.median_signal_dbm::int
+    FROM signal_aggregates a
+    JOIN (SELECT unnest($1::bigint[]) AS low, unnest($2::bigint[]) AS high) r
+        ON a.h3_index BETWEEN r.low AND r.high
+    WHERE a.confidence_score >= $3
+    ORDER BY a.avg_signal_dbm DESC
+    LIMIT 1
+"""
+
+CELL_BY_INDEX = """
+    SELECT h3_index, avg_signal_dbm::float8, confidence_score::float8,
+        p10_signal_dbm::int, median_signal_dbm::int
+    FROM signal_aggregates
+    WHERE h3_index = $1
+"""
+
+# Interpolated surface, used when no measured cell qualifies
+BEST_ESTIMATE_IN_RANGES = """
+    SELECT e.h3_index, e.estimated_signal_dbm::float8, e.confidence_score::float8,
+        NULL::int, NULL::int
+    FROM signal_estimates e
+    JOIN (SELECT unnest($1::bigint[]) AS low, unnest($2::bigint[]) AS high) r
+        ON e.h3_index BETWEEN r.low AND r.high
+    WHERE e.confidence_score >= $3
+    ORDER BY e.estimated_signal_dbm DESC
+    LIMIT 1
+"""
+
+# Network type / carrier slice variants: $N, $N+1 are dimension and value
+BEST_SLICE_IN_RANGES = """
+    SELECT s.h3_index, s.avg_signal_dbm::float8, s.confidence_score::float8,
+        NULL::int, NULL::int
+    FROM signal_aggregate_slices s
+    JOIN (SELECT unnest($1::bigint[]) AS low, unnest($2::bigint[]) AS high) r
+        ON s.h3_index BETWEEN r.low AND r.high
+    WHERE s.dimension = $4
+        AND s.dimension_value = $5
+        AND s.confidence_score >= $3
+    ORDER BY s.avg_signal_dbm DESC
+    LIMIT 1
+"""
+
+SLICE_BY_INDEX = """
+    SELECT h3_index, avg_signal_dbm::float8, confidence_score::float8,
+        NULL::int, NULL::int
+    FROM signal_aggregate_slices
+    WHERE dimension = $2
+        AND dimension_value = $3
+        AND h3_index = $1
+"""
+
+# Hour-of-week variants: $N is the 1-based Postgres array position of the slot
+BEST_CELL_IN_RANGES_AT_HOUR = """
+    SELECT a.h3_index,
+        a.hour_of_week_sums[$4]::float8 / a.hour_of_week_counts[$4] AS slot_signal_dbm,
+        a.confidence_score::float8,
+        NULL::int, NULL::int
+    FROM signal_aggregates a
+    JOIN (SELECT unnest($1::bigint[]) AS low, unnest($2::bigint[]) AS high) r
+        ON a.h3_index BETWEEN r.low AND r.high
+    WHERE a.confidence_score >= $3
+        AND a.hour_of_week_counts[$4] > 0
+    ORDER BY slot_signal_dbm DESC
+    LIMIT 1
+"""
+
+CELL_BY_INDEX_AT_HOUR = """
+    SELECT h3_index,
+        hour_of_week_sums[$2]::float8 / hour_of_week_counts[$2],
+        confidence_score::float8,
+        NULL::int, NULL::int
+    FROM signal_aggregates
+    WHERE h3_index = $1
+        AND hour_of_week_counts[$2] > 0
+"""
+
+
+async def _driver_connection(db: AsyncSession):
+    """Get the asyncpg connection behind an AsyncSession"""
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    return raw_connection.driver_connection
+
+
+async def _fetchrow(conn, query: str, *args):
+    """fetchrow, timed for the query trace (asyncpg calls bypass SQLAlchemy's events)"""
+    start = time.perf_counter()
+    try:
+        return await conn.fetchrow(query, *args)
+    finally:
+        record_query(query, args, time.perf_counter() - start)
+
+
+async def fetch_best_cell(
+    db: AsyncSession,
+    ranges: List[Tuple[int, int]],
+    min_confidence: float,
+    hour_slot: Optional[int] = None,
+    dimension: Optional[Tuple[str, str]] = None
+) -> Optional[CellSignal]:
+    """
+    Find the strongest cell within H3 index ranges
+    
+    Args:
+        db: Database session (its connection is reused)
+        ranges: Inclusive (low, high) H3 index ranges
+        min_confidence: Minimum confidence score
+        hour_slot: Optional hour-of-week slot (0-167); ranks cells by the
+            slot's average and skips cells with no readings in it
+        dimension: Optional (dimension, value) aggregate slice to read
+            instead of the blended aggregate (not combinable with hour_slot)
+        
+    Returns:
+        CellSignal of the best cell, or None
+    """
+    conn = await _driver_connection(db)
+    args = [
+        [low for low, _ in ranges],
+        [high for _, high in ranges],
+        min_confidence
+    ]
+    
+    if dimension is not None:
+        row = await _fetchrow(conn, BEST_SLICE_IN_RANGES, *args, *dimension)
+    elif hour_slot is not None:
+        row = await _fetchrow(conn, BEST_CELL_IN_RANGES_AT_HOUR, *args, hour_slot + 1)
+    else:
+        row = await _fetchrow(conn, BEST_CELL_IN_RANGES, *args)
+    return CellSignal(*row) if row else None
+
+
+async def fetch_best_estimate(
+    db: AsyncSession,
+    ranges: List[Tuple[int, int]],
+    min_confidence: float
+) -> Optional[CellSignal]:
+    """
+    Find the strongest interpolated cell within H3 index ranges
+    
+    Args:
+        db: Database session (its connection is reused)
+        ranges: Inclusive (low, high) H3 index ranges
+        min_confidence: Minimum estimate confidence
+        
+    Returns:
+        CellSignal of the best estimate, or None
+    """
+    conn = await _driver_connection(db)
+    row = await _fetchrow(
+        conn,
+        BEST_ESTIMATE_IN_RANGES,
+        [low for low, _ in ranges],
+        [high for _, high in ranges],
+        min_confidence
+    )
+    return CellSignal(*row) if row else None
+
+
+async def fetch_cell(
+    db: AsyncSession,
+    h3_index: int,
+    hour_slot: Optional[int] = None,
+    dimension: Optional[Tuple[str, str]] = None
+) -> Optional[CellSignal]:
+    """
+    Fetch a single cell's signal
+    
+    Args:
+        db: Database session (its connection is reused)
+        h3_index: H3 cell identifier
+        hour_slot: Optional hour-of-week slot (0-167)
+        dimension: Optional (dimension, value) aggregate slice
+        
+    Returns:
+        CellSignal, or None if the cell has no aggregate (for the slot)
+    """
+    conn = await _driver_connection(db)
+    if dimension is not None:
+        row = await _fetchrow(conn, SLICE_BY_INDEX, h3_index, *dimension)
+    elif hour_slot is not None:
+        row = await _fetchrow(conn, CELL_BY_INDEX_AT_HOUR, h3_index, hour_slot + 1)
+    else:
+        row = await _fetchrow(conn, CELL_BY_INDEX, h3_index)
+    return CellSignal(*row) if row else None
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Integer, DECIMAL, CheckConstraint, Index, TIMESTAMP, Date, Text
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy import Column, String, Integer, SmallInteger, BigInteger, DECIMAL, CheckConstraint, Index, TIMESTAMP, Date, Text, text, DDL, event
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from geoalchemy2 import Geography
 from datetime import datetime
 import uuid
@@ -25,6 +25,12 @@ class SignalReading(Base):
         Index('idx_signal_readings_location', 'location', postgresql_using='gist'),
         Index('idx_signal_readings_timestamp', 'timestamp', postgresql_ops={'timestamp': 'DESC'}),
         Index('idx_signal_readings_network_type', 'network_type'),
+        # Incremental hotspot index refresh scans new WiFi readings only
+        Index(
+            'idx_signal_readings_wifi_created_at',
+            'created_at',
+            postgresql_where=text("network_type = 'WiFi' AND ssid_hash IS NOT NULL")
+        ),
     )
 
 
@@ -32,23 +38,101 @@ class SignalAggregate(Base):
     """Aggregated signal data using H3 hexagonal grid"""
     __tablename__ = "signal_aggregates"
     
-    h3_index = Column(String(15), primary_key=True)
+    h3_index = Column(BigInteger, primary_key=True)  # H3 cell as 64-bit integer
     center_location = Column(Geography(geometry_type='POINT', srid=4326), nullable=False)
     avg_signal_dbm = Column(DECIMAL(5, 2), nullable=True)
     max_signal_dbm = Column(Integer, nullable=True)
     min_signal_dbm = Column(Integer, nullable=True)
     sample_count = Column(Integer, default=0)
+    contributor_count = Column(Integer, nullable=True)  # HyperLogLog estimate of distinct devices
     network_type_distribution = Column(JSONB, nullable=True)  # {"4G": 20, "5G": 80}
     confidence_score = Column(DECIMAL(3, 2), nullable=True)  # 0.00 to 1.00
     last_updated = Column(TIMESTAMP(timezone=True), nullable=True)
     data_freshness_hours = Column(Integer, nullable=True)
+    hour_of_week_counts = Column(ARRAY(Integer), nullable=True)  # 168 slots, Monday 00:00 UTC first
+    hour_of_week_sums = Column(ARRAY(Integer), nullable=True)  # Sum of dBm per slot
+    signal_histogram = Column(ARRAY(Integer), nullable=True)  # 101 counts, -120..-20 dBm
+    p10_signal_dbm = Column(SmallInteger, nullable=True)
+    median_signal_dbm = Column(SmallInteger, nullable=True)
+    p90_signal_dbm = Column(SmallInteger, nullable=True)
+    # Transaction that last wrote the row (trigger below), so clients can sync deltas
+    change_xid = Column(BigInteger, server_default=text("(pg_current_xact_id()::text::bigint)"), nullable=False)
     
     __table_args__ = (
         Index('idx_signal_aggregates_location', 'center_location', postgresql_using='gist'),
         Index('idx_signal_aggregates_confidence', 'confidence_score', postgresql_ops={'confidence_score': 'DESC'}),
+        Index('idx_signal_aggregates_last_updated', 'last_updated'),
+        Index('idx_signal_aggregates_change_xid', 'change_xid'),
     )
 
 
+# Stamp change_xid on every write path (ORM merge, bulk updates, raw SQL)
+event.listen(SignalAggregate.__table__, "after_create", DDL("""
+    CREATE OR REPLACE FUNCTION signal_aggregates_stamp_change_xid() RETURNS trigger AS $$
+    BEGIN
+        NEW.change_xid := pg_current_xact_id()::text::bigint;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+"""))
+event.listen(SignalAggregate.__table__, "after_create", DDL("""
+    CREATE TRIGGER signal_aggregates_change_xid
+        BEFORE INSERT OR UPDATE ON signal_aggregates
+        FOR EACH ROW EXECUTE FUNCTION signal_aggregates_stamp_change_xid()
+"""))
+
+
+class SignalAggregateSync(Base):
+    """Heatmap sync state (one row): see migration 0011 and db.queries.sync_version"""
+    __tablename__ = "signal_aggregates_sync"
+    
+    id = Column(SmallInteger, CheckConstraint("id = 1", name="signal_aggregates_sync_single_row"), primary_key=True)
+    reset_version = Column(BigInteger, nullable=False)  # Older `since` values get a full response
+    xid_offset = Column(BigInteger, nullable=False)  # Added to transaction ids to form versions
+
+
+event.listen(SignalAggregateSync.__table__, "after_create", DDL(
+    "INSERT INTO signal_aggregates_sync (id, reset_version, xid_offset) "
+    "VALUES (1, pg_current_xact_id()::text::bigint, 0)"
+))
+
+
+class SignalAggregateSlice(Base):
+    """Aggregated signal for one network type or one carrier within an H3 cell"""
+    __tablename__ = "signal_aggregate_slices"
+    
+    # Slice dimensions
+    NETWORK_TYPE = "network_type"
+    CARRIER = "carrier"
+    
+    # Primary key order lets a filtered area query range-scan one slice by H3 index
+    dimension = Column(String(16), CheckConstraint("dimension IN ('network_type', 'carrier')"), primary_key=True)
+    dimension_value = Column(String(64), primary_key=True)  # Network type or carrier hash
+    h3_index = Column(BigInteger, primary_key=True)
+    avg_signal_dbm = Column(DECIMAL(5, 2), nullable=True)
+    max_signal_dbm = Column(Integer, nullable=True)
+    min_signal_dbm = Column(Integer, nullable=True)
+    sample_count = Column(Integer, default=0)
+    confidence_score = Column(DECIMAL(3, 2), nullable=True)
+    last_updated = Column(TIMESTAMP(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index('idx_signal_aggregate_slices_h3_index', 'h3_index'),
+        Index('idx_signal_aggregate_slices_last_updated', 'last_updated'),
+    )
+
+
+class SignalEstimate(Base):
+    """Interpolated signal for H3 cells without readings (lower confidence)"""
+    __tablename__ = "signal_estimates"
+    
+    h3_index = Column(BigInteger, primary_key=True)
+    estimated_signal_dbm = Column(DECIMAL(5, 2), nullable=False)
+    confidence_score = Column(DECIMAL(3, 2), nullable=False)
+    source_count = Column(Integer, nullable=False)  # Measured cells that contributed
+    computed_at = Column(TIMESTAMP(timezone=True), nullable=False, default=datetime.utcnow)
+
+
 class Expense(Base):
     """Personal expense tracking (isolated from signal data)"""
     __tablename__ = "expenses"
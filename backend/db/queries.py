@@ -0,0 +1,55 @@
+from sqlalchemy import select, func, literal, text, BigInteger
+from sqlalchemy.dialects.postgresql import ARRAY
+from typing import List, NamedTuple, Tuple
+
+# Oldest transaction still running in this snapshot: every write by an
+# older one is committed (or rolled back) and visible to later statements
+SNAPSHOT_XMIN = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+
+def h3_range_table(ranges: List[Tuple[int, int]]):
+    """
+    Build a (low, high) derived table from H3 index ranges
+    
+    The ranges travel as two BIGINT array parameters and are unnested
+    server-side, so an area query binds 2 parameters instead of one per
+    cell. Join it with `column.between(ranges.c.low, ranges.c.high)` to
+    get one B-tree range scan per row.
+    
+    Args:
+        ranges: Inclusive (low, high) pairs from
+            GeospatialService.get_cell_ranges_in_radius
+    
+    Returns:
+        Subquery with columns `low` and `high`
+    """
+    lows = [low for low, _ in ranges]
+    highs = [high for _, high in ranges]
+    
+    return select(
+        func.unnest(literal(lows, ARRAY(BigInteger))).label("low"),
+        func.unnest(literal(highs, ARRAY(BigInteger))).label("high")
+    ).subquery("h3_ranges")
+
+
+class SyncVersion(NamedTuple):
+    version: int  # Hand to clients; rows written after it have change_xid >= version - xid_offset
+    reset_version: int  # `since` values below it can't be served as a delta
+    xid_offset: int
+
+
+async def sync_version(db) -> SyncVersion:
+    """
+    Commit-safe heatmap version, read before the data it describes
+    
+    Versions are snapshot xmins rather than sequence values: a sequence
+    value is taken when a row is written, so a transaction that commits
+    late can land below a version a client already holds. Below xmin
+    nothing is still in flight, so a delta of `change_xid >= since` never
+    misses a commit (rows may be sent twice, which is harmless).
+    """
+    row = (await db.execute(text(f"""
+        SELECT {SNAPSHOT_XMIN} + xid_offset AS version, reset_version, xid_offset
+        FROM signal_aggregates_sync
+    """))).one()
+    return SyncVersion(row.version, row.reset_version, row.xid_offset)
@@ -0,0 +1,97 @@
+"""
+Schema version check at worker startup
+
+Tables, indexes and extensions are created and changed only by Alembic
+migrations (`alembic upgrade head`, once per deploy). A starting worker
+just compares the database's alembic_version with the newest revision in
+migrations/versions: one SELECT instead of CREATE EXTENSION and a
+create_all() that inspects every table.
+
+The newest revision is read from the `revision = ...` lines of the
+migration files; loading Alembic's ScriptDirectory would import every
+migration (and GeoAlchemy2 with them) in every worker.
+"""
+from config import settings
+from db.database import engine
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+from typing import Dict, Optional, Tuple
+import os
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations", "versions")
+
+_ASSIGNMENT = re.compile(r"^(revision|down_revision)\s*=\s*(.+)$", re.MULTILINE)
+_QUOTED = re.compile(r"[\"']([^\"']+)[\"']")
+
+
+def read_revisions(directory: str = MIGRATIONS_DIR) -> Dict[str, Tuple[str, ...]]:
+    """
+    Revision graph of the migration files, without importing them
+    
+    Returns:
+        revision -> revisions it follows (several for merge revisions)
+    """
+    revisions = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            fields = {key: _QUOTED.findall(value) for key, value in _ASSIGNMENT.findall(f.read())}
+        if fields.get("revision"):
+            revisions[fields["revision"][0]] = tuple(fields.get("down_revision", ()))
+    return revisions
+
+
+def head_revision(revisions: Dict[str, Tuple[str, ...]]) -> str:
+    """The one revision no other revision follows"""
+    parents = {parent for down in revisions.values() for parent in down}
+    heads = sorted(set(revisions) - parents)
+    if len(heads) != 1:
+        raise RuntimeError(f"Expected one migration head, found {heads or 'none'}: merge the branches")
+    return heads[0]
+
+
+async def current_revision() -> Optional[str]:
+    """Revision the database is at, or None if it was never migrated"""
+    async with engine.connect() as conn:
+        try:
+            return (await conn.execute(text("SELECT version_num FROM alembic_version"))).scalar()
+        except ProgrammingError:
+            return None  # No alembic_version table
+
+
+async def check_schema() -> str:
+    """
+    Make sure the database has every migration this build expects
+    
+    A database behind the newest migration fails startup (or only warns
+    with SCHEMA_CHECK_STRICT=false); one at a revision this build doesn't
+    know was migrated by a newer build and is accepted, so old workers keep
+    serving during a rolling deploy.
+    
+    Returns:
+        The database's revision
+    
+    Raises:
+        RuntimeError: If the schema is missing or behind (strict mode)
+    """
+    revisions = read_revisions()
+    expected = head_revision(revisions)
+    current = await current_revision()
+    
+    if current == expected:
+        return current
+    if current is not None and current not in revisions:
+        print(f"⚠️ Database schema is at {current}, newer than this build ({expected})")
+        return current
+    
+    state = f"at {current}" if current else "not migrated"
+    message = (
+        f"Database schema is {state}, this build needs {expected}: "
+        "run `alembic upgrade head` (in backend/)"
+    )
+    if settings.schema_check_strict:
+        raise RuntimeError(message)
+    print(f"⚠️ {message}")
+    return current
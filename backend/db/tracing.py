@@ -0,0 +1,195 @@
+"""
+Per-request SQL tracing and the slow-query log
+
+Every statement is timed, whether it goes through SQLAlchemy (cursor
+events on the engines) or straight to asyncpg (db/fastpath.py calls
+record_query). Statements count towards the QueryTrace of the current
+request, held in a context variable set by QueryTraceMiddleware, so
+background tasks and gathered coroutines of the request are included.
+
+A trace keeps the query count, total DB time, the slowest statement and
+how often each statement ran; one statement repeated n_plus_one_threshold
+times in a request is flagged as an N+1 pattern (a query per item of a
+loop, like aggregate_area's per-cell aggregation).
+
+Statements slower than slow_query_ms are written to the slow-query log,
+sampled at slow_query_sample_rate, with parameter values replaced by
+their types. Log records are JSON lines on stdout.
+"""
+from config import settings
+from contextvars import ContextVar
+from services.metrics import db_query_duration, db_n_plus_one_requests
+from sqlalchemy import event
+from typing import Callable, Dict, List, Optional, Tuple
+import json
+import random
+import re
+import time
+
+STATEMENT_PREVIEW_CHARS = 300  # Statements are truncated to this in headers and logs
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _preview(statement: str) -> str:
+    return _WHITESPACE.sub(" ", statement).strip()[:STATEMENT_PREVIEW_CHARS]
+
+
+def redact(parameters) -> object:
+    """
+    Replace parameter values with their type names
+    
+    Args:
+        parameters: Bound parameters as passed to the driver (dict, sequence,
+            or a list of those for executemany)
+    
+    Returns:
+        Same shape with values replaced, e.g. {"lat": "float", "ids": "list[250]"}
+    """
+    if isinstance(parameters, dict):
+        return {key: _redact_value(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: the first row's shape and the row count
+            return {"rows": len(parameters), "first": redact(parameters[0])}
+        return [_redact_value(value) for value in parameters]
+    return _redact_value(parameters)
+
+
+def _redact_value(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (list, tuple, set)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def log_record(record: dict) -> None:
+    """Production sink: one JSON object per line on stdout"""
+    print(json.dumps(record, default=str), flush=True)
+
+
+class QueryTrace:
+    """SQL statistics of one request"""
+    
+    __slots__ = ("count", "total_seconds", "slowest_seconds", "slowest_statement", "statements")
+    
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.statements: Dict[str, int] = {}
+    
+    def add(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+    
+    def repeated(self, threshold: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Statements run at least `threshold` times (likely N+1), most repeated first"""
+        threshold = threshold or settings.n_plus_one_threshold
+        return sorted(
+            ((statement, count) for statement, count in self.statements.items() if count >= threshold),
+            key=lambda item: -item[1]
+        )
+    
+    def headers(self) -> List[Tuple[bytes, bytes]]:
+        """Debug response headers (ASGI form)"""
+        headers = [
+            (b"x-db-query-count", str(self.count).encode()),
+            (b"x-db-time-ms", f"{self.total_seconds * 1000:.1f}".encode()),
+            (b"server-timing", f'db;dur={self.total_seconds * 1000:.1f};desc="{self.count} queries"'.encode()),
+        ]
+        if self.slowest_statement is not None:
+            headers.append((b"x-db-slowest-ms", f"{self.slowest_seconds * 1000:.1f}".encode()))
+            headers.append((b"x-db-slowest-statement", _preview(self.slowest_statement).encode("latin-1", "replace")))
+        repeated = self.repeated()
+        if repeated:
+            statement, count = repeated[0]
+            headers.append((b"x-db-n-plus-one", f"{count}x {_preview(statement)}".encode("latin-1", "replace")))
+        return headers
+    
+    def summary(self, method: str, route: str, status: int, seconds: float) -> dict:
+        return {
+            "event": "request_queries",
+            "method": method,
+            "route": route,
+            "status": status,
+            "duration_ms": round(seconds * 1000, 1),
+            "query_count": self.count,
+            "db_time_ms": round(self.total_seconds * 1000, 1),
+            "slowest_ms": round(self.slowest_seconds * 1000, 1),
+            "slowest_statement": _preview(self.slowest_statement) if self.slowest_statement else None,
+            "n_plus_one": [
+                {"count": count, "statement": _preview(statement)}
+                for statement, count in self.repeated()
+            ],
+        }
+    
+    def should_log(self) -> bool:
+        """Production: log requests with N+1 patterns or a lot of DB time"""
+        if self.count == 0:
+            return False
+        if self.total_seconds * 1000 >= settings.query_trace_log_ms:
+            return True
+        return any(count >= settings.n_plus_one_threshold for count in self.statements.values())
+
+
+current_trace: ContextVar[Optional[QueryTrace]] = ContextVar("query_trace", default=None)
+
+# Where log records go; replace to ship them elsewhere
+sink: Callable[[dict], None] = log_record
+
+
+def record_query(statement: str, parameters, seconds: float, executemany: bool = False) -> None:
+    """
+    Account one executed statement to the current request and the slow-query log
+    
+    Args:
+        statement: SQL as sent to the driver (placeholders, no values)
+        parameters: Bound parameters (only their types are ever logged)
+        seconds: Execution time
+        executemany: Whether parameters holds many rows
+    """
+    db_query_duration.observe(seconds)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(statement, seconds)
+    
+    if seconds * 1000 >= settings.slow_query_ms and random.random() < settings.slow_query_sample_rate:
+        sink({
+            "event": "slow_query",
+            "duration_ms": round(seconds * 1000, 1),
+            "statement": _preview(statement),
+            "parameters": redact(parameters),
+            "executemany": executemany,
+            "in_request": trace is not None,
+        })
+
+
+def finish_request(trace: QueryTrace, method: str, route: str, status: int, seconds: float) -> None:
+    """Count N+1 requests and log the trace if it is worth a line"""
+    if trace.repeated():
+        db_n_plus_one_requests.labels(method, route).inc()
+    if trace.should_log():
+        sink(trace.summary(method, route, status, seconds))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_trace_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_trace_start", None)
+    if start is not None:
+        record_query(statement, parameters, time.perf_counter() - start, executemany)
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement an (async) engine executes"""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,60 @@
+"""
+Run dedicated aggregation workers
+
+Each process joins the aggregation ring (services/sharding.py) and
+aggregates the dirty cells of the shards it owns. Use alongside or
+instead of the API workers (AGGREGATION_IN_API=false); shards rebalance
+as processes start and stop.
+
+Usage (from backend/):
+    python -m jobs.aggregation_worker --processes 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import signal
+
+from services.sharding import AggregationWorker
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def run_worker(concurrency: int) -> None:
+    # Leave the ring cleanly on SIGTERM (e.g. container stop)
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        asyncio.run(AggregationWorker(concurrency=concurrency).run_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+def main(args) -> None:
+    if args.processes == 1:
+        run_worker(args.concurrency)
+        return
+    
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker, args=(args.concurrency,), daemon=True)
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=AggregationWorker.CONCURRENCY,
+                        help="Shards aggregated in parallel per process")
+    main(parser.parse_args())
@@ -0,0 +1,175 @@
+"""
+Move aged raw readings from Postgres to the Parquet archive
+
+Archives whole UTC days older than --older-than-days (default and
+minimum MAX_SIGNAL_AGE_DAYS, the history hotspot indexes bootstrap from
+signal_readings) into <ARCHIVE_DIR>/date=.../parent=.../ and deletes them
+from signal_readings.
+Each day is read and deleted in one transaction; its files stay .pending
+until that transaction commits, and an interrupted run is sorted out on
+the next start (promoted if the rows are gone, removed if not).
+
+Usage (from backend/):
+    python -m jobs.archive_readings
+    python -m jobs.archive_readings --older-than-days 120
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from config import settings
+from services.archive import ARCHIVE_RESOLUTION, SCHEMA, ReadingArchive, build_table
+from services.geospatial import GeospatialService
+
+FLUSH_ROWS = 1_000_000  # Rows buffered per partition before a file is written
+DELETE_BATCH_SIZE = 10000
+
+
+async def recover(engine, archive: ReadingArchive) -> None:
+    """Promote or remove files left pending by an interrupted run"""
+    for path in archive.pending_files():
+        try:
+            ids = pq.read_table(path, columns=["id"]).column("id")
+        except (OSError, pa.ArrowInvalid):
+            ids = []  # Crashed mid-write, before any delete
+        if len(ids) == 0:
+            os.remove(path)
+            continue
+        
+        # A day is deleted in one transaction, so one row tells us whether it committed
+        async with engine.connect() as conn:
+            still_there = (await conn.execute(
+                text("SELECT EXISTS (SELECT 1 FROM signal_readings WHERE id = CAST(:id AS UUID))"),
+                {"id": str(uuid.UUID(bytes=ids[0].as_py()))}
+            )).scalar()
+        if still_there:
+            os.remove(path)
+            print(f"Discarded uncommitted {path}")
+        else:
+            ReadingArchive.commit(path)
+            print(f"Recovered {path}")
+
+
+async def archive_day(engine, archive: ReadingArchive, day) -> tuple:
+    """Archive one UTC day; returns (rows, files, bytes)"""
+    day_start, day_end = ReadingArchive.day_bounds(day)
+    buffers = {}  # parent -> column lists
+    pending = []
+    ids = []
+    
+    def flush(parent: int) -> None:
+        pending.append(archive.write(day, parent, build_table(buffers.pop(parent))))
+    
+    async with engine.begin() as conn:
+        result = await conn.stream(
+            text("""
+                SELECT
+                    id,
+                    ST_Y(location::geometry) AS latitude,
+                    ST_X(location::geometry) AS longitude,
+                    signal_dbm,
+                    network_type,
+                    ssid_hash,
+                    gps_accuracy_meters,
+                    device_id_hash,
+                    carrier_hash,
+                    timestamp,
+                    created_at
+                FROM signal_readings
+                WHERE timestamp >= :day_start AND timestamp < :day_end
+            """),
+            {"day_start": day_start, "day_end": day_end}
+        )
+        async for row in result:
+            h3_index = GeospatialService.lat_lon_to_h3(row.latitude, row.longitude)
+            parent = GeospatialService.get_parent(h3_index, ARCHIVE_RESOLUTION)
+            columns = buffers.get(parent)
+            if columns is None:
+                columns = buffers[parent] = {field.name: [] for field in SCHEMA}
+            
+            columns["id"].append(row.id.bytes)
+            columns["h3_index"].append(h3_index)
+            columns["latitude"].append(row.latitude)
+            columns["longitude"].append(row.longitude)
+            columns["signal_dbm"].append(row.signal_dbm)
+            columns["network_type"].append(row.network_type)
+            columns["ssid_hash"].append(row.ssid_hash)
+            columns["gps_accuracy_meters"].append(
+                float(row.gps_accuracy_meters) if row.gps_accuracy_meters is not None else None
+            )
+            columns["device_id_hash"].append(row.device_id_hash)
+            columns["carrier_hash"].append(row.carrier_hash)
+            columns["timestamp"].append(row.timestamp)
+            columns["created_at"].append(row.created_at)
+            ids.append(row.id)
+            
+            if len(columns["id"]) >= FLUSH_ROWS:
+                flush(parent)
+        
+        for parent in list(buffers):
+            flush(parent)
+        
+        # Delete exactly what was written; late uploads for this day stay for the next run
+        for i in range(0, len(ids), DELETE_BATCH_SIZE):
+            await conn.execute(
+                text("DELETE FROM signal_readings WHERE id = ANY(CAST(:ids AS UUID[]))"),
+                {"ids": ids[i:i + DELETE_BATCH_SIZE]}
+            )
+    
+    size = 0
+    for path in pending:
+        size += os.path.getsize(ReadingArchive.commit(path))
+    return len(ids), len(pending), size
+
+
+async def main(args) -> None:
+    # Workers started after a run would otherwise bootstrap hotspots from less history
+    if args.older_than_days < settings.max_signal_age_days:
+        raise SystemExit(
+            f"--older-than-days must be at least MAX_SIGNAL_AGE_DAYS ({settings.max_signal_age_days})"
+        )
+    
+    engine = create_async_engine(settings.database_url, poolclass=NullPool)
+    archive = ReadingArchive(args.dir)
+    await recover(engine, archive)
+    
+    cutoff_day = (datetime.now(timezone.utc) - timedelta(days=args.older_than_days)).date()
+    async with engine.connect() as conn:
+        oldest = (await conn.execute(text("SELECT MIN(timestamp) FROM signal_readings"))).scalar()
+    if oldest is None or oldest.astimezone(timezone.utc).date() >= cutoff_day:
+        print(f"Nothing older than {cutoff_day} to archive")
+        return
+    
+    day = oldest.astimezone(timezone.utc).date()
+    total_rows = 0
+    total_bytes = 0
+    start = time.perf_counter()
+    while day < cutoff_day:
+        day_started = time.perf_counter()
+        rows, files, size = await archive_day(engine, archive, day)
+        if rows:
+            print(f"{day}: {rows} readings -> {files} files, {size / 1024 / 1024:.1f} MiB "
+                  f"({size / rows:.1f} B/reading) in {time.perf_counter() - day_started:.1f}s")
+        total_rows += rows
+        total_bytes += size
+        day += timedelta(days=1)
+    
+    elapsed = time.perf_counter() - start
+    print(f"Archived {total_rows} readings ({total_bytes / 1024 / 1024:.1f} MiB) in {elapsed:.1f}s")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--older-than-days", type=int, default=settings.max_signal_age_days)
+    parser.add_argument("--dir", default=settings.archive_dir)
+    asyncio.run(main(parser.parse_args()))
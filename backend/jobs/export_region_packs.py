@@ -0,0 +1,91 @@
+"""
+Export offline region packs
+
+Writes each res-5 region's aggregates (cells at or above the heatmap
+confidence threshold) to <REGION_PACK_DIR>/<region>.stpk, served to
+clients from /packs/. Files are replaced atomically, so the static server
+and mmap readers always see a complete pack.
+
+Usage (from backend/):
+    python -m jobs.export_region_packs --lat 40.7128 --lon -74.0060
+    python -m jobs.export_region_packs --all
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+from config import settings
+from db.database import AsyncSessionLocal
+from db.models import SignalAggregate
+from db.queries import sync_version
+from services.geospatial import GeospatialService
+from services.packs import PACK_RESOLUTION, encode_pack, pack_filename, write_pack
+
+
+async def export_region(db, region: int, directory: str) -> int:
+    """Write one region's pack; returns its cell count"""
+    # Version first, so clients can catch up from it with /heatmap?since=
+    data_version = (await sync_version(db)).version
+    
+    low, high = GeospatialService.get_child_range(region)
+    result = await db.execute(
+        select(
+            SignalAggregate.h3_index,
+            SignalAggregate.avg_signal_dbm,
+            SignalAggregate.confidence_score
+        ).where(
+            SignalAggregate.h3_index.between(low, high),
+            SignalAggregate.confidence_score >= GeospatialService.HEATMAP_MIN_CONFIDENCE
+        )
+    )
+    rows = result.all()
+    if not rows:
+        return 0
+    
+    data = encode_pack(
+        np.array([row.h3_index for row in rows], dtype=np.uint64),
+        np.array([float(row.avg_signal_dbm) for row in rows]),
+        np.array([float(row.confidence_score) for row in rows]),
+        data_version=data_version
+    )
+    write_pack(os.path.join(directory, pack_filename(region)), data)
+    return len(rows)
+
+
+async def main(args) -> None:
+    os.makedirs(args.dir, exist_ok=True)
+    
+    async with AsyncSessionLocal() as db:
+        if args.all:
+            result = await db.execute(select(SignalAggregate.h3_index))
+            regions = {
+                GeospatialService.get_parent(h3_index, PACK_RESOLUTION)
+                for h3_index in result.scalars()
+            }
+        else:
+            regions = {GeospatialService.get_parent(
+                GeospatialService.lat_lon_to_h3(args.lat, args.lon), PACK_RESOLUTION
+            )}
+        
+        for region in sorted(regions):
+            start = time.perf_counter()
+            count = await export_region(db, region, args.dir)
+            size = os.path.getsize(os.path.join(args.dir, pack_filename(region))) if count else 0
+            print(f"{pack_filename(region)}: {count} cells, {size / 1024:.1f} KiB "
+                  f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lat", type=float)
+    parser.add_argument("--lon", type=float)
+    parser.add_argument("--all", action="store_true", help="Export every region with aggregates")
+    parser.add_argument("--dir", default=settings.region_pack_dir)
+    args = parser.parse_args()
+    if not args.all and (args.lat is None or args.lon is None):
+        parser.error("pass --lat and --lon, or --all")
+    asyncio.run(main(args))
@@ -0,0 +1,41 @@
+"""
+Rebuild the interpolated signal surface for a region
+
+Estimates every unmeasured res-10 cell in the region from nearby measured
+aggregates (inverse distance weighting) and replaces the region's rows in
+signal_estimates. Meant to run from cron or by hand after a bulk import.
+
+Usage (from backend/):
+    python -m jobs.interpolate_surface --lat 40.7128 --lon -74.0060 --radius 5000
+"""
+import argparse
+import asyncio
+import time
+
+from db.database import AsyncSessionLocal
+from services.interpolation import SignalInterpolator
+
+
+async def main(args) -> None:
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        interpolator = SignalInterpolator(
+            db,
+            max_distance_meters=args.max_distance,
+            power=args.power,
+            min_sources=args.min_sources
+        )
+        written = await interpolator.interpolate_area(args.lat, args.lon, args.radius)
+    
+    print(f"Wrote {written} estimates in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lat", type=float, required=True)
+    parser.add_argument("--lon", type=float, required=True)
+    parser.add_argument("--radius", type=int, default=5000, help="Region radius in meters")
+    parser.add_argument("--max-distance", type=float, default=250, help="IDW search radius in meters")
+    parser.add_argument("--power", type=float, default=2.0, help="IDW distance exponent")
+    parser.add_argument("--min-sources", type=int, default=2)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,344 @@
+"""
+Rebuild signal_aggregates from raw readings in parallel
+
+Run after changing aggregation or confidence logic (deploy the new code
+first). The world is partitioned by H3 parent cell; a process pool rebuilds
+one partition per task with the same SignalAggregator code the API uses,
+each worker holding a single database connection. Results go to shadow
+tables that are swapped in with a rename, so readers never see a
+half-rebuilt table.
+
+Progress is checkpointed to --state-dir after every partition; running the
+same command again resumes where it stopped. --restart discards it.
+
+Usage (from backend/):
+    python -m jobs.reaggregate --workers 8
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import redis.asyncio as aioredis
+from sqlalchemy import Index, MetaData, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.schema import CreateIndex
+
+from config import settings
+from db.models import SignalAggregate, SignalAggregateSlice
+from db.queries import SNAPSHOT_XMIN
+from services.aggregator import SignalAggregator
+from services.geospatial import GeospatialService
+
+PARTITION_RESOLUTION = 7  # ~5 km² per task
+SHADOW_SUFFIX = "_rebuild"
+OLD_SUFFIX = "_old"
+
+# Shadow copies of the live tables (same columns and types, new names)
+_shadow_metadata = MetaData()
+SHADOW_TABLES = {}
+SHADOW_INDEXES = {}  # Live table name -> [(canonical index name, shadow Index)]
+for _model in (SignalAggregate, SignalAggregateSlice):
+    _shadow = _model.__table__.to_metadata(_shadow_metadata, name=_model.__tablename__ + SHADOW_SUFFIX)
+    SHADOW_TABLES[_model.__tablename__] = _shadow
+    
+    # The indexes declared on the model (what the migrations create)
+    SHADOW_INDEXES[_model.__tablename__] = [
+        (index.name, Index(
+            index.name + SHADOW_SUFFIX,
+            *[_shadow.c[column.name] for column in index.columns],
+            _table=_shadow,
+            **index.kwargs
+        ))
+        for index in _model.__table_args__
+        if isinstance(index, Index)
+    ]
+
+SHADOW_AGGREGATES = SHADOW_TABLES[SignalAggregate.__tablename__]
+SHADOW_SLICES = SHADOW_TABLES[SignalAggregateSlice.__tablename__]
+
+# Per-process worker state: event loop, one-connection session factory, Redis
+_worker = {}
+
+
+def _row(obj) -> dict:
+    """Column values of an unsaved ORM object; change_xid comes from its default"""
+    return {
+        column.key: getattr(obj, column.key)
+        for column in obj.__table__.columns
+        if column.key != "change_xid"
+    }
+
+
+def _init_worker(use_contributors: bool) -> None:
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    engine = create_async_engine(settings.database_url, pool_size=1, max_overflow=0)
+    _worker["loop"] = loop
+    _worker["sessions"] = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    _worker["redis"] = aioredis.from_url(settings.redis_url, decode_responses=True) if use_contributors else None
+
+
+def rebuild_partition(partition: str, cells: list, now_iso: str) -> tuple:
+    """Process pool entry point: rebuild one partition into the shadow tables"""
+    return _worker["loop"].run_until_complete(
+        _rebuild_partition(partition, cells, datetime.fromisoformat(now_iso))
+    )
+
+
+async def _rebuild_partition(partition: str, cells: list, now: datetime) -> tuple:
+    start = time.perf_counter()
+    aggregates = []
+    slices = []
+    
+    async with _worker["sessions"]() as db:
+        aggregator = SignalAggregator(db, redis=_worker["redis"])
+        for h3_index in cells:
+            computed = await aggregator.compute_cell(h3_index, now=now)
+            if computed is None:
+                continue
+            aggregate, cell_slices = computed
+            aggregates.append(_row(aggregate))
+            slices.extend(_row(cell_slice) for cell_slice in cell_slices)
+        
+        # One transaction per partition: a crash leaves it either complete or absent
+        if aggregates:
+            await db.execute(insert(SHADOW_AGGREGATES), aggregates)
+        if slices:
+            await db.execute(insert(SHADOW_SLICES), slices)
+        await db.commit()
+    
+    return partition, len(cells), len(aggregates), time.perf_counter() - start
+
+
+async def prepare(engine, partition_resolution: int) -> dict:
+    """Create empty shadow tables and plan the partitions"""
+    now = datetime.now(timezone.utc)
+    
+    async with engine.begin() as conn:
+        # Live writes after this point are merged in at swap time
+        start_xid = (await conn.execute(text(f"SELECT {SNAPSHOT_XMIN}"))).scalar()
+        
+        # No indexes yet: they are built once after loading
+        for name, shadow in SHADOW_TABLES.items():
+            await conn.execute(text(f"DROP TABLE IF EXISTS {shadow.name}"))
+            await conn.execute(text(
+                f"CREATE TABLE {shadow.name} (LIKE {name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            ))
+    
+    # Every cell with readings in the aggregation window, grouped by parent
+    print("Discovering cells with readings...")
+    partitions = {}
+    async with engine.connect() as conn:
+        result = await conn.stream(
+            text("""
+                SELECT DISTINCT ST_Y(location::geometry) AS lat, ST_X(location::geometry) AS lon
+                FROM signal_readings
+                WHERE timestamp >= :cutoff
+            """),
+            {"cutoff": now - timedelta(days=SignalAggregator.WINDOW_DAYS)}
+        )
+        async for row in result:
+            h3_index = GeospatialService.lat_lon_to_h3(row.lat, row.lon)
+            parent = GeospatialService.get_parent(h3_index, partition_resolution)
+            partitions.setdefault(GeospatialService.h3_to_string(parent), set()).add(h3_index)
+    
+    return {
+        "now": now.isoformat(),
+        "start_xid": start_xid,
+        "partitions": {parent: sorted(cells) for parent, cells in partitions.items()}
+    }
+
+
+async def discard_partial(engine, partitions: list) -> None:
+    """Delete rows of partitions that may have committed without being checkpointed"""
+    ranges = [
+        GeospatialService.get_child_range(GeospatialService.string_to_h3(partition))
+        for partition in partitions
+    ]
+    if not ranges:
+        return
+    
+    params = {"lows": [low for low, _ in ranges], "highs": [high for _, high in ranges]}
+    async with engine.begin() as conn:
+        for shadow in SHADOW_TABLES.values():
+            await conn.execute(text(f"""
+                DELETE FROM {shadow.name} t
+                USING (SELECT unnest(CAST(:lows AS BIGINT[])) AS low, unnest(CAST(:highs AS BIGINT[])) AS high) r
+                WHERE t.h3_index BETWEEN r.low AND r.high
+            """), params)
+
+
+async def swap(engine, start_xid: int, keep_old: bool) -> None:
+    """Index the shadow tables, fold in live changes, and rename them into place"""
+    print("Building indexes on shadow tables...")
+    async with engine.begin() as conn:
+        for name, shadow in SHADOW_TABLES.items():
+            pk_columns = ", ".join(column.name for column in shadow.primary_key.columns)
+            await conn.execute(text(
+                f"ALTER TABLE {shadow.name} ADD CONSTRAINT {shadow.name}_pkey PRIMARY KEY ({pk_columns})"
+            ))
+            for _, index in SHADOW_INDEXES[name]:
+                await conn.execute(CreateIndex(index))
+    
+    print("Swapping tables...")
+    aggregate_columns = [
+        column.name for column in SignalAggregate.__table__.columns if column.name != "change_xid"
+    ]
+    slice_columns = ", ".join(column.name for column in SignalAggregateSlice.__table__.columns)
+    
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "LOCK TABLE signal_aggregates, signal_aggregate_slices IN ACCESS EXCLUSIVE MODE"
+        ))
+        
+        # Tables kept by a previous --keep-old run
+        for name in SHADOW_TABLES:
+            await conn.execute(text(f"DROP TABLE IF EXISTS {name}{OLD_SUFFIX}"))
+        
+        # Cells the live aggregator (already running the new code) or the
+        # confidence refresher wrote during the rebuild are at least as fresh
+        await conn.execute(text(f"""
+            INSERT INTO signal_aggregates{SHADOW_SUFFIX} ({", ".join(aggregate_columns)})
+            SELECT {", ".join(aggregate_columns)} FROM signal_aggregates WHERE change_xid >= :start_xid
+            ON CONFLICT (h3_index) DO UPDATE SET
+                {", ".join(f"{column} = EXCLUDED.{column}" for column in aggregate_columns if column != "h3_index")}
+        """), {"start_xid": start_xid})
+        await conn.execute(text(f"""
+            DELETE FROM signal_aggregate_slices{SHADOW_SUFFIX} s
+            USING signal_aggregates a
+            WHERE a.h3_index = s.h3_index AND a.change_xid >= :start_xid
+        """), {"start_xid": start_xid})
+        await conn.execute(text(f"""
+            INSERT INTO signal_aggregate_slices{SHADOW_SUFFIX} ({slice_columns})
+            SELECT {", ".join(f"s.{column.name}" for column in SignalAggregateSlice.__table__.columns)}
+            FROM signal_aggregate_slices s
+            JOIN signal_aggregates a ON a.h3_index = s.h3_index
+            WHERE a.change_xid >= :start_xid
+        """), {"start_xid": start_xid})
+        
+        for name, shadow in SHADOW_TABLES.items():
+            await conn.execute(text(f"ALTER TABLE {name} RENAME TO {name}{OLD_SUFFIX}"))
+            await conn.execute(text(f"ALTER TABLE {shadow.name} RENAME TO {name}"))
+            
+            # Give the new table's indexes the canonical names
+            index_names = [(f"{name}_pkey", f"{shadow.name}_pkey")] + [
+                (canonical, index.name) for canonical, index in SHADOW_INDEXES[name]
+            ]
+            for canonical, shadow_index in index_names:
+                await conn.execute(text(f"ALTER INDEX {canonical} RENAME TO {canonical}{OLD_SUFFIX}"))
+                await conn.execute(text(f"ALTER INDEX {shadow_index} RENAME TO {canonical}"))
+        
+        # The change_xid trigger is per table
+        await conn.execute(text(
+            f"DROP TRIGGER IF EXISTS signal_aggregates_change_xid ON signal_aggregates{OLD_SUFFIX}"
+        ))
+        await conn.execute(text("""
+            CREATE TRIGGER signal_aggregates_change_xid
+                BEFORE INSERT OR UPDATE ON signal_aggregates
+                FOR EACH ROW EXECUTE FUNCTION signal_aggregates_stamp_change_xid()
+        """))
+        
+        # Rebuilt rows carry the rebuild's transaction ids, older than versions
+        # clients read meanwhile: send every client a full heatmap once
+        await conn.execute(text(
+            "UPDATE signal_aggregates_sync SET reset_version = pg_current_xact_id()::text::bigint + xid_offset"
+        ))
+        
+        if not keep_old:
+            for name in SHADOW_TABLES:
+                await conn.execute(text(f"DROP TABLE {name}{OLD_SUFFIX}"))
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+async def main(args) -> None:
+    engine = create_async_engine(settings.database_url, poolclass=NullPool)
+    plan_path = os.path.join(args.state_dir, "plan.json")
+    done_path = os.path.join(args.state_dir, "done.log")
+    
+    if args.restart and os.path.isdir(args.state_dir):
+        shutil.rmtree(args.state_dir)
+    
+    done = set()
+    if os.path.exists(plan_path):
+        with open(plan_path) as f:
+            plan = json.load(f)
+        if os.path.exists(done_path):
+            with open(done_path) as f:
+                done = {line.strip() for line in f if line.strip()}
+        pending = [partition for partition in plan["partitions"] if partition not in done]
+        print(f"Resuming: {len(done)} partitions done, {len(pending)} to go")
+        await discard_partial(engine, pending)
+    else:
+        os.makedirs(args.state_dir, exist_ok=True)
+        plan = await prepare(engine, args.partition_resolution)
+        _write_json(plan_path, plan)
+        pending = list(plan["partitions"])
+    
+    # Largest partitions first so the pool doesn't end waiting on one straggler
+    pending.sort(key=lambda partition: len(plan["partitions"][partition]), reverse=True)
+    total_cells = sum(len(cells) for cells in plan["partitions"].values())
+    pending_cells = sum(len(plan["partitions"][partition]) for partition in pending)
+    print(f"{len(plan['partitions'])} partitions, {total_cells} cells; "
+          f"{len(pending)} partitions ({pending_cells} cells) to rebuild with {args.workers} workers")
+    
+    start = time.perf_counter()
+    cells_done = 0
+    written = 0
+    with open(done_path, "a") as done_log, ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(not args.skip_contributors,)
+    ) as pool:
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(pool, rebuild_partition, partition, plan["partitions"][partition], plan["now"])
+            for partition in pending
+        ]
+        for index, future in enumerate(asyncio.as_completed(futures), start=1):
+            partition, cell_count, aggregate_count, seconds = await future
+            done_log.write(partition + "\n")
+            done_log.flush()
+            os.fsync(done_log.fileno())
+            
+            cells_done += cell_count
+            written += aggregate_count
+            elapsed = time.perf_counter() - start
+            rate = cells_done / elapsed if elapsed else 0
+            eta = (pending_cells - cells_done) / rate if rate else 0
+            print(f"[{index}/{len(pending)}] {partition}: {aggregate_count}/{cell_count} cells in {seconds:.1f}s | "
+                  f"{cells_done}/{pending_cells} cells, {rate:,.0f} cells/s, ETA {eta / 60:.1f} min")
+    
+    print(f"Rebuilt {written} aggregates in {time.perf_counter() - start:.1f}s")
+    await swap(engine, plan["start_xid"], args.keep_old)
+    await engine.dispose()
+    
+    shutil.rmtree(args.state_dir)
+    print("Swapped rebuilt aggregates into place")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--partition-resolution", type=int, default=PARTITION_RESOLUTION)
+    parser.add_argument("--state-dir", default="reaggregate-state", help="Checkpoint directory")
+    parser.add_argument("--restart", action="store_true", help="Discard checkpoints and start over")
+    parser.add_argument("--keep-old", action="store_true", help="Keep the previous tables as *_old")
+    parser.add_argument("--skip-contributors", action="store_true",
+                        help="Don't read distinct-contributor counts from Redis")
+    asyncio.run(main(parser.parse_args()))
@@ -1,20 +1,66 @@
 from fastapi import FastAPI
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from config import settings
-from db.database import init_db
-from api import ingestion, navigation, expenses
+from db.database import get_pool_stats
+from db.schema import check_schema
+from api import ingestion, navigation, expenses, outages
+from services.scheduler import ConfidenceRefresher
+from services.hotspots import hotspot_index
+from services.cache import cache_invalidator
+from services.sharding import AggregationWorker
+from services.metrics import registry
+from middleware.metrics import MetricsMiddleware
+from middleware.query_trace import QueryTraceMiddleware
+from middleware.capture import TrafficCaptureMiddleware
+from middleware.ratelimit import RateLimitMiddleware
+from middleware.auth import shared_revocations
+from services.traffic import TrafficCapture
+import asyncio
+
+# Sampled traffic for benchmarks/load/replay.py (opt-in)
+traffic_capture = None
+if settings.traffic_capture_dir:
+    traffic_capture = TrafficCapture(settings.traffic_capture_dir, settings.traffic_capture_sample_rate)
 
 # Lifespan context manager for startup/shutdown
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Initializing SignalTrail API...")
-    await init_db()
-    print("✅ Database initialized")
+    # Schema changes are Alembic migrations, run once per deploy, not per worker
+    revision = await check_schema()
+    print(f"✅ Database schema at {revision}")
+    
+    # Periodic re-scoring of aggregates whose confidence decayed
+    refresher_task = asyncio.create_task(ConfidenceRefresher().run_forever())
+    
+    # Per-worker WiFi hotspot index, kept current from new readings
+    hotspot_task = asyncio.create_task(hotspot_index.run_forever())
+    
+    # Drops local cache entries other workers invalidated (local caches are off until subscribed)
+    invalidator_task = asyncio.create_task(cache_invalidator.run_forever())
+    
+    # Applies token revocations made by other workers
+    revocations_task = asyncio.create_task(shared_revocations.run_forever())
+    
+    # Aggregate dirty cells of the shards this worker owns
+    aggregation_task = None
+    if settings.aggregation_sharding and settings.aggregation_in_api:
+        aggregation_task = asyncio.create_task(AggregationWorker().run_forever())
     yield
-    # Shutdown
+    # Shutdown: wait for every loop to unwind (releasing leases, closing subscriptions)
+    tasks = [refresher_task, hotspot_task, invalidator_task, revocations_task]
+    if aggregation_task:
+        tasks.append(aggregation_task)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if traffic_capture:
+        traffic_capture.close()
     print("👋 Shutting down SignalTrail API")
 
 
@@ -26,6 +72,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Per-client budgets; added first so 429s still get CORS headers
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -38,10 +88,26 @@ app.add_middleware(
 # Add GZIP compression
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
+# Per-request SQL trace: debug headers, N+1 / slow request log
+if settings.query_trace_enabled:
+    app.add_middleware(QueryTraceMiddleware)
+
+# Capture sees the original status and latency of each sampled request
+if traffic_capture:
+    app.add_middleware(TrafficCaptureMiddleware, capture=traffic_capture)
+
+# Request counts and latency per route, outermost so it times the whole stack
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(ingestion.router)
 app.include_router(navigation.router)
 app.include_router(expenses.router)
+app.include_router(outages.router)
+
+# Offline region packs (static files with ETag / Last-Modified, see REGION_PACK_FORMAT.md)
+app.mount("/packs", StaticFiles(directory=settings.region_pack_dir, check_dir=False), name="packs")
 
 
 @app.get("/")
@@ -64,6 +130,21 @@ async def health_check():
     }
 
 
+@app.get("/health/db")
+async def database_health():
+    """Connection pool usage per engine (primary and read replica)"""
+    return {
+        "status": "healthy",
+        "pools": get_pool_stats()
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (this worker process only)"""
+    return Response(registry.render(), media_type=registry.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,12 +1,247 @@
 from fastapi import Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Optional
-import jwt
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
 from config import settings
+from db.database import get_redis
+import asyncio
+import hashlib
+import json
+import time
 
 security = HTTPBearer()
 
 
+class TokenCache:
+    """
+    Verified JWT claims, so a token reused for hours is decoded once
+    
+    Keyed by a digest of the token (tokens themselves are not kept).
+    Entries live until the token's `exp` or `ttl_seconds`, whichever comes
+    first, and the least recently used entry is dropped when full. A
+    cached token is only as valid as at verification, so revocation goes
+    through here: revoke() denies one token, revoke_subject() every token
+    of a subject issued before now, and the denials and revocation checks
+    run on every verification, cached or not. Subject revocation goes by
+    `iat`, so tokens issued without one can only be revoked one by one.
+    Both only affect this worker; SharedRevocations spreads them to the
+    others.
+    """
+    
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+        self._revoked_before: Dict[str, float] = {}  # sub -> tokens issued earlier are invalid
+        self._revoked_tokens: Dict[str, float] = {}  # token id -> its exp (denial kept until then)
+        self._prune_at = 1024
+        self._revocation_checks: List[Callable[[dict], bool]] = []
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+    
+    @staticmethod
+    def token_id(token: str, claims: dict) -> str:
+        """Denylist id of a token: its jti, else the token's digest"""
+        jti = claims.get("jti")
+        return f"jti:{jti}" if jti else f"key:{TokenCache._key(token).hex()}"
+    
+    def get(self, token: str) -> Optional[dict]:
+        """Cached claims, or None if unknown or past their expiry"""
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        claims, expires_at = entry
+        if time.time() >= expires_at:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return claims
+    
+    def put(self, token: str, claims: dict) -> None:
+        if self.max_entries <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if "exp" in claims:
+            expires_at = min(expires_at, float(claims["exp"]))
+        key = self._key(token)
+        self._entries[key] = (claims, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def revoke(self, token: str) -> Tuple[str, float]:
+        """
+        Reject one token from now on
+        
+        Returns:
+            Tuple of (token id, time the denial can be dropped: the token's exp)
+        """
+        entry = self._entries.pop(self._key(token), None)
+        if entry is not None:
+            claims = entry[0]
+        else:
+            from jose import jwt
+            claims = jwt.get_unverified_claims(token)
+        token_id = self.token_id(token, claims)
+        expires_at = float(claims.get("exp", time.time() + settings.auth_revocation_retention_seconds))
+        self.deny_token(token_id, expires_at)
+        return token_id, expires_at
+    
+    def deny_token(self, token_id: str, expires_at: float) -> None:
+        """Reject the token with this id until expires_at"""
+        self._revoked_tokens[token_id] = max(expires_at, self._revoked_tokens.get(token_id, 0.0))
+        if len(self._revoked_tokens) >= self._prune_at:
+            self.prune()
+    
+    def revoke_subject(self, subject: str) -> float:
+        """
+        Reject every token of a subject issued until now (logout everywhere, role change)
+        
+        Returns:
+            The revocation time
+        """
+        revoked_before = time.time()
+        self.deny_subject(subject, revoked_before)
+        return revoked_before
+    
+    def deny_subject(self, subject: str, revoked_before: float) -> None:
+        """Reject the subject's tokens with an `iat` at or before revoked_before"""
+        if revoked_before <= self._revoked_before.get(subject, 0.0):
+            return
+        self._revoked_before[subject] = revoked_before
+        for key, (claims, _) in list(self._entries.items()):
+            if claims.get("sub") == subject:
+                del self._entries[key]
+    
+    def prune(self, now: float = None) -> None:
+        """Drop denials of expired tokens and subject revocations past retention"""
+        now = now or time.time()
+        self._revoked_tokens = {
+            token_id: expires_at for token_id, expires_at in self._revoked_tokens.items() if expires_at > now
+        }
+        retained_after = now - settings.auth_revocation_retention_seconds
+        self._revoked_before = {
+            subject: revoked_before for subject, revoked_before in self._revoked_before.items()
+            if revoked_before > retained_after
+        }
+        self._prune_at = max(1024, 2 * len(self._revoked_tokens))
+    
+    def add_revocation_check(self, check: Callable[[dict], bool]) -> None:
+        """Register check(claims) -> True if the token must be rejected"""
+        self._revocation_checks.append(check)
+    
+    def is_revoked(self, token: str, claims: dict) -> bool:
+        revoked_before = self._revoked_before.get(claims.get("sub"))
+        if revoked_before is not None and "iat" in claims and float(claims["iat"]) <= revoked_before:
+            return True
+        if self._revoked_tokens and self.token_id(token, claims) in self._revoked_tokens:
+            return True
+        return any(check(claims) for check in self._revocation_checks)
+    
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+token_cache = TokenCache(settings.auth_token_cache_size, settings.auth_token_cache_seconds)
+
+
+class SharedRevocations:
+    """
+    Token and subject revocations shared by every worker through Redis
+    
+    Denied token ids are kept in a sorted set scored by the token's exp,
+    revoked subjects in one scored by the revocation time (kept for
+    auth_revocation_retention_seconds). Each worker loads both once
+    subscribed and applies later revocations from CHANNEL to its
+    TokenCache, so verification stays a local lookup.
+    """
+    
+    TOKENS_KEY = "auth:revoked:tokens"
+    SUBJECTS_KEY = "auth:revoked:subjects"
+    CHANNEL = "auth:revocations"
+    RECONNECT_SECONDS = 1.0
+    
+    def __init__(self, cache: TokenCache):
+        self.cache = cache
+        self.listening = False
+    
+    async def revoke(self, redis, token: str) -> None:
+        """Reject one token in every worker"""
+        token_id, expires_at = self.cache.revoke(token)
+        pipe = redis.pipeline(transaction=False)
+        pipe.zadd(self.TOKENS_KEY, {token_id: expires_at}, gt=True)
+        pipe.publish(self.CHANNEL, json.dumps({"t": token_id, "e": expires_at}))
+        await pipe.execute()
+    
+    async def revoke_subject(self, redis, subject: str) -> None:
+        """Reject every token of a subject issued until now, in every worker"""
+        revoked_before = self.cache.revoke_subject(subject)
+        pipe = redis.pipeline(transaction=False)
+        pipe.zadd(self.SUBJECTS_KEY, {subject: revoked_before}, gt=True)
+        pipe.publish(self.CHANNEL, json.dumps({"s": subject, "b": revoked_before}))
+        await pipe.execute()
+    
+    def apply(self, data: str) -> None:
+        """Apply one revocation message"""
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return
+        if "t" in message:
+            self.cache.deny_token(message["t"], float(message["e"]))
+        elif "s" in message:
+            self.cache.deny_subject(message["s"], float(message["b"]))
+    
+    async def load(self, redis) -> None:
+        """Apply every stored revocation (dropping expired ones from Redis)"""
+        now = time.time()
+        pipe = redis.pipeline(transaction=False)
+        pipe.zremrangebyscore(self.TOKENS_KEY, "-inf", now)
+        pipe.zremrangebyscore(self.SUBJECTS_KEY, "-inf", now - settings.auth_revocation_retention_seconds)
+        pipe.zrange(self.TOKENS_KEY, 0, -1, withscores=True)
+        pipe.zrange(self.SUBJECTS_KEY, 0, -1, withscores=True)
+        _, _, tokens, subjects = await pipe.execute()
+        for token_id, expires_at in tokens:
+            self.cache.deny_token(token_id, expires_at)
+        for subject, revoked_before in subjects:
+            self.cache.deny_subject(subject, revoked_before)
+    
+    async def run_forever(self, redis=None) -> None:
+        """Subscribe to CHANNEL, load stored revocations and apply messages, resubscribing after errors"""
+        redis = redis or await get_redis()
+        while True:
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                # Subscribe before loading, so nothing revoked in between is missed
+                await pubsub.subscribe(self.CHANNEL)
+                await self.load(redis)
+                self.listening = True
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.apply(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Revocation subscription lost, other workers' revocations delayed: {e}")
+            finally:
+                self.listening = False
+                await asyncio.shield(pubsub.aclose())
+            
+            await asyncio.sleep(self.RECONNECT_SECONDS)
+
+
+# Shared per-process subscriber (started in main.py's lifespan)
+shared_revocations = SharedRevocations(token_cache)
+
+
 class AuthMiddleware:
     """
     Authentication middleware using JWT tokens
@@ -21,30 +256,43 @@ class AuthMiddleware:
         
         Args:
             token: JWT token string
-            
+        
         Returns:
             Decoded token payload
-            
+        
         Raises:
             HTTPException: If token is invalid
         """
-        try:
-            payload = jwt.decode(
-                token,
-                settings.secret_key,
-                algorithms=["HS256"]
-            )
-            return payload
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token has expired"
-            )
-        except jwt.JWTError:
+        # Claims of a token verified earlier (expiry is checked by the cache)
+        payload = token_cache.get(token)
+        if payload is None:
+            # jose (and its cryptography backend) loads on first use, not at worker start
+            from jose import jwt, JWTError, ExpiredSignatureError
+            try:
+                payload = jwt.decode(
+                    token,
+                    settings.secret_key,
+                    algorithms=["HS256"]
+                )
+            except ExpiredSignatureError:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Token has expired"
+                )
+            except JWTError:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Could not validate credentials"
+                )
+            token_cache.put(token, payload)
+        
+        if token_cache.is_revoked(token, payload):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials"
+                detail="Token has been revoked"
             )
+        # Callers get their own copy; the cached claims stay as verified
+        return dict(payload)
     
     @staticmethod
     async def get_current_user(
@@ -89,7 +337,7 @@ class AuthMiddleware:
         
         Args:
             user: User payload from token
-            
+        
         Returns:
             True if admin, raises exception otherwise
         """
@@ -0,0 +1,64 @@
+from services.traffic import TrafficCapture, MAX_BODY_BYTES
+import random
+import time
+
+# Traffic worth replaying; everything else passes straight through
+CAPTURE_PREFIXES = ("/api/v1/ingest/", "/api/v1/navigate/")
+
+
+class TrafficCaptureMiddleware:
+    """
+    Samples ingest and navigation requests into a TrafficCapture (opt-in)
+    
+    Unsampled requests cost a prefix check and one random number. Sampled
+    ones have their body copied as it is read and are queued with the
+    response status and latency once the response is sent.
+    """
+    
+    def __init__(self, app, capture: TrafficCapture):
+        self.app = app
+        self.capture = capture
+    
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith(CAPTURE_PREFIXES)
+            or random.random() >= self.capture.sample_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+        
+        chunks = []
+        body_size = 0
+        status_code = 500
+        
+        async def receive_and_copy():
+            nonlocal body_size
+            message = await receive()
+            if message["type"] == "http.request" and body_size <= MAX_BODY_BYTES:
+                chunk = message.get("body", b"")
+                chunks.append(chunk)
+                body_size += len(chunk)
+            return message
+        
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        received_at = time.time()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_and_copy, send_with_status)
+        finally:
+            self.capture.record(
+                received_at,
+                scope["method"],
+                scope["path"],
+                getattr(scope.get("route"), "path", None),
+                scope.get("query_string", b""),
+                b"".join(chunks) if body_size <= MAX_BODY_BYTES else b"",
+                status_code,
+                time.perf_counter() - start
+            )
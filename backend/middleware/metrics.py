@@ -0,0 +1,47 @@
+from services.metrics import http_requests, http_request_duration
+import time
+
+
+class MetricsMiddleware:
+    """
+    Request count and latency per route template (pure ASGI, no per-request objects)
+    
+    The route is read after the router has matched it, so `/api/v1/navigate/vector`
+    is one series however the query string varies; unmatched paths share one
+    label to keep scanners from inflating the series count.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        # (method, route, status) -> (duration histogram, request counter)
+        self._series = {}
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500  # If the app raises before sending a response
+        
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            key = (scope["method"], getattr(route, "path", None) or "unmatched", status_code)
+            series = self._series.get(key)
+            if series is None:
+                method, path, _ = key
+                series = self._series[key] = (
+                    http_request_duration.labels(method, path),
+                    http_requests.labels(method, path, str(status_code))
+                )
+            series[0].observe(elapsed)
+            series[1].inc()
@@ -0,0 +1,42 @@
+from config import settings
+from db.tracing import QueryTrace, current_trace, finish_request
+import time
+
+
+class QueryTraceMiddleware:
+    """
+    Collects the SQL trace of each request (see db/tracing.py)
+    
+    In debug mode the trace goes out as X-DB-* and Server-Timing response
+    headers (queries run after the response starts, e.g. in background
+    tasks, only reach the log). Otherwise requests with an N+1 pattern or
+    more than query_trace_log_ms of DB time are written to the log sink.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        trace = QueryTrace()
+        token = current_trace.set(trace)
+        status_code = 500
+        
+        async def send_with_trace(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.debug:
+                    message = {**message, "headers": list(message.get("headers", [])) + trace.headers()}
+            await send(message)
+        
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            current_trace.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            finish_request(trace, scope["method"], route, status_code, time.perf_counter() - start)
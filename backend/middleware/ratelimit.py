@@ -0,0 +1,52 @@
+from config import settings
+from services.metrics import rate_limit_decisions
+from services.ratelimit import (
+    RateLimiter, client_identity, match_budget, parse_networks, parse_route_budgets, retry_after_header
+)
+import json
+
+
+class RateLimitMiddleware:
+    """
+    Enforces per-client request budgets on /api/ routes (see services/ratelimit.py)
+    
+    Budgets come from RATE_LIMIT_ROUTES ("prefix=per_minute,...", longest
+    prefix wins) and default to RATE_LIMIT_PER_MINUTE. Clients over budget
+    get 429 with Retry-After before any body is read or query is run.
+    """
+    
+    def __init__(self, app, limiter: RateLimiter = None):
+        self.app = app
+        self.limiter = limiter or RateLimiter()
+        self.budgets = parse_route_budgets(settings.rate_limit_routes)
+        self.trusted_proxies = parse_networks(settings.rate_limit_trusted_proxies)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        
+        identity = client_identity(scope, dict(scope["headers"]), self.trusted_proxies)
+        if identity is None:
+            await self.app(scope, receive, send)
+            return
+        
+        group, per_minute = match_budget(scope["path"], self.budgets, settings.rate_limit_per_minute)
+        decision = await self.limiter.check(group, identity, per_minute)
+        rate_limit_decisions.labels(group, "allowed" if decision.allowed else "limited", decision.source).inc()
+        if decision.allowed:
+            await self.app(scope, receive, send)
+            return
+        
+        body = json.dumps({"detail": "Rate limit exceeded"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", retry_after_header(decision.retry_after).encode()),
+                (b"ratelimit-limit", str(per_minute).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,76 @@
+"""Initial schema (tables as originally created by init_db)
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-19
+
+Databases that were created with init_db() before migrations existed
+already contain this schema: mark them with
+`alembic stamp 0001_initial_schema` and then run `alembic upgrade head`.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from geoalchemy2 import Geography
+
+revision = "0001_initial_schema"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+    op.execute("CREATE EXTENSION IF NOT EXISTS pgcrypto")
+
+    op.create_table(
+        "signal_readings",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("location", Geography(geometry_type="POINT", srid=4326, spatial_index=False), nullable=False),
+        sa.Column("signal_dbm", sa.Integer, sa.CheckConstraint("signal_dbm BETWEEN -120 AND -20"), nullable=False),
+        sa.Column("network_type", sa.String(10), sa.CheckConstraint("network_type IN ('4G', '5G', 'LTE', 'WiFi')"), nullable=False),
+        sa.Column("ssid_hash", sa.String(64), nullable=True),
+        sa.Column("gps_accuracy_meters", sa.DECIMAL(8, 2), nullable=True),
+        sa.Column("device_id_hash", sa.String(64), nullable=False),
+        sa.Column("carrier_hash", sa.String(64), nullable=True),
+        sa.Column("timestamp", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+    )
+    op.create_index("idx_signal_readings_location", "signal_readings", ["location"], postgresql_using="gist")
+    op.create_index("idx_signal_readings_timestamp", "signal_readings", ["timestamp"], postgresql_ops={"timestamp": "DESC"})
+    op.create_index("idx_signal_readings_network_type", "signal_readings", ["network_type"])
+
+    op.create_table(
+        "signal_aggregates",
+        sa.Column("h3_index", sa.String(15), primary_key=True),
+        sa.Column("center_location", Geography(geometry_type="POINT", srid=4326, spatial_index=False), nullable=False),
+        sa.Column("avg_signal_dbm", sa.DECIMAL(5, 2), nullable=True),
+        sa.Column("max_signal_dbm", sa.Integer, nullable=True),
+        sa.Column("min_signal_dbm", sa.Integer, nullable=True),
+        sa.Column("sample_count", sa.Integer, nullable=True),
+        sa.Column("network_type_distribution", postgresql.JSONB, nullable=True),
+        sa.Column("confidence_score", sa.DECIMAL(3, 2), nullable=True),
+        sa.Column("last_updated", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("data_freshness_hours", sa.Integer, nullable=True),
+    )
+    op.create_index("idx_signal_aggregates_location", "signal_aggregates", ["center_location"], postgresql_using="gist")
+    op.create_index("idx_signal_aggregates_confidence", "signal_aggregates", ["confidence_score"], postgresql_ops={"confidence_score": "DESC"})
+
+    op.create_table(
+        "expenses",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", sa.String(255), nullable=False),
+        sa.Column("amount", sa.DECIMAL(10, 2), nullable=False),
+        sa.Column("category", sa.String(50), nullable=True),
+        sa.Column("description", sa.Text, nullable=True),
+        sa.Column("expense_date", sa.Date, nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+    )
+    op.create_index("idx_expenses_user_id", "expenses", ["user_id"])
+    op.create_index("idx_expenses_date", "expenses", ["expense_date"], postgresql_ops={"expense_date": "DESC"})
+
+
+def downgrade() -> None:
+    op.drop_table("expenses")
+    op.drop_table("signal_aggregates")
+    op.drop_table("signal_readings")
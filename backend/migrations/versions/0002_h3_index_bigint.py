@@ -0,0 +1,48 @@
+"""Store H3 indexes as BIGINT instead of 15-char hex strings
+
+Revision ID: 0002_h3_index_bigint
+Revises: 0001_initial_schema
+Create Date: 2026-10-19
+
+The hex string is reinterpreted as the 64-bit H3 integer in place, so
+existing aggregates keep their keys. The primary key index is rebuilt by
+ALTER COLUMN ... TYPE as part of the table rewrite.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_h3_index_bigint"
+down_revision = "0001_initial_schema"
+branch_labels = None
+depends_on = None
+
+
+def _h3_column_type() -> str:
+    bind = op.get_bind()
+    return bind.execute(sa.text("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'signal_aggregates' AND column_name = 'h3_index'
+    """)).scalar()
+
+
+def upgrade() -> None:
+    # Tables created by init_db() after this change are already BIGINT
+    if _h3_column_type() == "bigint":
+        return
+
+    op.execute("""
+        ALTER TABLE signal_aggregates
+        ALTER COLUMN h3_index TYPE BIGINT
+        USING ('x' || lpad(h3_index, 16, '0'))::bit(64)::bigint
+    """)
+
+
+def downgrade() -> None:
+    if _h3_column_type() != "bigint":
+        return
+
+    op.execute("""
+        ALTER TABLE signal_aggregates
+        ALTER COLUMN h3_index TYPE VARCHAR(15)
+        USING to_hex(h3_index)
+    """)
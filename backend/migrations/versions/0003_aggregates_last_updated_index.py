@@ -0,0 +1,34 @@
+"""Index signal_aggregates.last_updated for the confidence refresh job
+
+Revision ID: 0003_aggregates_last_updated_index
+Revises: 0002_h3_index_bigint
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "0003_aggregates_last_updated_index"
+down_revision = "0002_h3_index_bigint"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently so ingestion keeps writing aggregates meanwhile
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "idx_signal_aggregates_last_updated",
+            "signal_aggregates",
+            ["last_updated"],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "idx_signal_aggregates_last_updated",
+            table_name="signal_aggregates",
+            postgresql_concurrently=True,
+            if_exists=True
+        )
@@ -0,0 +1,27 @@
+"""Add hour-of-week count/sum buckets to signal_aggregates
+
+Revision ID: 0004_hour_of_week_buckets
+Revises: 0003_aggregates_last_updated_index
+Create Date: 2026-10-19
+
+Existing rows get NULL buckets and are filled the next time the cell is
+aggregated; time-filtered queries skip cells without data in the slot.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0004_hour_of_week_buckets"
+down_revision = "0003_aggregates_last_updated_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("signal_aggregates", sa.Column("hour_of_week_counts", postgresql.ARRAY(sa.Integer), nullable=True))
+    op.add_column("signal_aggregates", sa.Column("hour_of_week_sums", postgresql.ARRAY(sa.Integer), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("signal_aggregates", "hour_of_week_sums")
+    op.drop_column("signal_aggregates", "hour_of_week_counts")
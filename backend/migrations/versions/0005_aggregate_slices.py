@@ -0,0 +1,36 @@
+"""Add per-network-type and per-carrier aggregate slices
+
+Revision ID: 0005_aggregate_slices
+Revises: 0004_hour_of_week_buckets
+Create Date: 2026-10-19
+
+Slices are filled as cells are re-aggregated. Run the area aggregation
+for busy regions after upgrading to populate them up front.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_aggregate_slices"
+down_revision = "0004_hour_of_week_buckets"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "signal_aggregate_slices",
+        sa.Column("dimension", sa.String(16), sa.CheckConstraint("dimension IN ('network_type', 'carrier')"), primary_key=True),
+        sa.Column("dimension_value", sa.String(64), primary_key=True),
+        sa.Column("h3_index", sa.BigInteger, primary_key=True),
+        sa.Column("avg_signal_dbm", sa.DECIMAL(5, 2), nullable=True),
+        sa.Column("max_signal_dbm", sa.Integer, nullable=True),
+        sa.Column("min_signal_dbm", sa.Integer, nullable=True),
+        sa.Column("sample_count", sa.Integer, nullable=True),
+        sa.Column("confidence_score", sa.DECIMAL(3, 2), nullable=True),
+        sa.Column("last_updated", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    op.create_index("idx_signal_aggregate_slices_h3_index", "signal_aggregate_slices", ["h3_index"])
+
+
+def downgrade() -> None:
+    op.drop_table("signal_aggregate_slices")
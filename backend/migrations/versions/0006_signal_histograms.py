@@ -0,0 +1,28 @@
+"""Add dBm histogram sketch and percentile columns to signal_aggregates
+
+Revision ID: 0006_signal_histograms
+Revises: 0005_aggregate_slices
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0006_signal_histograms"
+down_revision = "0005_aggregate_slices"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("signal_aggregates", sa.Column("signal_histogram", postgresql.ARRAY(sa.Integer), nullable=True))
+    op.add_column("signal_aggregates", sa.Column("p10_signal_dbm", sa.SmallInteger, nullable=True))
+    op.add_column("signal_aggregates", sa.Column("median_signal_dbm", sa.SmallInteger, nullable=True))
+    op.add_column("signal_aggregates", sa.Column("p90_signal_dbm", sa.SmallInteger, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("signal_aggregates", "p90_signal_dbm")
+    op.drop_column("signal_aggregates", "median_signal_dbm")
+    op.drop_column("signal_aggregates", "p10_signal_dbm")
+    op.drop_column("signal_aggregates", "signal_histogram")
@@ -0,0 +1,21 @@
+"""Add distinct-contributor estimate to signal_aggregates
+
+Revision ID: 0007_contributor_count
+Revises: 0006_signal_histograms
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_contributor_count"
+down_revision = "0006_signal_histograms"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("signal_aggregates", sa.Column("contributor_count", sa.Integer, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("signal_aggregates", "contributor_count")
@@ -0,0 +1,28 @@
+"""Add signal_estimates table for the interpolated surface
+
+Revision ID: 0008_signal_estimates
+Revises: 0007_contributor_count
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_signal_estimates"
+down_revision = "0007_contributor_count"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "signal_estimates",
+        sa.Column("h3_index", sa.BigInteger, primary_key=True),
+        sa.Column("estimated_signal_dbm", sa.DECIMAL(5, 2), nullable=False),
+        sa.Column("confidence_score", sa.DECIMAL(3, 2), nullable=False),
+        sa.Column("source_count", sa.Integer, nullable=False),
+        sa.Column("computed_at", sa.TIMESTAMP(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("signal_estimates")
@@ -0,0 +1,36 @@
+"""Partial index on new WiFi readings for the hotspot index
+
+Revision ID: 0009_wifi_readings_index
+Revises: 0008_signal_estimates
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_wifi_readings_index"
+down_revision = "0008_signal_estimates"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently so ingestion keeps writing readings meanwhile
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "idx_signal_readings_wifi_created_at",
+            "signal_readings",
+            ["created_at"],
+            postgresql_where=sa.text("network_type = 'WiFi' AND ssid_hash IS NOT NULL"),
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "idx_signal_readings_wifi_created_at",
+            table_name="signal_readings",
+            postgresql_concurrently=True,
+            if_exists=True
+        )
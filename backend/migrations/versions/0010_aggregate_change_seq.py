@@ -0,0 +1,52 @@
+"""Add change sequence to signal_aggregates for heatmap delta sync
+
+Revision ID: 0010_aggregate_change_seq
+Revises: 0009_wifi_readings_index
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010_aggregate_change_seq"
+down_revision = "0009_wifi_readings_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE IF NOT EXISTS signal_aggregates_change_seq")
+    
+    # Existing rows each get a sequence value while the column is added
+    op.add_column(
+        "signal_aggregates",
+        sa.Column(
+            "change_seq",
+            sa.BigInteger,
+            server_default=sa.text("nextval('signal_aggregates_change_seq')"),
+            nullable=False
+        )
+    )
+    op.create_index("idx_signal_aggregates_change_seq", "signal_aggregates", ["change_seq"])
+    
+    # Every later insert/update takes the next value, whichever code path writes it
+    op.execute("""
+        CREATE OR REPLACE FUNCTION signal_aggregates_bump_change_seq() RETURNS trigger AS $$
+        BEGIN
+            NEW.change_seq := nextval('signal_aggregates_change_seq');
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER signal_aggregates_change_seq
+            BEFORE INSERT OR UPDATE ON signal_aggregates
+            FOR EACH ROW EXECUTE FUNCTION signal_aggregates_bump_change_seq()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS signal_aggregates_change_seq ON signal_aggregates")
+    op.execute("DROP FUNCTION IF EXISTS signal_aggregates_bump_change_seq()")
+    op.drop_index("idx_signal_aggregates_change_seq", table_name="signal_aggregates")
+    op.drop_column("signal_aggregates", "change_seq")
+    op.execute("DROP SEQUENCE IF EXISTS signal_aggregates_change_seq")
@@ -0,0 +1,118 @@
+"""Stamp signal_aggregates writes with their transaction id for delta sync
+
+Sequence values are handed out when a row is written, not when its
+transaction commits, so a client's `since` taken from the sequence could
+skip rows a slower transaction committed later. Each write now records
+its transaction id; the sync version is the snapshot xmin, below which
+every transaction has finished (needs PostgreSQL 13+).
+
+signal_aggregates_sync holds the one-row sync state:
+- xid_offset: added to transaction ids so versions stay above every
+  change_seq value handed out before this migration
+- reset_version: `since` values below it get a full response (set here
+  and by jobs/reaggregate.py when it swaps in rebuilt tables)
+
+Revision ID: 0011_aggregate_change_xid
+Revises: 0010_aggregate_change_seq
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011_aggregate_change_xid"
+down_revision = "0010_aggregate_change_seq"
+branch_labels = None
+depends_on = None
+
+CURRENT_XID = "pg_current_xact_id()::text::bigint"
+
+
+def upgrade() -> None:
+    # Existing rows get this migration's transaction id
+    op.add_column(
+        "signal_aggregates",
+        sa.Column("change_xid", sa.BigInteger, server_default=sa.text(f"({CURRENT_XID})"), nullable=False)
+    )
+    op.create_index("idx_signal_aggregates_change_xid", "signal_aggregates", ["change_xid"])
+    
+    op.create_table(
+        "signal_aggregates_sync",
+        sa.Column("id", sa.SmallInteger, primary_key=True),
+        sa.Column("reset_version", sa.BigInteger, nullable=False),
+        sa.Column("xid_offset", sa.BigInteger, nullable=False),
+        sa.CheckConstraint("id = 1", name="signal_aggregates_sync_single_row")
+    )
+    # Clients holding a change_seq version get one full response, then xid versions
+    op.execute(f"""
+        INSERT INTO signal_aggregates_sync (id, reset_version, xid_offset)
+        SELECT 1, {CURRENT_XID} + offs, offs
+        FROM (
+            SELECT greatest(0, last_value + 1 - {CURRENT_XID}) AS offs
+            FROM signal_aggregates_change_seq
+        ) o
+    """)
+    
+    op.execute("DROP TRIGGER IF EXISTS signal_aggregates_change_seq ON signal_aggregates")
+    op.execute("DROP FUNCTION IF EXISTS signal_aggregates_bump_change_seq()")
+    op.drop_index("idx_signal_aggregates_change_seq", table_name="signal_aggregates")
+    op.drop_column("signal_aggregates", "change_seq")
+    op.execute("DROP SEQUENCE IF EXISTS signal_aggregates_change_seq")
+    
+    # Every later insert/update records its transaction, whichever code path writes it
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION signal_aggregates_stamp_change_xid() RETURNS trigger AS $$
+        BEGIN
+            NEW.change_xid := {CURRENT_XID};
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER signal_aggregates_change_xid
+            BEFORE INSERT OR UPDATE ON signal_aggregates
+            FOR EACH ROW EXECUTE FUNCTION signal_aggregates_stamp_change_xid()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS signal_aggregates_change_xid ON signal_aggregates")
+    op.execute("DROP FUNCTION IF EXISTS signal_aggregates_stamp_change_xid()")
+    
+    # Restart the sequence above every version handed out since the upgrade
+    op.execute("""
+        DO $$
+        DECLARE
+            start_value bigint;
+        BEGIN
+            SELECT pg_current_xact_id()::text::bigint + xid_offset + 1 INTO start_value
+            FROM signal_aggregates_sync;
+            EXECUTE format('CREATE SEQUENCE signal_aggregates_change_seq START %s', start_value);
+        END
+        $$
+    """)
+    op.drop_table("signal_aggregates_sync")
+    op.add_column(
+        "signal_aggregates",
+        sa.Column(
+            "change_seq",
+            sa.BigInteger,
+            server_default=sa.text("nextval('signal_aggregates_change_seq')"),
+            nullable=False
+        )
+    )
+    op.create_index("idx_signal_aggregates_change_seq", "signal_aggregates", ["change_seq"])
+    op.drop_index("idx_signal_aggregates_change_xid", table_name="signal_aggregates")
+    op.drop_column("signal_aggregates", "change_xid")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION signal_aggregates_bump_change_seq() RETURNS trigger AS $$
+        BEGIN
+            NEW.change_seq := nextval('signal_aggregates_change_seq');
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER signal_aggregates_change_seq
+            BEFORE INSERT OR UPDATE ON signal_aggregates
+            FOR EACH ROW EXECUTE FUNCTION signal_aggregates_bump_change_seq()
+    """)
@@ -0,0 +1,34 @@
+"""Index signal_aggregate_slices.last_updated for the confidence refresh job
+
+Revision ID: 0012_slices_last_updated_index
+Revises: 0011_aggregate_change_xid
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "0012_slices_last_updated_index"
+down_revision = "0011_aggregate_change_xid"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently so ingestion keeps writing slices meanwhile
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "idx_signal_aggregate_slices_last_updated",
+            "signal_aggregate_slices",
+            ["last_updated"],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "idx_signal_aggregate_slices_last_updated",
+            table_name="signal_aggregate_slices",
+            postgresql_concurrently=True,
+            if_exists=True
+        )
@@ -58,6 +58,9 @@ class NavigationVector(BaseModel):
     confidence_score: float = Field(..., ge=0, le=1, description="Data confidence (0-1)")
     target_signal_dbm: Optional[int] = Field(None, description="Expected signal at target")
     current_signal_dbm: Optional[int] = Field(None, description="Signal at current location")
+    target_p10_signal_dbm: Optional[int] = Field(None, description="Weakest 10% of readings at target")
+    target_median_signal_dbm: Optional[int] = Field(None, description="Median reading at target")
+    interpolated: bool = Field(False, description="Target is an interpolated estimate, not measured")
     
     
 class HeatmapCell(BaseModel):
@@ -68,9 +71,70 @@ class HeatmapCell(BaseModel):
     avg_signal_dbm: float
     confidence_score: float
     sample_count: int
+    p10_signal_dbm: Optional[int] = None
+    median_signal_dbm: Optional[int] = None
+    p90_signal_dbm: Optional[int] = None
+    interpolated: bool = False
 
 
 class HeatmapResponse(BaseModel):
     """Heatmap data for visualization"""
     cells: List[HeatmapCell]
     bounds: Dict[str, float]  # {"min_lat": ..., "max_lat": ..., "min_lon": ..., "max_lon": ...}
+    version: Optional[int] = Field(None, description="Pass back as `since` to fetch only later changes")
+    since: Optional[int] = Field(None, description="Set when this is a delta against that version")
+    removed: List[str] = Field(default_factory=list, description="Cells (H3) that no longer qualify")
+
+
+class SignalPercentiles(BaseModel):
+    """Signal strength distribution for a coarse area (merged H3 children)"""
+    h3_index: str
+    resolution: int
+    sample_count: int
+    p10_signal_dbm: Optional[int]
+    median_signal_dbm: Optional[int]
+    p90_signal_dbm: Optional[int]
+
+
+class Hotspot(BaseModel):
+    """Estimated WiFi access point near the user"""
+    ssid_hash: str
+    latitude: float
+    longitude: float
+    signal_dbm: int = Field(..., description="Strongest reading seen for this access point")
+    sample_count: int
+    distance_meters: float
+    bearing_degrees: float
+
+
+class HotspotResponse(BaseModel):
+    """Nearest strong WiFi hotspots, closest first"""
+    hotspots: List[Hotspot]
+
+
+class OutageAlert(BaseModel):
+    """Sharp signal drop detected in a res-8 area"""
+    h3_index: str
+    carrier_hash: Optional[str] = Field(None, description="Carrier affected; null when all readings dropped")
+    baseline_dbm: float
+    observed_dbm: float
+    drop_db: float
+    z_score: Optional[float]
+    reporters: int = Field(..., description="Distinct devices that reported the drop")
+    detected_at: datetime
+    updated_at: datetime
+
+
+class OutageResponse(BaseModel):
+    """Active outages, most recently confirmed first"""
+    outages: List[OutageAlert]
+
+
+class RegionPackInfo(BaseModel):
+    """Offline pack covering a location"""
+    region: str = Field(..., description="Res-5 H3 cell the pack covers")
+    url: str
+    cell_count: int
+    size_bytes: int
+    data_version: int = Field(..., description="Heatmap version the pack reflects (use as `since`)")
+    created_at: datetime
@@ -1,70 +1,143 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, text
-from db.models import SignalReading, SignalAggregate
+from sqlalchemy import select, func, text, delete
+from db.models import SignalReading, SignalAggregate, SignalAggregateSlice
+from db.fastpath import fetch_best_cell, fetch_best_estimate, fetch_cell
 from services.geospatial import GeospatialService
-from datetime import datetime, timedelta
-from typing import List, Dict
+from services.sketches import SignalHistogram
+from services.contributors import ContributorCounter
+from services.metrics import aggregation_duration
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Tuple
 import json
+import time
 
 
 class SignalAggregator:
     """Aggregates raw signal readings into H3 cells"""
     
-    def __init__(self, db: AsyncSession):
+    # Readings older than this don't count towards a cell's aggregate
+    WINDOW_DAYS = 7
+    
+    # GROUPING(network_type, slot, signal_dbm, carrier_hash) of compute_cell's
+    # grouping sets: a bit is set for each column the set doesn't group by
+    BY_NETWORK_TYPE = 0b0111
+    BY_SLOT = 0b1011
+    BY_SIGNAL_DBM = 0b1101
+    BY_CARRIER = 0b1110
+    
+    def __init__(self, db: AsyncSession, redis=None):
         self.db = db
         self.geo_service = GeospatialService()
+        # Without Redis, confidence falls back to raw sample counts
+        self.contributors = ContributorCounter(redis) if redis is not None else None
     
-    async def aggregate_cell(self, h3_index: str) -> None:
+    async def aggregate_cell(self, h3_index: int) -> None:
         """
         Aggregate all readings for a single H3 cell
         
         Args:
-            h3_index: H3 cell identifier
+            h3_index: H3 cell identifier (64-bit integer)
+        """
+        start = time.perf_counter()
+        result = "error"
+        try:
+            computed = await self.compute_cell(h3_index)
+            if computed is None:
+                # No data for this cell, skip or mark as low confidence
+                result = "empty"
+                return
+            aggregate, slices = computed
+            
+            # Merge (upsert) and replace the cell's slices in the same transaction
+            await self.db.merge(aggregate)
+            await self.db.execute(
+                delete(SignalAggregateSlice).where(SignalAggregateSlice.h3_index == h3_index)
+            )
+            self.db.add_all(slices)
+            await self.db.commit()
+            result = "ok"
+        finally:
+            aggregation_duration.labels(result).observe(time.perf_counter() - start)
+    
+    async def compute_cell(
+        self,
+        h3_index: int,
+        now: Optional[datetime] = None
+    ) -> Optional[Tuple[SignalAggregate, List[SignalAggregateSlice]]]:
+        """
+        Compute a cell's aggregate and slices from raw readings without saving
+        
+        Args:
+            h3_index: H3 cell identifier (64-bit integer)
+            now: End of the aggregation window (default: now, UTC)
+        
+        Returns:
+            Tuple of (aggregate, slices), or None if the cell has no readings
         """
         center_lat, center_lon = self.geo_service.h3_to_lat_lon(h3_index)
         
-        # Query all readings in this cell (within last 7 days)
-        cutoff_date = datetime.utcnow() - timedelta(days=7)
+        # Query all readings in this cell (within the aggregation window)
+        now = now or datetime.now(timezone.utc)
+        cutoff_date = now - timedelta(days=self.WINDOW_DAYS)
         
         # Use PostGIS to find readings within cell polygon
         # For simplicity, we use a radius approximation (~15m for resolution 10)
         radius_meters = 20
         
-        query = text("""
-            SELECT 
+        # Readings within the cell radius over the aggregation window
+        cell_filter = """
+            ST_DWithin(
+                location::geography,
+                ST_MakePoint(:lon, :lat)::geography,
+                :radius
+            )
+            AND timestamp >= :cutoff_date
+        """
+        params = {
+            "lat": center_lat,
+            "lon": center_lon,
+            "radius": radius_meters,
+            "cutoff_date": cutoff_date
+        }
+        
+        # One scan of the cell's readings, grouped four ways: by network type,
+        # hour-of-week slot (UTC, Monday 00:00 = slot 0), dBm (histogram) and
+        # carrier. GROUPING() tells the sets apart.
+        query = text(f"""
+            SELECT
+                GROUPING(network_type, slot, signal_dbm, carrier_hash) as grouping_set,
+                network_type,
+                slot,
+                signal_dbm,
+                carrier_hash,
                 AVG(signal_dbm) as avg_signal,
                 MAX(signal_dbm) as max_signal,
                 MIN(signal_dbm) as min_signal,
+                SUM(signal_dbm) as signal_sum,
                 COUNT(*) as sample_count,
-                network_type,
                 COUNT(network_type) as type_count,
                 MAX(timestamp) as last_updated
-            FROM signal_readings
-            WHERE 
-                ST_DWithin(
-                    location::geography,
-                    ST_MakePoint(:lon, :lat)::geography,
-                    :radius
-                )
-                AND timestamp >= :cutoff_date
-            GROUP BY network_type
+            FROM (
+                SELECT
+                    network_type,
+                    carrier_hash,
+                    signal_dbm,
+                    timestamp,
+                    (EXTRACT(ISODOW FROM timestamp AT TIME ZONE 'UTC')::int - 1) * 24
+                        + EXTRACT(HOUR FROM timestamp AT TIME ZONE 'UTC')::int as slot
+                FROM signal_readings
+                WHERE {cell_filter}
+            ) cell_readings
+            GROUP BY GROUPING SETS ((network_type), (slot), (signal_dbm), (carrier_hash))
         """)
         
-        result = await self.db.execute(
-            query,
-            {
-                "lat": center_lat,
-                "lon": center_lon,
-                "radius": radius_meters,
-                "cutoff_date": cutoff_date
-            }
-        )
-        
-        rows = result.fetchall()
+        grouped = {}
+        for row in await self.db.execute(query, params):
+            grouped.setdefault(row.grouping_set, []).append(row)
+        rows = grouped.get(self.BY_NETWORK_TYPE, [])
         
         if not rows:
-            # No data for this cell, skip or mark as low confidence
-            return
+            return None
         
         # Aggregate across network types
         total_samples = sum(row.sample_count for row in rows)
@@ -76,15 +149,52 @@ class SignalAggregator:
         # Network type distribution
         network_dist = {row.network_type: row.type_count for row in rows}
         
+        # Hour-of-week buckets
+        hourly_counts = [0] * self.geo_service.HOURS_PER_WEEK
+        hourly_sums = [0] * self.geo_service.HOURS_PER_WEEK
+        for row in grouped.get(self.BY_SLOT, ()):
+            hourly_counts[row.slot] = row.sample_count
+            hourly_sums[row.slot] = row.signal_sum
+        
         # Calculate data freshness
-        data_age = (datetime.utcnow() - last_updated).total_seconds() / 3600
+        data_age = (now - last_updated).total_seconds() / 3600
+        
+        # Distinct contributors (HyperLogLog estimate maintained at ingest)
+        contributor_count = None
+        if self.contributors is not None:
+            try:
+                contributor_count = await self.contributors.count([h3_index], now=now)
+            except Exception as e:
+                # Redis unavailable: confidence falls back to raw sample counts
+                print(f"Contributor count unavailable for {h3_index:x}: {e}")
         
         # Calculate confidence score
         confidence = self.geo_service.calculate_confidence(
             sample_count=total_samples,
-            data_age_hours=data_age
+            data_age_hours=data_age,
+            contributor_count=contributor_count
+        )
+        
+        # dBm histogram (quantile sketch) and robust percentiles
+        histogram = SignalHistogram.from_counts(
+            (row.signal_dbm, row.sample_count)
+            for row in grouped.get(self.BY_SIGNAL_DBM, ())
         )
         
+        # Per-carrier breakdown (network type breakdown comes from `rows`)
+        carrier_rows = [
+            row for row in grouped.get(self.BY_CARRIER, ())
+            if row.carrier_hash is not None
+        ]
+        
+        slices = [
+            self._build_slice(h3_index, SignalAggregateSlice.NETWORK_TYPE, row.network_type, row, now)
+            for row in rows
+        ] + [
+            self._build_slice(h3_index, SignalAggregateSlice.CARRIER, row.carrier_hash, row, now)
+            for row in carrier_rows
+        ]
+        
         # Upsert aggregate
         aggregate = SignalAggregate(
             h3_index=h3_index,
@@ -93,15 +203,46 @@ class SignalAggregator:
             max_signal_dbm=max_signal,
             min_signal_dbm=min_signal,
             sample_count=total_samples,
+            contributor_count=contributor_count,
             network_type_distribution=network_dist,
+            hour_of_week_counts=hourly_counts,
+            hour_of_week_sums=hourly_sums,
+            signal_histogram=histogram.to_list(),
+            p10_signal_dbm=histogram.quantile(0.1),
+            median_signal_dbm=histogram.quantile(0.5),
+            p90_signal_dbm=histogram.quantile(0.9),
             confidence_score=confidence,
             last_updated=last_updated,
             data_freshness_hours=int(data_age)
         )
         
-        # Merge (upsert)
-        await self.db.merge(aggregate)
-        await self.db.commit()
+        return aggregate, slices
+    
+    def _build_slice(
+        self,
+        h3_index: int,
+        dimension: str,
+        dimension_value: str,
+        row,
+        now: datetime
+    ) -> SignalAggregateSlice:
+        """Build one network type / carrier slice from a grouped readings row"""
+        data_age = (now - row.last_updated).total_seconds() / 3600
+        
+        return SignalAggregateSlice(
+            dimension=dimension,
+            dimension_value=dimension_value,
+            h3_index=h3_index,
+            avg_signal_dbm=round(row.avg_signal, 2),
+            max_signal_dbm=row.max_signal,
+            min_signal_dbm=row.min_signal,
+            sample_count=row.sample_count,
+            confidence_score=self.geo_service.calculate_confidence(
+                sample_count=row.sample_count,
+                data_age_hours=data_age
+            ),
+            last_updated=row.last_updated
+        )
     
     async def aggregate_area(
         self,
@@ -116,7 +257,7 @@ class SignalAggregator:
             lat: Center latitude
             lon: Center longitude
             radius_meters: Radius to aggregate
-            
+        
         Returns:
             Number of cells aggregated
         """
@@ -129,11 +270,35 @@ class SignalAggregator:
         
         return len(h3_cells)
     
+    async def get_parent_histogram(self, parent_h3: int) -> SignalHistogram:
+        """
+        Merge the histograms of all cells under a coarser parent cell
+        
+        Args:
+            parent_h3: H3 cell at a resolution coarser than the aggregates
+        
+        Returns:
+            Merged SignalHistogram (empty if no child has data)
+        """
+        low, high = self.geo_service.get_child_range(parent_h3)
+        result = await self.db.execute(
+            select(SignalAggregate.signal_histogram).where(
+                SignalAggregate.h3_index.between(low, high),
+                SignalAggregate.signal_histogram.is_not(None)
+            )
+        )
+        return SignalHistogram.merge_all(
+            SignalHistogram(counts) for counts in result.scalars()
+        )
+    
     async def get_best_signal_in_area(
         self,
         lat: float,
         lon: float,
-        radius_meters: int = 500
+        radius_meters: int = 500,
+        at: Optional[datetime] = None,
+        dimension: Optional[Tuple[str, str]] = None,
+        avoid_areas: Optional[List[int]] = None
     ) -> Dict:
         """
         Find the cell with best signal in area
@@ -142,21 +307,42 @@ class SignalAggregator:
             lat: Current latitude
             lon: Current longitude
             radius_meters: Search radius
-            
+            at: Optional time of day/week; compares cells by their
+                matching hour-of-week bucket instead of the 7-day average
+            dimension: Optional (dimension, value) slice, e.g.
+                ("network_type", "WiFi"); uses only that slice's aggregates
+            avoid_areas: Optional coarser H3 cells (e.g. active outages)
+                whose cells are never chosen as the target
+        
         Returns:
             Dict with bearing, distance, and signal info
         """
-        # Get H3 cells in radius
-        h3_cells = self.geo_service.get_cells_in_radius(lat, lon, radius_meters)
+        # Get H3 cells in radius as compacted id ranges
+        ranges = self.geo_service.get_cell_ranges_in_radius(lat, lon, radius_meters)
+        if avoid_areas:
+            ranges = self.geo_service.subtract_ranges(ranges, [
+                self.geo_service.get_child_range(area) for area in avoid_areas
+            ])
+        hour_slot = self.geo_service.hour_of_week_slot(at) if at else None
         
-        # Query aggregates for these cells
-        query = select(SignalAggregate).where(
-            SignalAggregate.h3_index.in_(h3_cells),
-            SignalAggregate.confidence_score >= 0.3  # Minimum confidence threshold
-        ).order_by(SignalAggregate.avg_signal_dbm.desc())
+        # Query aggregates for these cells above the navigation threshold
+        best_cell = await fetch_best_cell(
+            self.db,
+            ranges,
+            min_confidence=self.geo_service.NAVIGATION_MIN_CONFIDENCE,
+            hour_slot=hour_slot,
+            dimension=dimension
+        )
         
-        result = await self.db.execute(query)
-        best_cell = result.scalars().first()
+        # Cold start: fall back to the interpolated surface for unfiltered requests
+        interpolated = False
+        if not best_cell and hour_slot is None and dimension is None:
+            best_cell = await fetch_best_estimate(
+                self.db,
+                ranges,
+                min_confidence=self.geo_service.ESTIMATE_MIN_CONFIDENCE
+            )
+            interpolated = best_cell is not None
         
         if not best_cell:
             return None
@@ -170,16 +356,20 @@ class SignalAggregator:
         
         # Get current location signal
         current_h3 = self.geo_service.lat_lon_to_h3(lat, lon)
-        current_query = select(SignalAggregate).where(
-            SignalAggregate.h3_index == current_h3
+        current_cell = await fetch_cell(
+            self.db,
+            current_h3,
+            hour_slot=hour_slot,
+            dimension=dimension
         )
-        current_result = await self.db.execute(current_query)
-        current_cell = current_result.scalars().first()
         
         return {
             "bearing_degrees": bearing,
             "distance_meters": distance,
-            "confidence_score": float(best_cell.confidence_score),
+            "confidence_score": best_cell.confidence_score,
             "target_signal_dbm": int(best_cell.avg_signal_dbm),
-            "current_signal_dbm": int(current_cell.avg_signal_dbm) if current_cell else None
+            "target_p10_signal_dbm": best_cell.p10_signal_dbm,
+            "target_median_signal_dbm": best_cell.median_signal_dbm,
+            "current_signal_dbm": int(current_cell.avg_signal_dbm) if current_cell else None,
+            "interpolated": interpolated
         }
@@ -0,0 +1,255 @@
+"""
+Columnar archive of aged raw readings
+
+Readings older than MAX_SIGNAL_AGE_DAYS are moved out of Postgres into
+Parquet files (zstd), one directory per day and res-5 parent region:
+
+    <ARCHIVE_DIR>/date=2026-10-12/parent=852a1073fffffff/part-<token>.parquet
+
+Rows inside a file are sorted by H3 cell then time and written in
+row groups, so min/max statistics on h3_index and timestamp let scans
+skip row groups as well as whole partitions. Files are first written
+as .pending and renamed once the rows are gone from Postgres; see
+jobs/archive_readings.py.
+"""
+from services.geospatial import GeospatialService
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import os
+import uuid
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+ARCHIVE_RESOLUTION = 5  # Partition by res-5 parent (~250 km², same regions as offline packs)
+ROW_GROUP_SIZE = 64 * 1024
+COMPRESSION = "zstd"
+COMPRESSION_LEVEL = 6
+PENDING_SUFFIX = ".pending"
+
+SCHEMA = pa.schema([
+    ("id", pa.binary(16)),
+    ("h3_index", pa.uint64()),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+    ("signal_dbm", pa.int8()),
+    ("network_type", pa.dictionary(pa.int8(), pa.string())),
+    ("ssid_hash", pa.string()),
+    ("gps_accuracy_meters", pa.float32()),
+    ("device_id_hash", pa.string()),
+    ("carrier_hash", pa.string()),
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+])
+
+
+def build_table(columns: Dict[str, list]) -> pa.Table:
+    """
+    Build an archive table from column lists, sorted for row-group pruning
+    
+    Args:
+        columns: Column name -> values, for every column in SCHEMA
+    
+    Returns:
+        Table in SCHEMA order, sorted by (h3_index, timestamp)
+    """
+    table = pa.Table.from_pydict(
+        {field.name: columns[field.name] for field in SCHEMA},
+        schema=SCHEMA
+    )
+    return table.sort_by([("h3_index", "ascending"), ("timestamp", "ascending")])
+
+
+class ReadingArchive:
+    """
+    Writes and scans the partitioned Parquet archive of raw readings
+    
+    Partition pruning happens here (directory names are the date and the
+    parent cell, whose descendants form one contiguous id range); row
+    group pruning and column projection are left to the Parquet reader.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+    
+    @staticmethod
+    def partition_path(day: date, parent: int) -> str:
+        return os.path.join(f"date={day.isoformat()}", f"parent={GeospatialService.h3_to_string(parent)}")
+    
+    def write(self, day: date, parent: int, table: pa.Table) -> str:
+        """
+        Write one partition's rows as a new pending file
+        
+        Args:
+            day: UTC date of the readings
+            parent: Parent cell at ARCHIVE_RESOLUTION
+            table: Rows from build_table()
+        
+        Returns:
+            Path of the .pending file (see commit())
+        """
+        directory = os.path.join(self.directory, self.partition_path(day, parent))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet{PENDING_SUFFIX}")
+        
+        with open(path, "wb") as f:
+            pq.write_table(
+                table,
+                f,
+                row_group_size=ROW_GROUP_SIZE,
+                compression=COMPRESSION,
+                compression_level=COMPRESSION_LEVEL,
+                write_statistics=True
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        return path
+    
+    @staticmethod
+    def commit(pending_path: str) -> str:
+        """Make a pending file visible to readers"""
+        path = pending_path[:-len(PENDING_SUFFIX)]
+        os.replace(pending_path, path)
+        return path
+    
+    def pending_files(self) -> List[str]:
+        """Files left pending by an interrupted archive run"""
+        return sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(self.directory)
+            for name in names
+            if name.endswith(PENDING_SUFFIX)
+        )
+    
+    def files(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ranges: Optional[Sequence[Tuple[int, int]]] = None
+    ) -> List[str]:
+        """
+        Archive files whose partition can hold matching rows
+        
+        Args:
+            start: Earliest reading timestamp (inclusive)
+            end: Latest reading timestamp (exclusive)
+            ranges: Inclusive H3 id ranges at any resolution finer than ARCHIVE_RESOLUTION
+        
+        Returns:
+            Parquet file paths
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        
+        paths = []
+        for date_dir in sorted(os.listdir(self.directory)):
+            if not date_dir.startswith("date="):
+                continue
+            day = date.fromisoformat(date_dir[len("date="):])
+            if start is not None and day < start.astimezone(timezone.utc).date():
+                continue
+            if end is not None and datetime.combine(day, datetime.min.time(), timezone.utc) >= end:
+                continue
+            
+            for parent_dir in sorted(os.listdir(os.path.join(self.directory, date_dir))):
+                if not parent_dir.startswith("parent="):
+                    continue
+                if ranges is not None:
+                    low, high = GeospatialService.get_child_range(
+                        GeospatialService.string_to_h3(parent_dir[len("parent="):])
+                    )
+                    if not any(r_low <= high and r_high >= low for r_low, r_high in ranges):
+                        continue
+                
+                directory = os.path.join(self.directory, date_dir, parent_dir)
+                paths.extend(
+                    os.path.join(directory, name)
+                    for name in sorted(os.listdir(directory))
+                    if name.endswith(".parquet")
+                )
+        return paths
+    
+    def scan(
+        self,
+        columns: Optional[List[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ranges: Optional[Sequence[Tuple[int, int]]] = None,
+        network_types: Optional[Iterable[str]] = None,
+        batch_size: int = ROW_GROUP_SIZE
+    ) -> Iterator[pa.RecordBatch]:
+        """
+        Stream archived readings matching the filters
+        
+        Only the requested columns are decoded, and the filters are pushed
+        down: partitions are pruned by directory, row groups by their
+        statistics, and the remaining rows filtered by the reader.
+        
+        Args:
+            columns: Columns to read (default: all of SCHEMA)
+            start: Earliest reading timestamp (inclusive)
+            end: Latest reading timestamp (exclusive)
+            ranges: Non-overlapping inclusive res-10 H3 id ranges, e.g. from get_cell_ranges_in_radius
+            network_types: Only these network types
+            batch_size: Maximum rows per batch
+        
+        Yields:
+            Record batches with the requested columns
+        """
+        files = self.files(start, end, ranges)
+        if not files:
+            return
+        
+        conditions = []
+        if start is not None:
+            conditions.append(ds.field("timestamp") >= pa.scalar(start, type=SCHEMA.field("timestamp").type))
+        if end is not None:
+            conditions.append(ds.field("timestamp") < pa.scalar(end, type=SCHEMA.field("timestamp").type))
+        if network_types is not None:
+            conditions.append(ds.field("network_type").isin(list(network_types)))
+        
+        # The reader only gets the ranges' overall bounds, which is all row-group
+        # statistics can use; exact membership is one searchsorted per batch
+        lows = highs = None
+        if ranges is not None:
+            ranges = sorted(ranges)
+            lows = np.array([low for low, _ in ranges], dtype=np.uint64)
+            highs = np.array([high for _, high in ranges], dtype=np.uint64)
+            conditions.append(
+                (ds.field("h3_index") >= pa.scalar(int(lows[0]), pa.uint64()))
+                & (ds.field("h3_index") <= pa.scalar(int(highs.max()), pa.uint64()))
+            )
+        
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        
+        read_columns = columns
+        if ranges is not None and columns is not None and "h3_index" not in columns:
+            read_columns = columns + ["h3_index"]
+        
+        dataset = ds.dataset(files, schema=SCHEMA, format="parquet")
+        for batch in dataset.to_batches(columns=read_columns, filter=expression, batch_size=batch_size):
+            if ranges is not None and len(ranges) > 1:
+                h3_indexes = batch.column("h3_index").to_numpy(zero_copy_only=False)
+                slot = np.searchsorted(lows, h3_indexes, side="right") - 1
+                mask = (slot >= 0) & (h3_indexes <= highs[np.maximum(slot, 0)])
+                batch = batch.filter(pa.array(mask))
+            if read_columns is not columns:
+                batch = batch.select(columns)
+            if batch.num_rows:
+                yield batch
+    
+    def read(self, columns: Optional[List[str]] = None, **filters) -> pa.Table:
+        """Same as scan(), collected into one table"""
+        schema = SCHEMA if columns is None else pa.schema([SCHEMA.field(name) for name in columns])
+        return pa.Table.from_batches(list(self.scan(columns, **filters)), schema=schema)
+    
+    def size_bytes(self) -> int:
+        return sum(os.path.getsize(path) for path in self.files())
+    
+    @staticmethod
+    def day_bounds(day: date) -> Tuple[datetime, datetime]:
+        start = datetime.combine(day, datetime.min.time(), timezone.utc)
+        return start, start + timedelta(days=1)
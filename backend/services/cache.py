@@ -0,0 +1,306 @@
+"""
+Two-tier response cache: in-process LRU (L1) in front of Redis (L2)
+
+The hottest navigation keys are requested thousands of times a minute
+by every worker. L1 keeps recently used values in the worker, already
+parsed, for at most `local_cache_seconds` and within an entry and byte
+budget, so those requests skip the Redis round trip and the JSON
+decoding.
+
+Workers keep L1 coherent through Redis pub/sub: writing a key, or
+invalidating one, publishes {"o": origin, "c": cache, "k": [keys]} on
+CHANNEL, and every other worker's CacheInvalidator drops its copies. L1
+is only used while the subscription is up; after a reconnect it starts
+empty, since messages may have been missed. A value read from Redis may
+outlive its Redis TTL in L1 by up to `local_cache_seconds`.
+"""
+from collections import OrderedDict
+from config import settings
+from db.database import get_redis
+from services.metrics import registry, cache_tier_requests
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import json
+import os
+import time
+import uuid
+
+CHANNEL = "cache:invalidate"
+
+
+class LocalCache:
+    """
+    LRU map with per-entry expiry, bounded by entry count and size in bytes
+    
+    Sizes are what the caller reports (the serialized length); values
+    larger than the whole budget are not kept.
+    """
+    
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Value, or None if unknown or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, _ = entry
+        if time.monotonic() >= expires_at:
+            self.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    def put(self, key: str, value: Any, ttl_seconds: float, size: int = 0) -> None:
+        if self.max_entries <= 0 or ttl_seconds <= 0 or size > self.max_bytes:
+            return
+        self.pop(key)
+        self._entries[key] = (value, time.monotonic() + ttl_seconds, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+    
+    def pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+    
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+
+class TieredCache:
+    """
+    One named cache (e.g. "vector") with its own L1, shared key space in Redis
+    
+    Lookups are counted in signaltrail_cache_tier_requests by tier: l1 for
+    every lookup, l2 for those that reached Redis.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = None,
+        max_bytes: int = None,
+        local_ttl_seconds: float = None,
+        invalidator: "CacheInvalidator" = None
+    ):
+        self.name = name
+        self.local = LocalCache(
+            settings.local_cache_max_entries if max_entries is None else max_entries,
+            settings.local_cache_max_bytes if max_bytes is None else max_bytes
+        )
+        self.local_ttl_seconds = settings.local_cache_seconds if local_ttl_seconds is None else local_ttl_seconds
+        self.invalidator = invalidator or cache_invalidator
+        self.invalidator.register(self)
+        # A load must not fill L1 if its key was invalidated (or L1 cleared) meanwhile:
+        # key -> [loads in progress, invalidations seen], plus an epoch bumped by clear()
+        self._loads: Dict[str, list] = {}
+        self.epoch = 0
+        self._l1_hit = cache_tier_requests.labels(name, "l1", "hit")
+        self._l1_miss = cache_tier_requests.labels(name, "l1", "miss")
+        self._l2_hit = cache_tier_requests.labels(name, "l2", "hit")
+        self._l2_miss = cache_tier_requests.labels(name, "l2", "miss")
+    
+    def _local_get(self, key: str) -> Optional[Any]:
+        if not self.invalidator.listening:
+            return None
+        value = self.local.get(key)
+        (self._l1_miss if value is None else self._l1_hit).inc()
+        return value
+    
+    def _begin_load(self, key: str) -> Tuple[int, int]:
+        loads = self._loads.get(key)
+        if loads is None:
+            loads = self._loads[key] = [0, 0]
+        loads[0] += 1
+        return self.epoch, loads[1]
+    
+    def _end_load(self, key: str, token: Tuple[int, int]) -> bool:
+        """Finish a load; True if nothing invalidated its key since _begin_load"""
+        loads = self._loads[key]
+        loads[0] -= 1
+        if loads[0] == 0:
+            del self._loads[key]
+        return token == (self.epoch, loads[1])
+    
+    def _local_put(self, key: str, value: Any, fresh: bool, ttl_seconds: float, size: int) -> None:
+        if self.invalidator.listening and fresh:
+            self.local.put(key, value, min(ttl_seconds, self.local_ttl_seconds), size)
+    
+    async def get(self, redis, key: str, loads: Callable[[str], Any]) -> Optional[Any]:
+        """
+        Cached value from L1, else from Redis (then kept in L1)
+        
+        Args:
+            redis: Redis client
+            key: Redis key
+            loads: Parses the stored string, e.g. Model.model_validate_json
+        
+        Returns:
+            The value, or None if neither tier has it
+        """
+        value = self._local_get(key)
+        if value is not None:
+            return value
+        
+        token = self._begin_load(key)
+        try:
+            raw = await redis.get(key)
+        finally:
+            fresh = self._end_load(key, token)
+        if not raw:
+            self._l2_miss.inc()
+            return None
+        self._l2_hit.inc()
+        value = loads(raw)
+        self._local_put(key, value, fresh, self.local_ttl_seconds, len(raw))
+        return value
+    
+    async def set(self, redis, key: str, value: Any, serialized: str, ttl_seconds: int) -> None:
+        """
+        Store a value in both tiers and drop other workers' L1 copies
+        
+        Args:
+            redis: Redis client
+            key: Redis key
+            value: What L1 returns (e.g. the response model)
+            serialized: What Redis stores (e.g. value.model_dump_json())
+            ttl_seconds: Redis TTL; L1 keeps it for at most local_ttl_seconds
+        """
+        token = self._begin_load(key)
+        try:
+            pipe = redis.pipeline(transaction=False)
+            pipe.setex(key, ttl_seconds, serialized)
+            pipe.publish(CHANNEL, self.invalidator.message(self.name, [key]))
+            await pipe.execute()
+        finally:
+            fresh = self._end_load(key, token)
+        self._local_put(key, value, fresh, ttl_seconds, len(serialized))
+    
+    async def get_or_load(self, key: str, load: Callable[[], Awaitable[Any]], size: int = 0) -> Any:
+        """
+        L1 in front of a Redis read that isn't a single key (L2 is `load`)
+        
+        Writers of the underlying data call invalidate() with the same key.
+        """
+        value = self._local_get(key)
+        if value is not None:
+            return value
+        
+        token = self._begin_load(key)
+        try:
+            value = await load()
+        finally:
+            fresh = self._end_load(key, token)
+        self._l2_hit.inc()
+        self._local_put(key, value, fresh, self.local_ttl_seconds, size)
+        return value
+    
+    async def invalidate(self, redis, *keys: str) -> None:
+        """Drop keys from L1 in every worker (Redis values are left to expire)"""
+        self.drop(keys)
+        await redis.publish(CHANNEL, self.invalidator.message(self.name, list(keys)))
+    
+    def drop(self, keys) -> None:
+        """Drop keys from this worker's L1, and keep loads in flight from filling them"""
+        for key in keys:
+            self.local.pop(key)
+            loads = self._loads.get(key)
+            if loads is not None:
+                loads[1] += 1
+    
+    def clear(self) -> None:
+        self.epoch += 1
+        self.local.clear()
+
+
+class CacheInvalidator:
+    """
+    Per-worker subscriber applying other workers' invalidations to L1
+    
+    `listening` is True only while subscribed; TieredCache bypasses L1
+    otherwise.
+    """
+    
+    RECONNECT_SECONDS = 1.0
+    
+    def __init__(self):
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.caches: Dict[str, TieredCache] = {}
+        self.listening = False
+    
+    def register(self, cache: TieredCache) -> None:
+        self.caches[cache.name] = cache
+    
+    def message(self, cache_name: str, keys: list) -> str:
+        return json.dumps({"o": self.origin, "c": cache_name, "k": keys}, separators=(",", ":"))
+    
+    def apply(self, data: str) -> None:
+        """Apply one invalidation message (own messages are ignored)"""
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return
+        if message.get("o") == self.origin:
+            return
+        cache = self.caches.get(message.get("c"))
+        if cache is not None:
+            cache.drop(message.get("k") or ())
+    
+    def _stop_listening(self) -> None:
+        self.listening = False
+        for cache in self.caches.values():
+            cache.clear()
+    
+    async def run_forever(self, redis=None) -> None:
+        """Subscribe to CHANNEL and apply messages, resubscribing after errors"""
+        redis = redis or await get_redis()
+        while True:
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CHANNEL)
+                # Anything cached before now may have missed an invalidation
+                for cache in self.caches.values():
+                    cache.clear()
+                self.listening = True
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.apply(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Cache invalidation subscription lost, local caches off: {e}")
+            finally:
+                self._stop_listening()
+                await asyncio.shield(pubsub.aclose())
+            
+            await asyncio.sleep(self.RECONNECT_SECONDS)
+
+
+# Shared per-process subscriber (started in main.py's lifespan)
+cache_invalidator = CacheInvalidator()
+
+
+def _local_cache_sizes() -> dict:
+    sizes = {}
+    for cache in cache_invalidator.caches.values():
+        sizes[(cache.name, "entries")] = len(cache.local)
+        sizes[(cache.name, "bytes")] = cache.local.bytes
+    return sizes
+
+
+registry.gauge(
+    "signaltrail_cache_local_size",
+    "In-process (L1) cache size per cache, in entries and bytes",
+    ("cache", "unit"),
+    collect=_local_cache_sizes
+)
@@ -1,17 +1,38 @@
-import h3
+import h3.api.basic_int as h3
 import math
 from typing import List, Tuple, Dict
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 
 class GeospatialService:
-    """Handles geospatial operations using H3"""
+    """
+    Handles geospatial operations using H3
+
+    H3 indexes are handled as 64-bit integers throughout the backend. The
+    high bit of a valid H3 index is reserved and always zero, so the value
+    fits a signed BIGINT column unchanged. Hex strings are only produced at
+    the API edge via h3_to_string().
+    """
     
     # H3 Resolution 10 = ~15m hexagon edge length
     DEFAULT_RESOLUTION = 10
     
+    # Minimum confidence for a cell to be used by each read path
+    NAVIGATION_MIN_CONFIDENCE = 0.3
+    HEATMAP_MIN_CONFIDENCE = 0.2
+    ESTIMATE_MIN_CONFIDENCE = 0.1  # Interpolated cells (signal_estimates)
+    
+    # Data older than this contributes no freshness to confidence
+    FRESHNESS_WINDOW_HOURS = 48.0
+    
+    # Distinct devices needed before sample volume counts fully toward confidence
+    CONTRIBUTORS_FOR_FULL_CONFIDENCE = 10
+    
+    # Hour-of-week buckets kept per aggregate
+    HOURS_PER_WEEK = 168
+    
     @staticmethod
-    def lat_lon_to_h3(lat: float, lon: float, resolution: int = DEFAULT_RESOLUTION) -> str:
+    def lat_lon_to_h3(lat: float, lon: float, resolution: int = DEFAULT_RESOLUTION) -> int:
         """
         Convert lat/lon to H3 index
         
@@ -21,17 +42,17 @@ class GeospatialService:
             resolution: H3 resolution (default 10)
             
         Returns:
-            H3 index string
+            H3 index as integer
         """
         return h3.geo_to_h3(lat, lon, resolution)
     
     @staticmethod
-    def h3_to_lat_lon(h3_index: str) -> Tuple[float, float]:
+    def h3_to_lat_lon(h3_index: int) -> Tuple[float, float]:
         """
         Convert H3 index to center lat/lon
         
         Args:
-            h3_index: H3 index string
+            h3_index: H3 index integer
             
         Returns:
             Tuple of (lat, lon)
@@ -39,7 +60,47 @@ class GeospatialService:
         return h3.h3_to_geo(h3_index)
     
     @staticmethod
-    def get_neighbors(h3_index: str, k_rings: int = 1) -> List[str]:
+    def h3_to_string(h3_index: int) -> str:
+        """
+        Render an H3 index as its canonical hex string (API edge only)
+        
+        Args:
+            h3_index: H3 index integer
+            
+        Returns:
+            H3 index string, e.g. "8a2a1072b59ffff"
+        """
+        return h3.h3_to_string(h3_index)
+    
+    @staticmethod
+    def string_to_h3(h3_string: str) -> int:
+        """
+        Parse a hex H3 index string received from a client
+        
+        Args:
+            h3_string: H3 index string
+            
+        Returns:
+            H3 index as integer
+        """
+        return h3.string_to_h3(h3_string)
+    
+    @staticmethod
+    def get_parent(h3_index: int, resolution: int) -> int:
+        """
+        Get the coarser cell containing an H3 cell
+        
+        Args:
+            h3_index: H3 index integer
+            resolution: Parent resolution (<= the cell's resolution)
+            
+        Returns:
+            Parent H3 index integer
+        """
+        return h3.h3_to_parent(h3_index, resolution)
+    
+    @staticmethod
+    def get_neighbors(h3_index: int, k_rings: int = 1) -> List[int]:
         """
         Get neighboring H3 cells
         
@@ -52,6 +113,24 @@ class GeospatialService:
         """
         return list(h3.k_ring(h3_index, k_rings))
     
+    @staticmethod
+    def hour_of_week_slot(timestamp: datetime) -> int:
+        """
+        Map a timestamp to its hour-of-week bucket
+        
+        Buckets are in UTC so that readings and queries from any client
+        time zone land in the same slot. Naive timestamps are taken as UTC.
+        
+        Args:
+            timestamp: Point in time
+            
+        Returns:
+            Slot 0-167 (Monday 00:00-00:59 UTC = 0)
+        """
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc)
+        return timestamp.weekday() * 24 + timestamp.hour
+    
     @staticmethod
     def calculate_bearing(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """
@@ -108,7 +187,8 @@ class GeospatialService:
     def calculate_confidence(
         sample_count: int,
         data_age_hours: float,
-        gps_accuracy: float = None
+        gps_accuracy: float = None,
+        contributor_count: int = None
     ) -> float:
         """
         Calculate confidence score for signal data
@@ -117,6 +197,7 @@ class GeospatialService:
             sample_count: Number of samples in cell
             data_age_hours: Hours since last update
             gps_accuracy: GPS accuracy in meters
+            contributor_count: Estimated distinct devices behind the samples
             
         Returns:
             Confidence score (0.0 to 1.0)
@@ -124,8 +205,15 @@ class GeospatialService:
         # Sample count factor (0-1)
         sample_factor = min(sample_count / 50, 1.0)
         
+        # Many samples from few devices are capped by contributor diversity
+        if contributor_count is not None:
+            contributor_factor = min(
+                contributor_count / GeospatialService.CONTRIBUTORS_FOR_FULL_CONFIDENCE, 1.0
+            )
+            sample_factor = min(sample_factor, contributor_factor)
+        
         # Freshness factor (0-1, decays over 48 hours)
-        freshness_factor = max(1.0 - (data_age_hours / 48.0), 0.0)
+        freshness_factor = max(1.0 - (data_age_hours / GeospatialService.FRESHNESS_WINDOW_HOURS), 0.0)
         
         # GPS accuracy factor (0-1, penalize poor accuracy)
         accuracy_factor = 1.0
@@ -141,13 +229,32 @@ class GeospatialService:
         
         return round(confidence, 2)
     
+    @staticmethod
+    def min_threshold_crossing_hours(threshold: float) -> float:
+        """
+        Earliest data age at which a decaying confidence can fall below threshold
+        
+        Only the freshness factor changes with age. Without GPS accuracy
+        the other factors contribute at least 0.1, so a score can only drop
+        below `threshold` once freshness * 0.5 + 0.1 < threshold.
+        
+        Args:
+            threshold: Confidence threshold
+            
+        Returns:
+            Age in hours (0 to FRESHNESS_WINDOW_HOURS)
+        """
+        freshness_at_crossing = (threshold - 0.1) / 0.5
+        decayed = min(max(1.0 - freshness_at_crossing, 0.0), 1.0)
+        return decayed * GeospatialService.FRESHNESS_WINDOW_HOURS
+    
     @staticmethod
     def get_cells_in_radius(
         lat: float,
         lon: float,
         radius_meters: int,
         resolution: int = DEFAULT_RESOLUTION
-    ) -> List[str]:
+    ) -> List[int]:
         """
         Get all H3 cells within radius
         
@@ -167,3 +274,112 @@ class GeospatialService:
         
         center_h3 = h3.geo_to_h3(lat, lon, resolution)
         return list(h3.k_ring(center_h3, k_rings))
+    
+    @staticmethod
+    def get_child_range(h3_index: int, resolution: int = DEFAULT_RESOLUTION) -> Tuple[int, int]:
+        """
+        Get the integer range spanned by a cell's descendants at a resolution
+        
+        H3 digits are stored most-significant first, so every descendant of
+        a cell at the target resolution lies between its all-zero-digit
+        child and its all-six-digit child. The values in between that are
+        not descendants contain an unused digit (7) and never occur.
+        
+        Args:
+            h3_index: Parent H3 index (resolution <= target resolution)
+            resolution: Target child resolution
+            
+        Returns:
+            Tuple of (lowest_child, highest_child), inclusive
+        """
+        low = h3.h3_to_center_child(h3_index, resolution)
+        high = low
+        for digit in range(h3.h3_get_resolution(h3_index) + 1, resolution + 1):
+            high |= 6 << ((15 - digit) * 3)
+        return low, high
+    
+    @staticmethod
+    def _next_valid_index(h3_index: int, resolution: int) -> int:
+        """
+        Smallest valid H3 index at the same resolution above h3_index
+        
+        Digits 1..resolution count in base 7, so the successor increments
+        the last digit below 6 and resets the digits after it to 0. Returns
+        -1 when the base cell would overflow.
+        """
+        for digit in range(resolution, 0, -1):
+            shift = (15 - digit) * 3
+            if (h3_index >> shift) & 7 < 6:
+                for lower in range(digit + 1, resolution + 1):
+                    h3_index &= ~(7 << ((15 - lower) * 3))
+                return h3_index + (1 << shift)
+        return -1
+    
+    @staticmethod
+    def get_cell_ranges_in_radius(
+        lat: float,
+        lon: float,
+        radius_meters: int,
+        resolution: int = DEFAULT_RESOLUTION
+    ) -> List[Tuple[int, int]]:
+        """
+        Get the cells within radius as a short list of inclusive id ranges
+        
+        The k-ring is compacted to coarser parents, each parent becomes one
+        contiguous range of child ids, and ranges with no valid id between
+        them are merged. A 5km heatmap (~17k cells) typically collapses to a
+        few hundred ranges that Postgres can serve with B-tree range scans.
+        
+        Args:
+            lat: Center latitude
+            lon: Center longitude
+            radius_meters: Radius in meters
+            resolution: H3 resolution
+            
+        Returns:
+            Sorted list of (low, high) H3 index ranges
+        """
+        cells = GeospatialService.get_cells_in_radius(lat, lon, radius_meters, resolution)
+        ranges = sorted(
+            GeospatialService.get_child_range(cell, resolution)
+            for cell in h3.compact(cells)
+        )
+        
+        merged = [ranges[0]]
+        for low, high in ranges[1:]:
+            prev_low, prev_high = merged[-1]
+            if GeospatialService._next_valid_index(prev_high, resolution) == low:
+                merged[-1] = (prev_low, high)
+            else:
+                merged.append((low, high))
+        
+        return merged
+    
+    @staticmethod
+    def subtract_ranges(
+        ranges: List[Tuple[int, int]],
+        excluded: List[Tuple[int, int]]
+    ) -> List[Tuple[int, int]]:
+        """
+        Remove excluded id ranges (e.g. from get_child_range) from a range list
+        
+        Args:
+            ranges: Sorted inclusive (low, high) ranges
+            excluded: Inclusive (low, high) ranges to cut out
+            
+        Returns:
+            Sorted list of the remaining (low, high) ranges
+        """
+        result = []
+        for low, high in ranges:
+            for cut_low, cut_high in sorted(excluded):
+                if cut_high < low or cut_low > high:
+                    continue
+                if cut_low > low:
+                    result.append((low, cut_low - 1))
+                low = cut_high + 1
+                if low > high:
+                    break
+            if low <= high:
+                result.append((low, high))
+        return result
@@ -0,0 +1,272 @@
+from sqlalchemy import select, func, cast, tuple_
+from geoalchemy2 import Geometry
+from db.database import AsyncSessionLocal
+from db.models import SignalReading
+from services.geospatial import GeospatialService
+from config import settings
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Set
+from uuid import UUID
+import asyncio
+import heapq
+import math
+import h3.api.basic_int as h3
+
+EARTH_RADIUS_METERS = 6371000
+
+
+class NearbyHotspot(NamedTuple):
+    """A hotspot returned by a nearest-neighbour query"""
+    ssid_hash: str
+    latitude: float
+    longitude: float
+    signal_dbm: int
+    sample_count: int
+    distance_meters: float
+    bearing_degrees: float
+
+
+class Hotspot:
+    """
+    Running estimate of one WiFi access point (one ssid_hash)
+    
+    The location is the centroid of its readings weighted by received
+    amplitude (10^(dBm/20)), so readings taken next to the access point
+    dominate the ones taken at the edge of its range. Strength is the
+    strongest reading seen. Both are plain sums, so new readings are
+    folded in without revisiting old ones.
+    """
+    
+    __slots__ = (
+        "weight_sum", "lat_sum", "lon_sum", "latitude", "longitude",
+        "max_signal_dbm", "sample_count", "last_seen", "bucket"
+    )
+    
+    def __init__(self):
+        self.weight_sum = 0.0
+        self.lat_sum = 0.0
+        self.lon_sum = 0.0
+        self.latitude = 0.0
+        self.longitude = 0.0
+        self.max_signal_dbm = -120
+        self.sample_count = 0
+        self.last_seen: Optional[datetime] = None
+        self.bucket: Optional[int] = None
+    
+    def add(self, lat: float, lon: float, signal_dbm: int, seen_at: datetime) -> None:
+        weight = 10 ** (signal_dbm / 20)
+        self.weight_sum += weight
+        self.lat_sum += lat * weight
+        self.lon_sum += lon * weight
+        self.latitude = self.lat_sum / self.weight_sum
+        self.longitude = self.lon_sum / self.weight_sum
+        self.max_signal_dbm = max(self.max_signal_dbm, signal_dbm)
+        self.sample_count += 1
+        if self.last_seen is None or seen_at > self.last_seen:
+            self.last_seen = seen_at
+
+
+class HotspotIndex:
+    """
+    In-memory spatial index of WiFi access points built from signal_readings
+    
+    Hotspots are bucketed by their res-9 H3 cell. A nearest query walks
+    k-rings outward from the query cell and stops as soon as the k-th best
+    candidate is closer than anything an unvisited ring could contain, so
+    a lookup touches a handful of buckets regardless of index size.
+    
+    refresh() only reads readings created since shortly before the last
+    one it saw (a range scan on the partial WiFi index), so each worker
+    keeps its own copy current cheaply.
+    """
+    
+    BUCKET_RESOLUTION = 9
+    STRONG_SIGNAL_DBM = -67  # Comfortable for browsing and calls
+    REFRESH_INTERVAL_SECONDS = 30
+    REFRESH_BATCH_SIZE = 50000
+    # created_at comes from the writing API worker: covers slow commits and clock skew
+    REFRESH_OVERLAP = timedelta(minutes=5)
+    
+    def __init__(self):
+        self.geo_service = GeospatialService()
+        self.hotspots: Dict[str, Hotspot] = {}
+        self.buckets: Dict[int, Set[str]] = {}
+        self.watermark: Optional[datetime] = None
+        self.recent_ids: Dict[UUID, datetime] = {}  # Loaded readings within REFRESH_OVERLAP of the watermark
+        self.edge_meters = h3.edge_length(self.BUCKET_RESOLUTION, unit="m")
+    
+    def add_reading(self, ssid_hash: str, lat: float, lon: float, signal_dbm: int, seen_at: datetime) -> None:
+        """Fold one WiFi reading into its hotspot and re-bucket it if it moved"""
+        hotspot = self.hotspots.get(ssid_hash)
+        if hotspot is None:
+            hotspot = self.hotspots[ssid_hash] = Hotspot()
+        hotspot.add(lat, lon, signal_dbm, seen_at)
+        
+        bucket = h3.geo_to_h3(hotspot.latitude, hotspot.longitude, self.BUCKET_RESOLUTION)
+        if bucket != hotspot.bucket:
+            if hotspot.bucket is not None:
+                self.buckets[hotspot.bucket].discard(ssid_hash)
+            self.buckets.setdefault(bucket, set()).add(ssid_hash)
+            hotspot.bucket = bucket
+    
+    def prune(self, older_than: datetime) -> int:
+        """Drop hotspots with no readings since `older_than`"""
+        stale = [key for key, hotspot in self.hotspots.items() if hotspot.last_seen < older_than]
+        for key in stale:
+            hotspot = self.hotspots.pop(key)
+            bucket = self.buckets.get(hotspot.bucket)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.buckets[hotspot.bucket]
+        return len(stale)
+    
+    async def refresh(self) -> int:
+        """
+        Load WiFi readings created since the last refresh
+        
+        A reading can commit after readings stamped later than it, so each
+        refresh re-reads REFRESH_OVERLAP below the watermark and skips ids
+        it already loaded. Pages continue after the last (created_at, id)
+        seen, so rows sharing a timestamp at a page boundary aren't lost.
+        
+        Returns:
+            Number of readings folded into the index
+        """
+        now = datetime.now(timezone.utc)
+        if self.watermark is None:
+            start = now - timedelta(days=settings.max_signal_age_days)
+        else:
+            start = self.watermark - self.REFRESH_OVERLAP
+        watermark = self.watermark
+        after = None
+        loaded = 0
+        
+        async with AsyncSessionLocal() as db:
+            while True:
+                query = select(
+                    SignalReading.id,
+                    SignalReading.ssid_hash,
+                    func.ST_Y(cast(SignalReading.location, Geometry)).label("lat"),
+                    func.ST_X(cast(SignalReading.location, Geometry)).label("lon"),
+                    SignalReading.signal_dbm,
+                    SignalReading.created_at
+                ).where(
+                    SignalReading.network_type == "WiFi",
+                    SignalReading.ssid_hash.isnot(None),
+                    SignalReading.created_at >= start
+                )
+                if after is not None:
+                    query = query.where(tuple_(SignalReading.created_at, SignalReading.id) > tuple_(*after))
+                result = await db.execute(
+                    query.order_by(SignalReading.created_at, SignalReading.id).limit(self.REFRESH_BATCH_SIZE)
+                )
+                rows = result.all()
+                
+                for row in rows:
+                    if row.id in self.recent_ids:
+                        continue
+                    self.recent_ids[row.id] = row.created_at
+                    self.add_reading(row.ssid_hash, row.lat, row.lon, row.signal_dbm, row.created_at)
+                    loaded += 1
+                
+                if rows:
+                    after = (rows[-1].created_at, rows[-1].id)
+                    watermark = max(watermark or after[0], after[0])
+                    # Older ids can't fall in the next refresh's overlap
+                    cutoff = watermark - self.REFRESH_OVERLAP
+                    self.recent_ids = {
+                        key: created_at for key, created_at in self.recent_ids.items() if created_at >= cutoff
+                    }
+                if len(rows) < self.REFRESH_BATCH_SIZE:
+                    break
+        
+        self.watermark = watermark
+        self.prune(now - timedelta(days=settings.max_signal_age_days))
+        return loaded
+    
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int = 5,
+        min_signal_dbm: int = STRONG_SIGNAL_DBM,
+        max_distance_meters: float = 1000
+    ) -> List[NearbyHotspot]:
+        """
+        Find the k nearest hotspots at least as strong as min_signal_dbm
+        
+        Args:
+            lat: Query latitude
+            lon: Query longitude
+            k: Number of hotspots to return
+            min_signal_dbm: Minimum strongest-reading dBm
+            max_distance_meters: Search radius
+        
+        Returns:
+            Hotspots sorted by distance
+        """
+        origin = h3.geo_to_h3(lat, lon, self.BUCKET_RESOLUTION)
+        candidates = []  # (distance, ssid_hash)
+        ring = 0
+        
+        # Equirectangular distance: well within 0.1% of haversine at these ranges
+        meters_per_degree = math.radians(1) * EARTH_RADIUS_METERS
+        lon_scale = math.cos(math.radians(lat))
+        
+        while True:
+            for bucket in h3.hex_ring(origin, ring) if ring else (origin,):
+                for key in self.buckets.get(bucket, ()):
+                    hotspot = self.hotspots[key]
+                    if hotspot.max_signal_dbm < min_signal_dbm:
+                        continue
+                    distance = meters_per_degree * math.hypot(
+                        hotspot.latitude - lat, (hotspot.longitude - lon) * lon_scale
+                    )
+                    if distance <= max_distance_meters:
+                        candidates.append((distance, key))
+            
+            # Anything in ring+1 or beyond is at least this far away: bucket
+            # centers in ring n are >= 1.5 * n edges apart, and both points
+            # sit within one edge of their bucket center
+            covered = (1.5 * (ring + 1) - 2) * self.edge_meters
+            if covered >= max_distance_meters:
+                break
+            if len(candidates) >= k and heapq.nsmallest(k, candidates)[-1][0] <= covered:
+                break
+            ring += 1
+        
+        results = []
+        for distance, key in heapq.nsmallest(k, candidates):
+            hotspot = self.hotspots[key]
+            results.append(NearbyHotspot(
+                ssid_hash=key,
+                latitude=hotspot.latitude,
+                longitude=hotspot.longitude,
+                signal_dbm=hotspot.max_signal_dbm,
+                sample_count=hotspot.sample_count,
+                distance_meters=round(distance, 1),
+                bearing_degrees=self.geo_service.calculate_bearing(
+                    lat, lon, hotspot.latitude, hotspot.longitude
+                )
+            ))
+        return results
+    
+    async def run_forever(self) -> None:
+        """Keep the index current; every worker maintains its own copy"""
+        while True:
+            try:
+                loaded = await self.refresh()
+                if loaded:
+                    print(f"Hotspot index loaded {loaded} WiFi readings ({len(self.hotspots)} hotspots)")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Log error and retry on the next tick
+                print(f"Hotspot index refresh failed: {e}")
+            
+            await asyncio.sleep(self.REFRESH_INTERVAL_SECONDS)
+
+
+# Shared per-process index (like replica_monitor)
+hotspot_index = HotspotIndex()
@@ -0,0 +1,245 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, insert
+from db.models import SignalAggregate, SignalEstimate
+from db.queries import h3_range_table
+from services.geospatial import GeospatialService
+from datetime import datetime, timezone
+from typing import List, Tuple
+import h3.api.basic_int as h3
+import math
+import numpy as np
+
+EARTH_RADIUS_METERS = 6371000
+
+
+def project_to_meters(lats: np.ndarray, lons: np.ndarray, ref_lat: float) -> np.ndarray:
+    """
+    Equirectangular projection around a reference latitude
+    
+    Accurate to well under 1% over the few kilometres a region job covers,
+    which is far below the noise in crowd-sourced dBm readings.
+    
+    Returns:
+        (N, 2) array of x/y meters
+    """
+    lat_rad = np.radians(lats)
+    lon_rad = np.radians(lons)
+    x = EARTH_RADIUS_METERS * lon_rad * np.cos(np.radians(ref_lat))
+    y = EARTH_RADIUS_METERS * lat_rad
+    return np.column_stack((x, y))
+
+
+def inverse_distance_weighting(
+    targets: np.ndarray,
+    sources: np.ndarray,
+    values: np.ndarray,
+    confidences: np.ndarray,
+    pair_targets: np.ndarray,
+    pair_sources: np.ndarray,
+    max_distance: float,
+    power: float = 2.0,
+    min_sources: int = 2
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized inverse-distance-weighted interpolation over candidate pairs
+    
+    Each source is weighted by confidence / distance^power and only
+    sources within max_distance count. Only the given (target, source)
+    pairs are considered, e.g. each target's H3 neighbourhood, so the work
+    grows with the number of nearby sources rather than targets x sources.
+    
+    Args:
+        targets: (T, 2) target positions in meters
+        sources: (S, 2) measured positions in meters
+        values: (S,) measured dBm
+        confidences: (S,) measured confidence scores
+        pair_targets: (P,) target index of each candidate pair
+        pair_sources: (P,) source index of each candidate pair
+        max_distance: Search radius in meters
+        power: Distance decay exponent
+        min_sources: Minimum sources within range for an estimate
+    
+    Returns:
+        Tuple of (estimates, confidences, source_counts); estimates are NaN
+        where fewer than min_sources were in range
+    """
+    estimates = np.full(len(targets), np.nan)
+    estimate_confidence = np.zeros(len(targets))
+    
+    distances = np.sqrt(((targets[pair_targets] - sources[pair_sources]) ** 2).sum(axis=1))
+    in_range = distances <= max_distance
+    pair_targets, pair_sources, distances = pair_targets[in_range], pair_sources[in_range], distances[in_range]
+    
+    # Sources closer than 1 m would dominate; clamp the denominator
+    weights = confidences[pair_sources] / np.maximum(distances, 1.0) ** power
+    weight_sum = np.bincount(pair_targets, weights, minlength=len(targets))
+    source_counts = np.bincount(pair_targets, minlength=len(targets))
+    valid = (source_counts >= min_sources) & (weight_sum > 0)
+    
+    weighted_values = np.bincount(pair_targets, weights * values[pair_sources], minlength=len(targets))
+    estimates[valid] = weighted_values[valid] / weight_sum[valid]
+    
+    # Confidence: mean source confidence, fading with distance to the nearest source
+    nearest = np.full(len(targets), np.inf)
+    np.minimum.at(nearest, pair_targets, distances)
+    mean_confidence = (
+        np.bincount(pair_targets, confidences[pair_sources], minlength=len(targets))
+        / np.maximum(source_counts, 1)
+    )
+    proximity = np.clip(1.0 - nearest / max_distance, 0.0, 1.0)
+    estimate_confidence[valid] = (mean_confidence * proximity)[valid]
+    
+    return estimates, estimate_confidence, source_counts
+
+
+class SignalInterpolator:
+    """Builds the interpolated signal surface for cells without readings"""
+    
+    # Estimates never compete with measured cells on confidence
+    CONFIDENCE_FACTOR = 0.5
+    
+    def __init__(
+        self,
+        db: AsyncSession,
+        max_distance_meters: float = 250,
+        power: float = 2.0,
+        min_sources: int = 2
+    ):
+        self.db = db
+        self.geo_service = GeospatialService()
+        self.max_distance_meters = max_distance_meters
+        self.power = power
+        self.min_sources = min_sources
+    
+    async def interpolate_area(self, lat: float, lon: float, radius_meters: int) -> int:
+        """
+        Recompute estimates for every unmeasured cell in an area
+        
+        Args:
+            lat: Center latitude
+            lon: Center longitude
+            radius_meters: Area radius
+        
+        Returns:
+            Number of estimates written
+        """
+        # Measured cells, including a margin so edge cells see their neighbours.
+        # Every measured cell is excluded from the targets; only those above
+        # the heatmap threshold serve as sources.
+        source_ranges = h3_range_table(self.geo_service.get_cell_ranges_in_radius(
+            lat, lon, radius_meters + int(self.max_distance_meters)
+        ))
+        result = await self.db.execute(
+            select(
+                SignalAggregate.h3_index,
+                SignalAggregate.avg_signal_dbm,
+                SignalAggregate.confidence_score
+            ).join(
+                source_ranges,
+                SignalAggregate.h3_index.between(source_ranges.c.low, source_ranges.c.high)
+            )
+        )
+        rows = result.all()
+        measured_cells = {row.h3_index for row in rows}
+        measured = [
+            row for row in rows
+            if row.confidence_score is not None
+            and row.confidence_score >= self.geo_service.HEATMAP_MIN_CONFIDENCE
+            and row.avg_signal_dbm is not None
+        ]
+        
+        targets = [
+            cell for cell in self.geo_service.get_cells_in_radius(lat, lon, radius_meters)
+            if cell not in measured_cells
+        ]
+        
+        estimates = self.estimate_cells(
+            targets,
+            [row.h3_index for row in measured],
+            np.array([float(row.avg_signal_dbm) for row in measured]),
+            np.array([float(row.confidence_score) for row in measured]),
+            ref_lat=lat
+        )
+        
+        # Replace the area's estimates in one transaction
+        area_ranges = h3_range_table(
+            self.geo_service.get_cell_ranges_in_radius(lat, lon, radius_meters)
+        )
+        await self.db.execute(
+            delete(SignalEstimate).where(
+                SignalEstimate.h3_index.in_(
+                    select(SignalEstimate.h3_index).join(
+                        area_ranges,
+                        SignalEstimate.h3_index.between(area_ranges.c.low, area_ranges.c.high)
+                    )
+                )
+            )
+        )
+        if estimates:
+            await self.db.execute(insert(SignalEstimate), estimates)
+        await self.db.commit()
+        
+        return len(estimates)
+    
+    def estimate_cells(
+        self,
+        targets: List[int],
+        sources: List[int],
+        values: np.ndarray,
+        confidences: np.ndarray,
+        ref_lat: float
+    ) -> List[dict]:
+        """
+        Interpolate target cells from measured source cells
+        
+        Sources for each target are looked up in its k-ring, wide enough to
+        cover max_distance_meters, instead of measuring every pair.
+        
+        Returns:
+            SignalEstimate rows (dicts) for targets with enough sources
+        """
+        if not targets or not sources:
+            return []
+        
+        # Cell centers in ring k are at least 1.5 * k edges away; one more
+        # ring covers cells smaller than the resolution's average
+        edge_meters = h3.edge_length(h3.h3_get_resolution(targets[0]), unit="m")
+        rings = math.ceil(self.max_distance_meters / (1.5 * edge_meters)) + 1
+        source_of = {cell: i for i, cell in enumerate(sources)}
+        pair_targets, pair_sources = [], []
+        for i, cell in enumerate(targets):
+            for neighbour in self.geo_service.get_neighbors(cell, rings):
+                source = source_of.get(neighbour)
+                if source is not None:
+                    pair_targets.append(i)
+                    pair_sources.append(source)
+        if not pair_targets:
+            return []
+        
+        target_coords = np.array([self.geo_service.h3_to_lat_lon(cell) for cell in targets])
+        source_coords = np.array([self.geo_service.h3_to_lat_lon(cell) for cell in sources])
+        
+        estimates, confidence, counts = inverse_distance_weighting(
+            project_to_meters(target_coords[:, 0], target_coords[:, 1], ref_lat),
+            project_to_meters(source_coords[:, 0], source_coords[:, 1], ref_lat),
+            values,
+            confidences,
+            np.array(pair_targets, dtype=np.int64),
+            np.array(pair_sources, dtype=np.int64),
+            max_distance=self.max_distance_meters,
+            power=self.power,
+            min_sources=self.min_sources
+        )
+        
+        computed_at = datetime.now(timezone.utc)
+        return [
+            {
+                "h3_index": cell,
+                "estimated_signal_dbm": round(float(estimates[i]), 2),
+                "confidence_score": round(float(confidence[i]) * self.CONFIDENCE_FACTOR, 2),
+                "source_count": int(counts[i]),
+                "computed_at": computed_at
+            }
+            for i, cell in enumerate(targets)
+            if not np.isnan(estimates[i])
+        ]
@@ -0,0 +1,327 @@
+"""
+In-process metrics in the Prometheus text format
+
+Counters, gauges and fixed-bucket histograms kept as plain Python numbers
+in the worker process and rendered by GET /metrics. Recording is a dict
+lookup and a few additions (no locks: the API runs on one event loop per
+process), so the hooks can sit on hot paths. Hold on to `labels()`
+children where a label set is known up front to skip even the lookup.
+
+Values are per process. With several uvicorn workers every scrape sees
+one of them; run one worker per container (or scrape each worker) to see
+them all.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import math
+import time
+
+# Seconds; spans Redis round trips (~0.1 ms) to slow aggregations (seconds)
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        f'{name}="{value}"'
+        for name, value in zip(names, (
+            str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values
+        ))
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Common name/help/label handling; children hold the values per label set"""
+    
+    TYPE = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+    
+    def _new_child(self):
+        raise NotImplementedError
+    
+    def labels(self, *values: str):
+        """Child for one label set (created on first use)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+    
+    def _samples(self) -> Iterable[Tuple[str, str, float]]:
+        raise NotImplementedError
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+    
+    def __init__(self):
+        self.value = 0.0
+    
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. requests or cache hits"""
+    
+    TYPE = "counter"
+    
+    def _new_child(self):
+        return _CounterChild()
+    
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].value += amount
+    
+    def _samples(self):
+        for values, child in self._children.items():
+            yield "_total", _format_labels(self.labelnames, values), child.value
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+    
+    def __init__(self):
+        self.value = 0.0
+    
+    def set(self, value: float) -> None:
+        self.value = value
+    
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+    
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down
+    
+    With `collect`, values are read at scrape time instead: a callable
+    returning {label values tuple: value}, so nothing runs on the hot path.
+    """
+    
+    TYPE = "gauge"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        collect: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+    
+    def _new_child(self):
+        return _GaugeChild()
+    
+    def set(self, value: float) -> None:
+        self._children[()].value = value
+    
+    def _samples(self):
+        if self.collect is not None:
+            try:
+                values = self.collect()
+            except Exception as e:
+                print(f"Collecting {self.name} failed: {e}")
+                values = {}
+        else:
+            values = {key: child.value for key, child in self._children.items()}
+        for key, value in values.items():
+            yield "", _format_labels(self.labelnames, key), value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+    
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+    
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+    
+    def time(self) -> "_Timer":
+        """Context manager observing the elapsed seconds"""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+    
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    """Distribution over fixed buckets (upper bounds, inclusive)"""
+    
+    TYPE = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+    
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+    
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+    
+    def time(self) -> _Timer:
+        return _Timer(self._children[()])
+    
+    def _samples(self):
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), child.counts):
+                cumulative += count
+                yield "_bucket", _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"'), cumulative
+            yield "_sum", _format_labels(self.labelnames, values), child.sum
+            yield "_count", _format_labels(self.labelnames, values), cumulative
+
+
+class MetricsRegistry:
+    """Metrics of this process, rendered together for a scrape"""
+    
+    CONTENT_TYPE = "text/plain; version=0.0.4"  # Starlette appends the charset
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+    
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), collect=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, collect))
+    
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# HTTP (middleware/metrics.py); `route` is the path template, never the raw path
+http_requests = registry.counter(
+    "signaltrail_http_requests", "HTTP requests by route and status", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "signaltrail_http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+
+# Ingestion
+ingest_batch_size = registry.histogram(
+    "signaltrail_ingest_batch_readings", "Readings per ingested batch",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+ingest_readings = registry.counter("signaltrail_ingest_readings", "Readings accepted")
+ingest_cells = registry.histogram(
+    "signaltrail_ingest_batch_cells", "Distinct H3 cells touched per ingested batch",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250)
+)
+
+# Aggregation
+aggregation_duration = registry.histogram(
+    "signaltrail_aggregation_cell_duration_seconds", "Time to aggregate one cell", ("result",)
+)
+
+# Navigation response caches
+cache_requests = registry.counter(
+    "signaltrail_cache_requests", "Response cache lookups", ("cache", "result")
+)
+
+# Per tier of services/cache.py: l1 in-process (every lookup), l2 Redis (L1 misses)
+cache_tier_requests = registry.counter(
+    "signaltrail_cache_tier_requests", "Cache lookups by tier", ("cache", "tier", "result")
+)
+
+# Rate limiting (middleware/ratelimit.py); source: local lease, redis or fallback
+rate_limit_decisions = registry.counter(
+    "signaltrail_rate_limit_decisions", "Rate limit decisions by route group", ("group", "result", "source")
+)
+
+# Redis, per command (db/database.py)
+redis_command_duration = registry.histogram(
+    "signaltrail_redis_command_duration_seconds", "Redis command round-trip time", ("command",)
+)
+redis_errors = registry.counter("signaltrail_redis_errors", "Failed Redis commands", ("command",))
+
+# Database connection pools (db/database.py)
+db_pool_checkout_wait = registry.histogram(
+    "signaltrail_db_pool_checkout_wait_seconds",
+    "Time to get a connection from the pool, including opening one",
+    ("engine",)
+)
+db_query_duration = registry.histogram(
+    "signaltrail_db_query_duration_seconds", "SQL statement execution time (db/tracing.py)"
+)
+db_n_plus_one_requests = registry.counter(
+    "signaltrail_db_n_plus_one_requests", "Requests that repeated one statement past the N+1 threshold",
+    ("method", "route")
+)
+db_pool_events = registry.counter(
+    "signaltrail_db_pool_events", "Pool checkouts, checkins, new and invalidated connections",
+    ("engine", "event")
+)
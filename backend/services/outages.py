@@ -0,0 +1,323 @@
+from services.geospatial import GeospatialService
+from services.cache import TieredCache
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import json
+import math
+
+
+# Add devices to an area's suspect set; the window starts with its first report.
+# Returns [distinct reporters, window start].
+ADD_SUSPECTS = """
+local new = redis.call('EXISTS', KEYS[1]) == 0
+redis.call('SADD', KEYS[1], unpack(ARGV, 3))
+if new then
+    redis.call('PEXPIRE', KEYS[1], ARGV[1])
+    redis.call('SET', KEYS[2], ARGV[2], 'PX', ARGV[1])
+end
+return {redis.call('SCARD', KEYS[1]), redis.call('GET', KEYS[2])}
+"""
+
+
+class Observation(NamedTuple):
+    """One ingested reading as seen by the outage detector"""
+    h3_index: int
+    carrier_hash: Optional[str]
+    device_hash: str
+    signal_dbm: int
+    timestamp: datetime
+
+
+class Baseline:
+    """Exponentially weighted mean/variance of one area's signal (one per key)"""
+    
+    __slots__ = ("mean", "variance", "weight")
+    
+    def __init__(self):
+        self.mean = 0.0
+        self.variance = 0.0
+        self.weight = 0.0  # Effective number of readings seen, saturates at 1/alpha
+    
+    def update(self, value: float, alpha: float) -> None:
+        if self.weight == 0:
+            self.mean = value
+        else:
+            delta = value - self.mean
+            self.mean += alpha * delta
+            self.variance = (1 - alpha) * (self.variance + alpha * delta * delta)
+        self.weight = min(self.weight + 1, 1 / alpha)
+
+
+class OutageDetector:
+    """
+    Flags sharp signal drops per area (and per carrier) as batches arrive
+    
+    Each area is a res-8 H3 cell (~0.7 km², roughly one tower sector).
+    Every ingested reading updates an EWMA baseline of the area's dBm,
+    overall and for the reading's carrier, so nothing is ever re-read from
+    signal_readings. A batch whose mean falls DROP_THRESHOLD_DB and
+    Z_THRESHOLD standard deviations under the baseline makes the area a
+    suspect; once MIN_REPORTERS distinct devices confirm within
+    SUSPECT_WINDOW it is an outage. Anomalous readings never enter the
+    baseline, so a lasting outage doesn't become the new normal.
+    
+    Baselines are kept in a bounded LRU in each worker. Suspect devices
+    and active outages go to Redis, so reports of one area landing on
+    different workers add up, and every worker (and the API) sees the
+    same list; outages expire unless re-confirmed and are cleared as soon
+    as a normal batch arrives at any worker.
+    """
+    
+    DETECTION_RESOLUTION = 8
+    AREA_RADIUS_METERS = 600  # Center-to-vertex distance of a res-8 cell, rounded up
+    MAX_TRACKED_AREAS = 200000  # ~200 bytes each
+    
+    ALPHA = 0.05  # Per-reading EWMA weight (~20-reading memory)
+    MIN_BASELINE_WEIGHT = 10  # Readings before an area can alarm
+    MIN_BATCH_READINGS = 3
+    DROP_THRESHOLD_DB = 15.0
+    Z_THRESHOLD = 3.0
+    MIN_REPORTERS = 2
+    SUSPECT_WINDOW = timedelta(minutes=15)
+    OUTAGE_TTL = timedelta(minutes=30)
+    
+    # Older readings (offline uploads) update nothing: they say nothing about now
+    MAX_READING_AGE = timedelta(minutes=15)
+    
+    ACTIVE_KEY = "outages:active"  # Sorted set of outage ids scored by expiry
+    DETAIL_KEY = "outages:detail"  # Hash of outage id -> JSON
+    
+    def __init__(self, max_tracked_areas: int = MAX_TRACKED_AREAS):
+        self.max_tracked_areas = max_tracked_areas
+        self.baselines: "OrderedDict[Tuple[int, Optional[str]], Baseline]" = OrderedDict()
+        self._add_suspects = None
+    
+    @staticmethod
+    def outage_id(area: int, carrier_hash: Optional[str]) -> str:
+        return f"{area:x}:{carrier_hash or '*'}"
+    
+    @staticmethod
+    def suspects_key(outage_id: str) -> str:
+        """Set of devices that reported a drop in the current suspect window"""
+        return f"outages:suspects:{outage_id}"
+    
+    @staticmethod
+    def suspect_since_key(outage_id: str) -> str:
+        return f"outages:suspect_since:{outage_id}"
+    
+    def _baseline(self, key: Tuple[int, Optional[str]]) -> Baseline:
+        baseline = self.baselines.get(key)
+        if baseline is None:
+            baseline = self.baselines[key] = Baseline()
+            if len(self.baselines) > self.max_tracked_areas:
+                self.baselines.popitem(last=False)
+        else:
+            self.baselines.move_to_end(key)
+        return baseline
+    
+    def evaluate(self, observations: Iterable[Observation], now: datetime = None) -> Tuple[List[dict], List[str]]:
+        """
+        Fold a batch into the baselines and classify each area it touched
+        
+        Args:
+            observations: Readings from one ingest batch
+            now: Evaluation time (default: now, UTC)
+        
+        Each area comes out as a drop, normal (its batch mean is within
+        DROP_THRESHOLD_DB of an established baseline) or inconclusive (too
+        few readings, too little history, or a drop within the usual
+        spread). Only batches close to the baseline update it, and
+        inconclusive areas keep their suspects and outages.
+        
+        Returns:
+            Tuple of (drops as outage dicts plus the reporting `devices`,
+            ids of areas that look normal)
+        """
+        now = now or datetime.now(timezone.utc)
+        
+        # Group the batch by area overall and by area + carrier
+        groups: Dict[Tuple[int, Optional[str]], List[Observation]] = {}
+        for obs in observations:
+            timestamp = obs.timestamp if obs.timestamp.tzinfo else obs.timestamp.replace(tzinfo=timezone.utc)
+            if now - timestamp > self.MAX_READING_AGE:
+                continue
+            area = GeospatialService.get_parent(obs.h3_index, self.DETECTION_RESOLUTION)
+            groups.setdefault((area, None), []).append(obs)
+            if obs.carrier_hash:
+                groups.setdefault((area, obs.carrier_hash), []).append(obs)
+        
+        drops = []
+        normal = []
+        for key, group in groups.items():
+            baseline = self._baseline(key)
+            batch_mean = sum(obs.signal_dbm for obs in group) / len(group)
+            
+            std = math.sqrt(baseline.variance)
+            drop = baseline.mean - batch_mean
+            established = baseline.weight >= self.MIN_BASELINE_WEIGHT
+            
+            # Close to the baseline (or the first batch seen): the area looks normal.
+            # Single low readings inside it are left out so they can't drag it down.
+            if baseline.weight == 0 or drop < self.DROP_THRESHOLD_DB:
+                for obs in group:
+                    if baseline.weight == 0 or baseline.mean - obs.signal_dbm <= self.DROP_THRESHOLD_DB:
+                        baseline.update(obs.signal_dbm, self.ALPHA)
+                # A baseline still warming up can't vouch that another worker's outage is over
+                if established:
+                    normal.append(self.outage_id(*key))
+                continue
+            
+            # Far below: a drop only if it is backed by enough readings and history,
+            # and is large for this area's usual spread; otherwise inconclusive
+            is_drop = (
+                established
+                and len(group) >= self.MIN_BATCH_READINGS
+                and drop >= self.Z_THRESHOLD * std
+            )
+            if not is_drop:
+                continue
+            
+            area, carrier_hash = key
+            drops.append({
+                "id": self.outage_id(area, carrier_hash),
+                "h3_index": GeospatialService.h3_to_string(area),
+                "carrier_hash": carrier_hash,
+                "baseline_dbm": round(baseline.mean, 1),
+                "observed_dbm": round(batch_mean, 1),
+                "drop_db": round(drop, 1),
+                "z_score": round(drop / std, 1) if std > 0 else None,
+                "devices": sorted({obs.device_hash for obs in group}),
+                "updated_at": now.isoformat()
+            })
+        
+        return drops, normal
+    
+    async def observe(self, redis, observations: Iterable[Observation], now: datetime = None) -> None:
+        """
+        Evaluate an ingest batch and publish outage changes to Redis
+        
+        Drops add their devices to the area's shared suspect set, which
+        expires SUSPECT_WINDOW after its first report; the area becomes an
+        outage once the set holds MIN_REPORTERS devices. A normal batch
+        clears the suspect set and the outage.
+        
+        Args:
+            redis: Redis client
+            observations: Readings from one ingest batch
+            now: Evaluation time (default: now, UTC)
+        """
+        now = now or datetime.now(timezone.utc)
+        drops, normal = self.evaluate(observations, now)
+        if not drops and not normal:
+            return
+        if self._add_suspects is None:
+            self._add_suspects = redis.register_script(ADD_SUSPECTS)
+        
+        window_ms = int(self.SUSPECT_WINDOW.total_seconds() * 1000)
+        outages = []
+        for drop in drops:
+            reporters, detected_at = await self._add_suspects(
+                keys=[self.suspects_key(drop["id"]), self.suspect_since_key(drop["id"])],
+                args=[window_ms, now.isoformat(), *drop.pop("devices")]
+            )
+            if reporters >= self.MIN_REPORTERS:
+                outages.append({**drop, "reporters": reporters, "detected_at": detected_at})
+        
+        recovered = []
+        if normal:
+            pipe = redis.pipeline(transaction=False)
+            for outage_id in normal:
+                pipe.delete(self.suspects_key(outage_id), self.suspect_since_key(outage_id))
+                pipe.zrem(self.ACTIVE_KEY, outage_id)
+            results = await pipe.execute()
+            recovered = [
+                outage_id for outage_id, suspects, active in zip(normal, results[::2], results[1::2])
+                if suspects or active
+            ]
+        if not outages and not recovered:
+            return
+        
+        expires_at = (now + self.OUTAGE_TTL).timestamp()
+        pipe = redis.pipeline(transaction=False)
+        for outage in outages:
+            pipe.zadd(self.ACTIVE_KEY, {outage["id"]: expires_at})
+            pipe.hset(self.DETAIL_KEY, outage["id"], json.dumps(outage))
+        if recovered:
+            pipe.hdel(self.DETAIL_KEY, *recovered)
+        await pipe.execute()
+        await active_outages_cache.invalidate(redis, "active")
+        
+        for outage in outages:
+            print(f"Outage in {outage['h3_index']} ({outage['carrier_hash'] or 'all carriers'}): "
+                  f"{outage['observed_dbm']} dBm vs baseline {outage['baseline_dbm']} dBm")
+    
+    @classmethod
+    async def active(cls, redis, now: datetime = None) -> List[dict]:
+        """
+        List unexpired outages, most recently confirmed first
+        
+        Args:
+            redis: Redis client
+            now: Current time (default: now, UTC)
+        
+        Returns:
+            Outage dicts as produced by evaluate()
+        """
+        now = now or datetime.now(timezone.utc)
+        
+        # Drop expired entries from both structures
+        expired = await redis.zrangebyscore(cls.ACTIVE_KEY, "-inf", now.timestamp())
+        if expired:
+            pipe = redis.pipeline(transaction=False)
+            pipe.zrem(cls.ACTIVE_KEY, *expired)
+            pipe.hdel(cls.DETAIL_KEY, *expired)
+            await pipe.execute()
+        
+        ids = await redis.zrevrangebyscore(cls.ACTIVE_KEY, "+inf", now.timestamp())
+        if not ids:
+            return []
+        details = await redis.hmget(cls.DETAIL_KEY, ids)
+        return [json.loads(detail) for detail in details if detail]
+    
+    @classmethod
+    async def outage_areas(
+        cls,
+        redis,
+        lat: float,
+        lon: float,
+        radius_meters: int,
+        carrier_hash: Optional[str] = None
+    ) -> List[int]:
+        """
+        Areas with an active outage that overlap a search radius
+        
+        Args:
+            redis: Redis client
+            lat: Search center latitude
+            lon: Search center longitude
+            radius_meters: Search radius
+            carrier_hash: Also include this carrier's own outages
+        
+        Returns:
+            Sorted H3 indexes at DETECTION_RESOLUTION
+        """
+        areas = set()
+        # Read on every navigation request: kept per worker until observe() changes it
+        outages = await active_outages_cache.get_or_load("active", lambda: cls.active(redis))
+        for outage in outages:
+            if outage["carrier_hash"] not in (None, carrier_hash):
+                continue
+            area = GeospatialService.string_to_h3(outage["h3_index"])
+            area_lat, area_lon = GeospatialService.h3_to_lat_lon(area)
+            distance = GeospatialService.calculate_distance(lat, lon, area_lat, area_lon)
+            if distance <= radius_meters + cls.AREA_RADIUS_METERS:
+                areas.add(area)
+        return sorted(areas)
+
+
+# Active outage list, in-process in front of the Redis structures (see services/cache.py)
+active_outages_cache = TieredCache("outages")
+
+# Shared per-process detector (baselines are per worker, suspects and outages are shared)
+outage_detector = OutageDetector()
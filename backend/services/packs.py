@@ -0,0 +1,261 @@
+"""
+Offline region packs: compact binary snapshots of signal aggregates
+
+A pack holds every aggregate cell of one res-5 region (~250 km², a city)
+in three column arrays behind a fixed 32-byte header. See
+REGION_PACK_FORMAT.md for the byte layout. Readers mmap the file and view
+the columns as numpy arrays without copying; lookups are binary searches
+on the sorted id column.
+"""
+from services.geospatial import GeospatialService
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import mmap
+import os
+import struct
+import zlib
+import numpy as np
+
+MAGIC = b"STPK"
+FORMAT_VERSION = 1
+
+# magic, format version, cell resolution, reserved, cell count,
+# created_at (unix seconds), data version (heatmap sync version at export), payload CRC32
+HEADER = struct.Struct("<4sHBBIQQI")
+HEADER_SIZE = 32  # HEADER.size (28) padded so the uint64 column is 8-byte aligned
+
+PACK_RESOLUTION = 5
+CONFIDENCE_SCALE = 100  # uint8 confidence is stored in hundredths
+
+
+class PackHeader(NamedTuple):
+    """Decoded pack header"""
+    format_version: int
+    resolution: int
+    cell_count: int
+    created_at: datetime
+    data_version: int
+    crc32: int
+
+
+class PackFormatError(ValueError):
+    """The file is not a readable region pack"""
+
+
+def pack_filename(region: int) -> str:
+    return f"{GeospatialService.h3_to_string(region)}.stpk"
+
+
+def encode_pack(
+    h3_indexes: np.ndarray,
+    signal_dbm: np.ndarray,
+    confidence: np.ndarray,
+    data_version: int,
+    resolution: int = GeospatialService.DEFAULT_RESOLUTION,
+    created_at: datetime = None
+) -> bytes:
+    """
+    Serialize cells into the pack format
+    
+    Args:
+        h3_indexes: H3 ids (any order; they are sorted here)
+        signal_dbm: Average dBm per cell, rounded to int8
+        confidence: Confidence 0..1 per cell, stored as uint8 hundredths
+        data_version: Heatmap sync version read before the snapshot
+        resolution: H3 resolution of the cells
+        created_at: Export time (default: now, UTC)
+    
+    Returns:
+        Pack file contents
+    """
+    order = np.argsort(h3_indexes, kind="stable")
+    ids = np.asarray(h3_indexes, dtype="<u8")[order]
+    dbm = np.clip(np.rint(np.asarray(signal_dbm, dtype=np.float64)[order]), -128, 127).astype(np.int8)
+    conf = np.clip(
+        np.rint(np.asarray(confidence, dtype=np.float64)[order] * CONFIDENCE_SCALE), 0, CONFIDENCE_SCALE
+    ).astype(np.uint8)
+    
+    payload = ids.tobytes() + dbm.tobytes() + conf.tobytes()
+    created_at = created_at or datetime.now(timezone.utc)
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        resolution,
+        0,
+        len(ids),
+        int(created_at.timestamp()),
+        data_version,
+        zlib.crc32(payload)
+    )
+    return header.ljust(HEADER_SIZE, b"\0") + payload
+
+
+def write_pack(path: str, data: bytes) -> None:
+    """Write a pack atomically so readers and the static server never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class RegionPack:
+    """
+    Read-only, memory-mapped view of one pack file
+    
+    The id, dBm and confidence columns are numpy views straight onto the
+    mapping: opening a pack reads only the header, and the OS pages in
+    just the parts a lookup touches.
+    """
+    
+    def __init__(self, path: str, verify: bool = False):
+        self.path = path
+        stat = os.stat(path)
+        self.mtime = stat.st_mtime
+        # Checked before mapping: an empty file can't be mapped at all
+        if stat.st_size < HEADER_SIZE:
+            raise PackFormatError(f"{path}: truncated header")
+        
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        self.header = self._read_header()
+        n = self.header.cell_count
+        if len(self._mmap) != HEADER_SIZE + n * 10:
+            raise PackFormatError(f"{path}: expected {HEADER_SIZE + n * 10} bytes, found {len(self._mmap)}")
+        
+        self.ids = np.frombuffer(self._mmap, dtype="<u8", count=n, offset=HEADER_SIZE)
+        self.signal_dbm = np.frombuffer(self._mmap, dtype=np.int8, count=n, offset=HEADER_SIZE + n * 8)
+        self.confidence = np.frombuffer(self._mmap, dtype=np.uint8, count=n, offset=HEADER_SIZE + n * 9)
+        
+        if verify and zlib.crc32(self._mmap[HEADER_SIZE:]) != self.header.crc32:
+            raise PackFormatError(f"{path}: checksum mismatch")
+    
+    def _read_header(self) -> PackHeader:
+        magic, version, resolution, _, count, created_at, data_version, crc = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise PackFormatError(f"{self.path}: not a region pack")
+        if version != FORMAT_VERSION:
+            raise PackFormatError(f"{self.path}: unsupported format version {version}")
+        return PackHeader(
+            format_version=version,
+            resolution=resolution,
+            cell_count=count,
+            created_at=datetime.fromtimestamp(created_at, tz=timezone.utc),
+            data_version=data_version,
+            crc32=crc
+        )
+    
+    def __len__(self) -> int:
+        return self.header.cell_count
+    
+    def get(self, h3_index: int) -> Optional[Tuple[int, float]]:
+        """
+        Look up one cell
+        
+        Returns:
+            (signal_dbm, confidence) or None if the cell is not in the pack
+        """
+        i = int(np.searchsorted(self.ids, np.uint64(h3_index)))
+        if i < len(self.ids) and int(self.ids[i]) == h3_index:
+            return int(self.signal_dbm[i]), self.confidence[i] / CONFIDENCE_SCALE
+        return None
+    
+    def best_in_ranges(
+        self,
+        ranges: List[Tuple[int, int]],
+        min_confidence: float
+    ) -> Optional[Tuple[int, int, float]]:
+        """
+        Strongest cell within inclusive H3 id ranges
+        
+        Args:
+            ranges: (low, high) ranges, e.g. from get_cell_ranges_in_radius
+            min_confidence: Minimum confidence score
+        
+        Returns:
+            (h3_index, signal_dbm, confidence) or None
+        """
+        if not ranges:
+            return None
+        lows = np.searchsorted(self.ids, np.array([low for low, _ in ranges], dtype=np.uint64), side="left")
+        highs = np.searchsorted(self.ids, np.array([high for _, high in ranges], dtype=np.uint64), side="right")
+        if not (highs > lows).any():
+            return None
+        
+        positions = np.concatenate([np.arange(lo, hi) for lo, hi in zip(lows, highs) if hi > lo])
+        positions = positions[self.confidence[positions] >= round(min_confidence * CONFIDENCE_SCALE)]
+        if not len(positions):
+            return None
+        
+        best = positions[np.argmax(self.signal_dbm[positions])]
+        return int(self.ids[best]), int(self.signal_dbm[best]), self.confidence[best] / CONFIDENCE_SCALE
+
+
+class PackStore:
+    """
+    Opens packs from a directory on demand and reopens them when re-exported
+    
+    Used as a read path when the database can't answer: a pack covering
+    the query point serves /navigate/vector with the same bearing logic.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.packs: Dict[int, RegionPack] = {}
+        self.geo_service = GeospatialService()
+    
+    def pack_for(self, region: int) -> Optional[RegionPack]:
+        path = os.path.join(self.directory, pack_filename(region))
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            self.packs.pop(region, None)
+            return None
+        
+        pack = self.packs.get(region)
+        if pack is None or pack.mtime != mtime:
+            # The old mapping is released once no view references it
+            pack = self.packs[region] = RegionPack(path)
+        return pack
+    
+    def best_signal_in_area(self, lat: float, lon: float, radius_meters: int) -> Optional[Dict]:
+        """
+        Same result shape as SignalAggregator.get_best_signal_in_area, from packs
+        
+        Returns:
+            Dict with bearing, distance, and signal info, or None
+        """
+        ranges = self.geo_service.get_cell_ranges_in_radius(lat, lon, radius_meters)
+        
+        # A search circle can straddle regions; ask every pack it touches
+        regions = {
+            self.geo_service.get_parent(cell, PACK_RESOLUTION)
+            for cell in self.geo_service.get_cells_in_radius(lat, lon, radius_meters, PACK_RESOLUTION + 2)
+        }
+        best = None
+        for region in regions:
+            pack = self.pack_for(region)
+            if pack is None:
+                continue
+            candidate = pack.best_in_ranges(ranges, self.geo_service.NAVIGATION_MIN_CONFIDENCE)
+            if candidate and (best is None or candidate[1] > best[1]):
+                best = candidate
+        if best is None:
+            return None
+        
+        h3_index, signal_dbm, confidence = best
+        target_lat, target_lon = self.geo_service.h3_to_lat_lon(h3_index)
+        
+        current_h3 = self.geo_service.lat_lon_to_h3(lat, lon)
+        current_pack = self.pack_for(self.geo_service.get_parent(current_h3, PACK_RESOLUTION))
+        current = current_pack.get(current_h3) if current_pack else None
+        
+        return {
+            "bearing_degrees": self.geo_service.calculate_bearing(lat, lon, target_lat, target_lon),
+            "distance_meters": self.geo_service.calculate_distance(lat, lon, target_lat, target_lon),
+            "confidence_score": confidence,
+            "target_signal_dbm": signal_dbm,
+            "current_signal_dbm": current[0] if current else None
+        }
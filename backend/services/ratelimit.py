@@ -0,0 +1,289 @@
+"""
+Distributed token-bucket rate limiting
+
+Each client (token subject, else IP address) gets one bucket per route
+group, holding up to the group's per-minute budget and refilling at
+budget / 60 per second. The bucket lives in Redis and is updated by one
+Lua script, so all workers share it and concurrent requests can't
+overspend it.
+
+Workers don't take one token per request: they take a share of the
+bucket (LOCAL_SHARE of the budget) and spend it locally, so most allowed
+requests never reach Redis. Unspent tokens are given up after
+LOCAL_LEASE_SECONDS; a client bouncing between workers can lose a few,
+never gain. A denial is remembered locally until the bucket has a token
+again, so a flooding client costs one Redis call per refill. If Redis is
+unreachable, each worker falls back to its own bucket with the full
+budget.
+
+Anonymous clients are keyed by address only: any value a client picks
+itself (a device id header, the left of X-Forwarded-For) would let it
+start a fresh bucket on every request. Behind a load balancer the peer
+address is the balancer's, so RATE_LIMIT_TRUSTED_PROXIES lists the
+proxies whose X-Forwarded-For entries are believed.
+"""
+from db.database import get_redis
+from middleware.auth import AuthMiddleware
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+import ipaddress
+import math
+import time
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+# KEYS[1] bucket; ARGV: capacity, refill per second, tokens wanted
+# Returns {tokens granted (0 = denied), ms until the next token when denied}
+TAKE_TOKENS = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local wanted = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + (now - ts) * rate / 1000)
+
+local granted = 0
+local wait_ms = 0
+if tokens >= 1 then
+    granted = math.min(wanted, math.floor(tokens))
+    tokens = tokens - granted
+else
+    wait_ms = math.ceil((1 - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return {granted, wait_ms}
+"""
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    retry_after: float  # Seconds until a request can succeed (0 when allowed)
+    source: str  # "local", "redis" or "fallback"
+
+
+class _Lease:
+    __slots__ = ("tokens", "expires_at", "blocked_until")
+    
+    def __init__(self):
+        self.tokens = 0
+        self.expires_at = 0.0
+        self.blocked_until = 0.0
+
+
+class TokenBucket:
+    """Plain in-process token bucket (the fallback while Redis is down)"""
+    
+    __slots__ = ("capacity", "rate", "tokens", "updated_at")
+    
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+    
+    def take(self) -> Tuple[bool, float]:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Per-worker front of the shared Redis buckets
+    
+    Local state (leases, remembered denials, fallback buckets) is kept for
+    at most MAX_LOCAL_KEYS clients, least recently seen dropped first.
+    """
+    
+    KEY_PREFIX = "ratelimit"
+    LOCAL_SHARE = 0.1  # Fraction of a budget taken from Redis at once
+    LOCAL_LEASE_SECONDS = 2.0
+    MAX_LOCAL_KEYS = 100000
+    
+    def __init__(self, redis=None):
+        self._redis = redis
+        self._script = None
+        self._leases: "OrderedDict[str, _Lease]" = OrderedDict()
+        self._fallback: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._fallback_logged_at = -math.inf
+    
+    async def _take_script(self):
+        if self._script is None:
+            if self._redis is None:
+                self._redis = await get_redis()
+            self._script = self._redis.register_script(TAKE_TOKENS)
+        return self._script
+    
+    @staticmethod
+    def _bounded_get(entries: OrderedDict, key: str, factory, limit: int):
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = factory()
+            if len(entries) > limit:
+                entries.popitem(last=False)
+        else:
+            entries.move_to_end(key)
+        return entry
+    
+    async def check(self, group: str, identity: str, per_minute: int) -> Decision:
+        """
+        Spend one token of a client's budget for a route group
+        
+        Args:
+            group: Route group the budget applies to
+            identity: Client key, e.g. "sub:<id>", "dev:<hash>" or "ip:<addr>"
+            per_minute: Requests per minute (also the burst size)
+        
+        Returns:
+            Decision; retry_after is set when denied
+        """
+        key = f"{self.KEY_PREFIX}:{group}:{identity}"
+        now = time.monotonic()
+        lease = self._bounded_get(self._leases, key, _Lease, self.MAX_LOCAL_KEYS)
+        
+        if lease.blocked_until > now:
+            return Decision(False, lease.blocked_until - now, "local")
+        if lease.tokens > 0 and lease.expires_at > now:
+            lease.tokens -= 1
+            return Decision(True, 0.0, "local")
+        
+        wanted = max(1, int(per_minute * self.LOCAL_SHARE))
+        try:
+            script = await self._take_script()
+            granted, wait_ms = await script(keys=[key], args=[per_minute, per_minute / 60, wanted])
+        except Exception as e:
+            # Redis unavailable: limit per worker rather than not at all
+            if now - self._fallback_logged_at >= 60:
+                print(f"Rate limiter falling back to local buckets: {e}")
+                self._fallback_logged_at = now
+            bucket = self._bounded_get(
+                self._fallback, key, lambda: TokenBucket(per_minute, per_minute / 60), self.MAX_LOCAL_KEYS
+            )
+            allowed, retry_after = bucket.take()
+            return Decision(allowed, retry_after, "fallback")
+        
+        granted = int(granted)
+        if granted == 0:
+            lease.tokens = 0
+            lease.blocked_until = now + int(wait_ms) / 1000
+            return Decision(False, int(wait_ms) / 1000, "redis")
+        lease.tokens = granted - 1
+        lease.expires_at = now + self.LOCAL_LEASE_SECONDS
+        return Decision(True, 0.0, "redis")
+
+
+def parse_route_budgets(spec: str) -> Dict[str, int]:
+    """
+    Parse "prefix=per_minute,..." route budgets
+    
+    Returns:
+        Path prefix -> requests per minute, longest prefix first
+    """
+    budgets = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        prefix, _, per_minute = item.partition("=")
+        budgets[prefix.strip()] = int(per_minute)
+    return dict(sorted(budgets.items(), key=lambda item: -len(item[0])))
+
+
+def retry_after_header(seconds: float) -> str:
+    """Retry-After value: whole seconds, at least 1"""
+    return str(max(1, math.ceil(seconds)))
+
+
+def match_budget(path: str, budgets: Dict[str, int], default: int) -> Tuple[str, int]:
+    """(route group, per-minute budget) for a request path"""
+    for prefix, per_minute in budgets.items():
+        if path.startswith(prefix):
+            return prefix, per_minute
+    return "default", default
+
+
+def parse_networks(spec: str) -> List[Network]:
+    """Parse "addr,cidr,..." (e.g. RATE_LIMIT_TRUSTED_PROXIES) into networks"""
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in spec.split(",") if item.strip()]
+
+
+def _is_trusted(address: str, trusted: List[Network]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted)
+
+
+def client_ip(scope, headers: Dict[bytes, bytes], trusted: List[Network] = ()) -> Optional[str]:
+    """
+    Client address, looking through trusted proxies only
+    
+    X-Forwarded-For is read from the right (the hop nearest us): each
+    trusted proxy vouches for the entry before it, and the first address
+    that isn't a trusted proxy is the client. Entries a client wrote
+    itself sit further left and are never reached.
+    
+    Args:
+        scope: ASGI scope
+        headers: Request headers (lower-case names)
+        trusted: Proxy networks (parse_networks)
+    """
+    client = scope.get("client")
+    if not client:
+        return None
+    address = client[0]
+    if not trusted or not _is_trusted(address, trusted):
+        return address
+    
+    forwarded = headers.get(b"x-forwarded-for")
+    if forwarded:
+        for hop in reversed(forwarded.decode("latin-1").split(",")):
+            hop = hop.strip()
+            if not hop:
+                continue
+            address = hop
+            if not _is_trusted(hop, trusted):
+                break
+    return address
+
+
+def client_identity(
+    scope,
+    headers: Dict[bytes, bytes],
+    trusted: List[Network] = ()
+) -> Optional[str]:
+    """
+    Who a request is charged to: verified token subject, else client IP
+    
+    Args:
+        scope: ASGI scope
+        headers: Request headers (lower-case names)
+        trusted: Proxies whose X-Forwarded-For is believed (parse_networks)
+    """
+    authorization = headers.get(b"authorization")
+    if authorization:
+        scheme, _, token = authorization.decode("latin-1").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                subject = AuthMiddleware.verify_token(token.strip()).get("sub")
+            except Exception:
+                subject = None  # Invalid tokens are charged to the IP
+            if subject:
+                return f"sub:{subject}"
+    
+    address = client_ip(scope, headers, trusted)
+    return f"ip:{address}" if address else None
@@ -0,0 +1,170 @@
+from sqlalchemy import select, update
+from db.database import AsyncSessionLocal, get_redis
+from db.models import SignalAggregate, SignalAggregateSlice
+from services.geospatial import GeospatialService
+from config import settings
+from datetime import datetime, timedelta, timezone
+import asyncio
+
+
+class ConfidenceRefresher:
+    """
+    Re-scores aggregates and slices whose confidence decayed below a read threshold
+    
+    A cell's confidence is only recomputed by aggregate_cell when new
+    readings arrive, but its freshness factor keeps decaying. Every
+    `aggregation_interval_minutes` this job finds the cells (and network
+    type / carrier slices) whose score crossed one of the navigation/heatmap
+    thresholds since the previous run and rewrites just those rows.
+    
+    Candidates come from index range scans on last_updated: a cell can
+    only cross threshold T between min_threshold_crossing_hours(T) and
+    FRESHNESS_WINDOW_HOURS after its last reading, so only cells whose age
+    entered that band since the last run need to be looked at.
+    """
+    
+    THRESHOLDS = (
+        GeospatialService.HEATMAP_MIN_CONFIDENCE,
+        GeospatialService.NAVIGATION_MIN_CONFIDENCE,
+    )
+    
+    # Redis keys shared by all workers so only one of them runs each interval
+    LOCK_KEY = "jobs:confidence_refresh:lock"
+    LAST_RUN_KEY = "jobs:confidence_refresh:last_run"
+    
+    def __init__(self, interval_minutes: int = None):
+        self.interval_minutes = interval_minutes or settings.aggregation_interval_minutes
+        self.geo_service = GeospatialService()
+    
+    def _crossed(self, stored, confidence: float) -> bool:
+        """Whether a stored score still passes a threshold the decayed one fails"""
+        return any(float(stored or 0) >= threshold > confidence for threshold in self.THRESHOLDS)
+    
+    async def run_once(self) -> int:
+        """
+        Refresh confidence for cells that crossed a threshold since the last run
+        
+        Returns:
+            Number of cells updated
+        """
+        redis = await get_redis()
+        now = datetime.now(timezone.utc)
+        
+        last_run = await redis.get(self.LAST_RUN_KEY)
+        if last_run:
+            previous_run = datetime.fromisoformat(last_run)
+        else:
+            # First run: cover every cell that may still be decaying
+            previous_run = now - timedelta(hours=self.geo_service.FRESHNESS_WINDOW_HOURS)
+        
+        earliest_crossing = min(
+            self.geo_service.min_threshold_crossing_hours(threshold)
+            for threshold in self.THRESHOLDS
+        )
+        window_start = previous_run - timedelta(hours=self.geo_service.FRESHNESS_WINDOW_HOURS)
+        window_end = now - timedelta(hours=earliest_crossing)
+        
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(
+                    SignalAggregate.h3_index,
+                    SignalAggregate.sample_count,
+                    SignalAggregate.contributor_count,
+                    SignalAggregate.confidence_score,
+                    SignalAggregate.last_updated
+                ).where(
+                    SignalAggregate.last_updated > window_start,
+                    SignalAggregate.last_updated <= window_end
+                )
+            )
+            
+            changes = []
+            for row in result:
+                data_age = (now - row.last_updated).total_seconds() / 3600
+                confidence = self.geo_service.calculate_confidence(
+                    sample_count=row.sample_count or 0,
+                    data_age_hours=data_age,
+                    contributor_count=row.contributor_count
+                )
+                if self._crossed(row.confidence_score, confidence):
+                    changes.append({
+                        "h3_index": row.h3_index,
+                        "confidence_score": confidence,
+                        "data_freshness_hours": int(data_age)
+                    })
+            
+            # Slices decay the same way (they carry no contributor count)
+            result = await db.execute(
+                select(
+                    SignalAggregateSlice.dimension,
+                    SignalAggregateSlice.dimension_value,
+                    SignalAggregateSlice.h3_index,
+                    SignalAggregateSlice.sample_count,
+                    SignalAggregateSlice.confidence_score,
+                    SignalAggregateSlice.last_updated
+                ).where(
+                    SignalAggregateSlice.last_updated > window_start,
+                    SignalAggregateSlice.last_updated <= window_end
+                )
+            )
+            
+            slice_changes = []
+            for row in result:
+                data_age = (now - row.last_updated).total_seconds() / 3600
+                confidence = self.geo_service.calculate_confidence(
+                    sample_count=row.sample_count or 0,
+                    data_age_hours=data_age
+                )
+                if self._crossed(row.confidence_score, confidence):
+                    slice_changes.append({
+                        "dimension": row.dimension,
+                        "dimension_value": row.dimension_value,
+                        "h3_index": row.h3_index,
+                        "confidence_score": confidence
+                    })
+            
+            if changes:
+                # Bulk UPDATE ... WHERE h3_index = :h3_index (executemany)
+                await db.execute(update(SignalAggregate), changes)
+            if slice_changes:
+                await db.execute(update(SignalAggregateSlice), slice_changes)
+                
+                # Heatmap deltas follow the aggregate's change_xid: rewrite the
+                # parents not updated above so their trigger stamps this change
+                touched = {change["h3_index"] for change in slice_changes}
+                touched -= {change["h3_index"] for change in changes}
+                if touched:
+                    await db.execute(
+                        update(SignalAggregate)
+                        .where(SignalAggregate.h3_index.in_(touched))
+                        .values(confidence_score=SignalAggregate.confidence_score)
+                    )
+            if changes or slice_changes:
+                await db.commit()
+        
+        await redis.set(self.LAST_RUN_KEY, now.isoformat())
+        return len(changes) + len(slice_changes)
+    
+    async def run_forever(self) -> None:
+        """Run the refresh every interval; one worker per interval holds the lock"""
+        interval_seconds = self.interval_minutes * 60
+        
+        while True:
+            try:
+                redis = await get_redis()
+                # Lock expires slightly before the next tick so a crashed
+                # worker never blocks the following interval
+                acquired = await redis.set(
+                    self.LOCK_KEY, "1", nx=True, ex=max(interval_seconds - 5, 1)
+                )
+                if acquired:
+                    updated = await self.run_once()
+                    if updated:
+                        print(f"Confidence refresh updated {updated} decayed cells and slices")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Log error and retry on the next tick
+                print(f"Confidence refresh failed: {e}")
+            
+            await asyncio.sleep(interval_seconds)
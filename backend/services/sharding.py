@@ -0,0 +1,331 @@
+"""
+Region-sharded aggregation: one writer per cell across worker processes
+
+Ingestion no longer aggregates cells in the request's worker. It marks
+them dirty in Redis, grouped by res-8 parent cell (the shard). Every
+aggregation worker heartbeats into a shared membership set and places the
+live members on a consistent-hash ring; a shard is processed only by the
+worker the ring assigns it to, and only while that worker holds the
+shard's lease. When workers join or leave, the ring moves just the
+affected shards; a new owner waits for the previous owner's lease to be
+released or to expire, so two workers never aggregate the same cell at
+once.
+
+Dirty cells live in Redis sets, so repeated readings for a hot cell
+coalesce into one aggregation run. A popped batch stays in the shard's
+in-flight set until each cell is written; cells that fail go back to the
+dirty set, and whatever a killed or cancelled worker left in flight is
+restored by the shard's next lease holder before it pops anything new.
+"""
+from db.database import AsyncSessionLocal, get_redis
+from services.aggregator import SignalAggregator
+from services.geospatial import GeospatialService
+from bisect import bisect_right
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+import asyncio
+import hashlib
+import os
+import socket
+import time
+
+
+class HashRing:
+    """Consistent-hash ring of worker ids with virtual nodes"""
+    
+    VNODES = 128  # Points per worker; evens out the share each worker gets
+    
+    def __init__(self, members: Iterable[str] = (), vnodes: int = VNODES):
+        self.members = sorted(set(members))
+        points = sorted(
+            (self._hash(f"{member}#{i}".encode()), member)
+            for member in self.members
+            for i in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+    
+    @staticmethod
+    def _hash(data: bytes) -> int:
+        return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+    
+    def owner(self, shard: int) -> Optional[str]:
+        """Worker responsible for a shard, or None if the ring is empty"""
+        if not self._hashes:
+            return None
+        i = bisect_right(self._hashes, self._hash(shard.to_bytes(8, "big")))
+        return self._owners[i % len(self._owners)]
+
+
+class AggregationShards:
+    """Redis layout shared by ingestion (producers) and aggregation workers"""
+    
+    SHARD_RESOLUTION = 8  # ~0.7 km²; small shards spread a city evenly over the ring
+    
+    DIRTY_KEY = "aggregation:dirty"  # Sorted set of shards with dirty cells, scored by first mark
+    WORKERS_KEY = "aggregation:workers"  # Sorted set of worker ids scored by heartbeat expiry
+    
+    @staticmethod
+    def cells_key(shard: int) -> str:
+        return f"aggregation:dirty:{shard:x}"
+    
+    @staticmethod
+    def inflight_key(shard: int) -> str:
+        return f"aggregation:inflight:{shard:x}"
+    
+    @staticmethod
+    def lease_key(shard: int) -> str:
+        return f"aggregation:lease:{shard:x}"
+    
+    @classmethod
+    def shard_of(cls, h3_index: int) -> int:
+        return GeospatialService.get_parent(h3_index, cls.SHARD_RESOLUTION)
+    
+    @classmethod
+    async def mark_dirty(cls, redis, cells: Iterable[int]) -> None:
+        """
+        Queue cells for aggregation by their shard's owner
+        
+        Args:
+            redis: Redis client
+            cells: H3 cells that received new readings
+        """
+        by_shard: Dict[int, List[int]] = {}
+        for h3_index in cells:
+            by_shard.setdefault(cls.shard_of(h3_index), []).append(h3_index)
+        if not by_shard:
+            return
+        
+        now = time.time()
+        pipe = redis.pipeline(transaction=False)
+        for shard, shard_cells in by_shard.items():
+            pipe.sadd(cls.cells_key(shard), *shard_cells)
+        # Cells first: a worker that sees the shard always finds its cells
+        pipe.zadd(cls.DIRTY_KEY, {f"{shard:x}": now for shard in by_shard}, nx=True)
+        await pipe.execute()
+
+
+# Take the lease if it is free (or already ours) and extend it
+ACQUIRE_LEASE = """
+local holder = redis.call('GET', KEYS[1])
+if holder == false or holder == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+RELEASE_LEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Restore cells a previous holder left in flight, then move a batch in flight
+TAKE_BATCH = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('SUNIONSTORE', KEYS[1], KEYS[1], KEYS[2])
+    redis.call('DEL', KEYS[2])
+end
+local cells = redis.call('SPOP', KEYS[1], ARGV[1])
+if #cells > 0 then
+    redis.call('SADD', KEYS[2], unpack(cells))
+end
+return cells
+"""
+
+# Drop a shard from the dirty index only if no cell was marked since the last pop
+CLEAR_IF_EMPTY = """
+if redis.call('SCARD', KEYS[2]) == 0 then
+    return redis.call('ZREM', KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+
+class AggregationWorker:
+    """
+    Aggregates the dirty cells of the shards this process owns
+    
+    Runs in every API worker (and in dedicated jobs.aggregation_worker
+    processes). Ownership is recomputed on each heartbeat; the lease is
+    renewed before each cell and outlives a cell's aggregation by a wide
+    margin, so it can only lapse if the worker stalls. A worker that finds
+    its lease taken stops at once and leaves the rest of the batch in
+    flight for the new holder.
+    """
+    
+    HEARTBEAT_SECONDS = 2.0
+    MEMBER_TTL_SECONDS = 6.0  # Missed heartbeats before a worker leaves the ring
+    LEASE_SECONDS = 15.0
+    POLL_SECONDS = 0.5
+    BATCH_SIZE = 50  # Cells popped from a shard per round
+    CONCURRENCY = 4  # Shards aggregated in parallel, each with its own session
+    
+    def __init__(
+        self,
+        worker_id: str = None,
+        aggregate: Callable[[int, object], Awaitable[None]] = None,
+        concurrency: int = CONCURRENCY
+    ):
+        """
+        Args:
+            worker_id: Unique id of this process (default: host:pid)
+            aggregate: Coroutine taking (h3_index, redis) (default: SignalAggregator)
+            concurrency: Shards processed in parallel
+        """
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.aggregate = aggregate or self._aggregate_cell
+        self.concurrency = concurrency
+        self.ring = HashRing()
+        self.leases: Set[int] = set()
+        self.heartbeat_at = 0.0
+        self.processed = 0
+        self._scripts = None
+    
+    @staticmethod
+    async def _aggregate_cell(h3_index: int, redis) -> None:
+        async with AsyncSessionLocal() as db:
+            await SignalAggregator(db, redis=redis).aggregate_cell(h3_index)
+    
+    def _script(self, redis, name: str):
+        if self._scripts is None:
+            self._scripts = {
+                "acquire": redis.register_script(ACQUIRE_LEASE),
+                "release": redis.register_script(RELEASE_LEASE),
+                "take": redis.register_script(TAKE_BATCH),
+                "clear": redis.register_script(CLEAR_IF_EMPTY),
+            }
+        return self._scripts[name]
+    
+    async def heartbeat(self, redis) -> None:
+        """Refresh membership and rebuild the ring when it changed"""
+        now = time.time()
+        pipe = redis.pipeline(transaction=False)
+        pipe.zadd(AggregationShards.WORKERS_KEY, {self.worker_id: now + self.MEMBER_TTL_SECONDS})
+        pipe.zremrangebyscore(AggregationShards.WORKERS_KEY, "-inf", now)
+        pipe.zrange(AggregationShards.WORKERS_KEY, 0, -1)
+        members = (await pipe.execute())[-1]
+        self.heartbeat_at = time.monotonic()
+        
+        if sorted(members) != self.ring.members:
+            self.ring = HashRing(members)
+            print(f"Aggregation ring changed: {len(members)} workers")
+            
+            # Hand over shards that moved to another worker
+            for shard in [shard for shard in self.leases if self.ring.owner(shard) != self.worker_id]:
+                await self._script(redis, "release")(
+                    keys=[AggregationShards.lease_key(shard)], args=[self.worker_id]
+                )
+                self.leases.discard(shard)
+    
+    async def _renew_lease(self, redis, shard: int) -> bool:
+        """Take or extend the shard's lease; False if another worker holds it"""
+        acquired = await self._script(redis, "acquire")(
+            keys=[AggregationShards.lease_key(shard)],
+            args=[self.worker_id, int(self.LEASE_SECONDS * 1000)]
+        )
+        if acquired:
+            self.leases.add(shard)
+        else:
+            self.leases.discard(shard)
+        return bool(acquired)
+    
+    async def _process_shard(self, redis, shard: int) -> int:
+        if not await self._renew_lease(redis, shard):
+            # Previous owner still finishing a batch; retry next round
+            return 0
+        
+        cells_key = AggregationShards.cells_key(shard)
+        inflight_key = AggregationShards.inflight_key(shard)
+        cells = await self._script(redis, "take")(keys=[cells_key, inflight_key], args=[self.BATCH_SIZE])
+        done, failed = [], []
+        lease_lost = False
+        for h3_index in cells:
+            # Renewed per cell, so a write never starts after the lease moved on
+            if done or failed:
+                if not await self._renew_lease(redis, shard):
+                    print(f"Aggregation lease for shard {shard:x} lost, leaving the rest of the batch in flight")
+                    lease_lost = True
+                    break
+            try:
+                await self.aggregate(int(h3_index), redis)
+                done.append(h3_index)
+            except Exception as e:
+                # Log error and retry the cell in a later round
+                print(f"Aggregation failed for {int(h3_index):x}: {e}")
+                failed.append(h3_index)
+        
+        pipe = redis.pipeline(transaction=False)
+        if failed:
+            pipe.sadd(cells_key, *failed)
+        if done or failed:
+            pipe.srem(inflight_key, *done, *failed)
+        await pipe.execute()
+        
+        if not lease_lost:
+            await self._script(redis, "clear")(
+                keys=[AggregationShards.DIRTY_KEY, cells_key],
+                args=[f"{shard:x}"]
+            )
+        return len(done)
+    
+    async def run_once(self, redis) -> int:
+        """
+        One round over the dirty shards this worker owns
+        
+        Returns:
+            Number of cells aggregated
+        """
+        if time.monotonic() - self.heartbeat_at >= self.HEARTBEAT_SECONDS:
+            await self.heartbeat(redis)
+        
+        dirty = await redis.zrange(AggregationShards.DIRTY_KEY, 0, -1)
+        owned = [
+            shard for shard in (int(member, 16) for member in dirty)
+            if self.ring.owner(shard) == self.worker_id
+        ]
+        
+        done = 0
+        for i in range(0, len(owned), self.concurrency):
+            counts = await asyncio.gather(*[
+                self._process_shard(redis, shard) for shard in owned[i:i + self.concurrency]
+            ])
+            done += sum(counts)
+            
+            # Keep membership alive through long rounds
+            if time.monotonic() - self.heartbeat_at >= self.HEARTBEAT_SECONDS:
+                await self.heartbeat(redis)
+        
+        self.processed += done
+        return done
+    
+    async def run_forever(self, redis=None) -> None:
+        """Process owned shards until cancelled, then leave the ring"""
+        redis = redis or await get_redis()
+        try:
+            while True:
+                try:
+                    done = await self.run_once(redis)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Log error and retry on the next poll
+                    print(f"Aggregation worker {self.worker_id} failed: {e}")
+                    done = 0
+                if not done:
+                    await asyncio.sleep(self.POLL_SECONDS)
+        finally:
+            await asyncio.shield(self.leave(redis))
+    
+    async def leave(self, redis) -> None:
+        """Deregister and release leases so other workers take over at once"""
+        try:
+            await redis.zrem(AggregationShards.WORKERS_KEY, self.worker_id)
+            for shard in list(self.leases):
+                await self._script(redis, "release")(
+                    keys=[AggregationShards.lease_key(shard)], args=[self.worker_id]
+                )
+            self.leases.clear()
+        except Exception as e:
+            print(f"Aggregation worker {self.worker_id} could not leave cleanly: {e}")
@@ -0,0 +1,84 @@
+from typing import Iterable, List, Optional, Tuple
+
+
+class SignalHistogram:
+    """
+    Mergeable quantile sketch for signal strength
+    
+    One counter per whole dBm over the valid reading range (-120..-20),
+    i.e. 101 integers per cell. Readings are already integers, so
+    quantiles are exact; merging two cells (or rolling children up into a
+    parent resolution) is element-wise addition.
+    """
+    
+    MIN_DBM = -120
+    MAX_DBM = -20
+    BINS = MAX_DBM - MIN_DBM + 1
+    
+    def __init__(self, counts: Optional[List[int]] = None):
+        if counts is not None and len(counts) != self.BINS:
+            raise ValueError(f"Histogram needs {self.BINS} bins, got {len(counts)}")
+        self.counts = list(counts) if counts is not None else [0] * self.BINS
+    
+    @classmethod
+    def from_counts(cls, rows: Iterable[Tuple[int, int]]) -> "SignalHistogram":
+        """
+        Build from (signal_dbm, count) pairs, e.g. a GROUP BY signal_dbm
+        
+        Args:
+            rows: Iterable of (dBm, count)
+            
+        Returns:
+            SignalHistogram
+        """
+        histogram = cls()
+        for dbm, count in rows:
+            histogram.add(dbm, count)
+        return histogram
+    
+    @classmethod
+    def merge_all(cls, histograms: Iterable["SignalHistogram"]) -> "SignalHistogram":
+        """Merge any number of histograms into a new one"""
+        merged = cls()
+        for histogram in histograms:
+            merged.merge(histogram)
+        return merged
+    
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+    
+    def add(self, dbm: int, count: int = 1) -> None:
+        """Record `count` readings at `dbm` (clamped to the valid range)"""
+        dbm = min(max(int(dbm), self.MIN_DBM), self.MAX_DBM)
+        self.counts[dbm - self.MIN_DBM] += count
+    
+    def merge(self, other: "SignalHistogram") -> "SignalHistogram":
+        """Add another histogram's counts into this one (in place)"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        return self
+    
+    def quantile(self, q: float) -> Optional[int]:
+        """
+        Signal strength at quantile q (nearest-rank)
+        
+        Args:
+            q: Quantile between 0 and 1 (0.1 = weakest 10%)
+            
+        Returns:
+            dBm value, or None for an empty histogram
+        """
+        total = self.total
+        if total == 0:
+            return None
+        
+        rank = max(q * total, 1)
+        running = 0
+        for offset, count in enumerate(self.counts):
+            running += count
+            if running >= rank:
+                return self.MIN_DBM + offset
+        return self.MAX_DBM
+    
+    def to_list(self) -> List[int]:
+        return list(self.counts)
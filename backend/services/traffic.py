@@ -0,0 +1,254 @@
+"""
+Sampled, anonymized capture of real API traffic for replay
+
+TrafficCaptureMiddleware hands sampled ingest and navigation requests to
+TrafficCapture, which anonymizes them off the request path and appends
+them to gzip-compressed JSON lines, one file per worker process:
+
+    <TRAFFIC_CAPTURE_DIR>/capture-<host>-<pid>-<start>.jsonl.gz
+
+The first line is a header ({"v": 1, "sample_rate": ..., "started": ...}),
+then one record per request:
+
+    {"t": 1760860800.123,          # Wall-clock time the request arrived
+     "m": "POST", "p": "/api/v1/ingest/", "r": "/api/v1/ingest/",  # Path, route template
+     "q": {"lat": "40.71281"},     # Query parameters
+     "b": {"readings": [...]},     # JSON body, or null
+     "s": 200, "d": 0.0123}        # Original status and latency (s)
+
+Anonymization is the same as ingestion's: coordinates are truncated with
+Anonymizer.truncate_coordinates, device ids, SSIDs and carriers are
+replaced by (shortened) Anonymizer hashes, and reading timestamps are
+stored relative to "t" so a replay can shift them to the present. Headers
+(tokens, user agents) and client addresses are never captured.
+
+Carrier hashes (the `carrier` query parameter and reading field) are not
+sent as they are: the API would hash them again, and a carrier filter
+would match nothing. Replay resolves each one to a carrier name with
+resolve_carrier: the name it is the hash of when that name is among the
+replay target's carriers, else a stable stand-in from that list.
+
+benchmarks/load/replay.py sends captures against a build.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from services.anonymizer import Anonymizer
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl
+import gzip
+import json
+import os
+import socket
+import time
+
+CAPTURE_VERSION = 1
+HASH_CHARS = 16  # Hex chars of hashed identifiers kept; still distinct per device
+MAX_BODY_BYTES = 256 * 1024  # Larger bodies are captured without a body
+
+# Query parameters holding identifiers
+_HASHED_PARAMS = {"carrier": Anonymizer.hash_carrier}
+
+
+def _short_hash(value: Optional[str], hasher) -> Optional[str]:
+    return hasher(value)[:HASH_CHARS] if value else None
+
+
+def anonymize_query(query_string: bytes) -> dict:
+    """Query parameters with coordinates truncated and identifiers hashed"""
+    params = dict(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True))
+    if "lat" in params and "lon" in params:
+        try:
+            lat, lon = Anonymizer.truncate_coordinates(float(params["lat"]), float(params["lon"]))
+            params["lat"], params["lon"] = str(lat), str(lon)
+        except ValueError:
+            pass
+    for key, hasher in _HASHED_PARAMS.items():
+        if params.get(key):
+            params[key] = _short_hash(params[key], hasher)
+    return params
+
+
+def anonymize_body(body: bytes, received_at: float) -> Optional[dict]:
+    """
+    Anonymized ingest batch, or None for bodies that aren't JSON batches
+    
+    Args:
+        body: Raw request body
+        received_at: Wall-clock time of the request, for relative timestamps
+    """
+    if not body or len(body) > MAX_BODY_BYTES:
+        return None
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or not isinstance(payload.get("readings"), list):
+        return None
+    
+    readings = []
+    for reading in payload["readings"]:
+        if not isinstance(reading, dict):
+            continue
+        reading = dict(reading)
+        try:
+            reading["latitude"], reading["longitude"] = Anonymizer.truncate_coordinates(
+                float(reading["latitude"]), float(reading["longitude"])
+            )
+        except (KeyError, TypeError, ValueError):
+            continue
+        reading["device_id"] = _short_hash(str(reading.get("device_id") or ""), Anonymizer.hash_device_id)
+        reading["ssid"] = _short_hash(reading.get("ssid"), Anonymizer.hash_ssid)
+        reading["carrier"] = _short_hash(reading.get("carrier"), Anonymizer.hash_carrier)
+        
+        # Offline uploads arrive with old timestamps: keep the gap, not the date
+        timestamp = reading.pop("timestamp", None)
+        if timestamp:
+            try:
+                parsed = datetime.fromisoformat(str(timestamp).replace("Z", "+00:00"))
+                if parsed.tzinfo is None:
+                    parsed = parsed.replace(tzinfo=timezone.utc)
+                reading["timestamp_offset"] = round(parsed.timestamp() - received_at, 3)
+            except ValueError:
+                pass
+        readings.append(reading)
+    return {"readings": readings}
+
+
+class TrafficCapture:
+    """
+    Buffers sampled requests and appends them to this worker's capture file
+    
+    record() only queues the raw request; anonymizing, encoding and writing
+    happen on a single background thread (one gzip member per flush), so a
+    sampled request costs a list append.
+    """
+    
+    FLUSH_RECORDS = 200
+    FLUSH_SECONDS = 5.0
+    
+    def __init__(self, directory: str, sample_rate: float):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        started = datetime.now(timezone.utc)
+        self.path = os.path.join(
+            directory,
+            f"capture-{socket.gethostname()}-{os.getpid()}-{started:%Y%m%dT%H%M%S}.jsonl.gz"
+        )
+        self._buffer: List[Tuple] = []
+        self._flushed_at = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="traffic-capture")
+        self._header = {"v": CAPTURE_VERSION, "sample_rate": sample_rate, "started": started.isoformat()}
+        self._wrote_header = False
+    
+    def record(
+        self,
+        received_at: float,
+        method: str,
+        path: str,
+        route: Optional[str],
+        query_string: bytes,
+        body: bytes,
+        status: int,
+        duration: float
+    ) -> None:
+        self._buffer.append((received_at, method, path, route, query_string, body, status, duration))
+        if len(self._buffer) >= self.FLUSH_RECORDS or time.monotonic() - self._flushed_at >= self.FLUSH_SECONDS:
+            self.flush()
+    
+    def flush(self) -> None:
+        """Hand the buffered requests to the writer thread"""
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        self._flushed_at = time.monotonic()
+        self._executor.submit(self._write, batch)
+    
+    def close(self) -> None:
+        """Flush and wait for pending writes (at shutdown)"""
+        self.flush()
+        self._executor.shutdown(wait=True)
+    
+    def _write(self, batch: List[Tuple]) -> None:
+        try:
+            lines = []
+            if not self._wrote_header:
+                lines.append(json.dumps(self._header))
+                self._wrote_header = True
+            for received_at, method, path, route, query_string, body, status, duration in batch:
+                lines.append(json.dumps({
+                    "t": round(received_at, 3),
+                    "m": method,
+                    "p": path,
+                    "r": route,
+                    "q": anonymize_query(query_string),
+                    "b": anonymize_body(body, received_at) if method in ("POST", "PUT") else None,
+                    "s": status,
+                    "d": round(duration, 5),
+                }, separators=(",", ":")))
+            
+            os.makedirs(self.directory, exist_ok=True)
+            # Each flush appends a gzip member; readers see one continuous stream
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except Exception as e:
+            # Capturing must never affect serving
+            print(f"Traffic capture write failed: {e}")
+
+
+def carrier_pseudonyms(carriers: Sequence[str]) -> Dict[str, str]:
+    """Captured carrier hash -> carrier name, for carriers known to the replay target"""
+    return {_short_hash(name, Anonymizer.hash_carrier): name for name in carriers}
+
+
+def resolve_carrier(captured: Optional[str], pseudonyms: Dict[str, str]) -> Optional[str]:
+    """
+    Carrier name to replay a captured carrier hash as
+    
+    Args:
+        captured: Hash from a capture (or None)
+        pseudonyms: carrier_pseudonyms() of the replay target's carriers
+    
+    Returns:
+        The carrier it is the hash of if known, else the same stand-in carrier
+        for every occurrence of this hash (None if there are no carriers)
+    """
+    if not captured or not pseudonyms:
+        return None
+    name = pseudonyms.get(captured)
+    if name is None:
+        names = sorted(pseudonyms.values())
+        try:
+            name = names[int(captured, 16) % len(names)]
+        except ValueError:
+            name = names[0]
+    return name
+
+
+def read_capture(paths: Iterable[str]) -> Iterator[Tuple[dict, dict]]:
+    """
+    Records of capture files
+    
+    Args:
+        paths: Capture files (.jsonl.gz)
+    
+    Yields:
+        (header, record) per request, in file order
+    """
+    for path in paths:
+        header = {}
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        continue
+                    if "v" in item:
+                        header = item
+                    else:
+                        yield header, item
+        except (EOFError, gzip.BadGzipFile) as e:
+            # Last member cut short: the worker was killed mid-write
+            print(f"{path}: stopped at a truncated record ({e})")
@@ -0,0 +1,91 @@
+"""Region pack encoding and the memory-mapped reader"""
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from services.geospatial import GeospatialService
+from services.packs import FORMAT_VERSION, HEADER_SIZE, PackFormatError, RegionPack, encode_pack, write_pack
+
+CREATED_AT = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def cells():
+    geo = GeospatialService()
+    return sorted(geo.get_cells_in_radius(40.7128, -74.0060, 200))
+
+
+@pytest.fixture
+def pack_path(tmp_path, cells):
+    # Encoded out of order; the pack sorts them
+    ids = np.array(cells[::-1], dtype=np.uint64)
+    dbm = np.array([-60.4 - i for i in range(len(cells))][::-1])
+    confidence = np.array([0.5 + i / (2 * len(cells)) for i in range(len(cells))][::-1])
+    path = str(tmp_path / "region.stpk")
+    write_pack(path, encode_pack(ids, dbm, confidence, data_version=42, created_at=CREATED_AT))
+    return path
+
+
+def test_header(pack_path, cells):
+    pack = RegionPack(pack_path, verify=True)
+    
+    assert pack.header.format_version == FORMAT_VERSION
+    assert pack.header.resolution == GeospatialService.DEFAULT_RESOLUTION
+    assert pack.header.cell_count == len(pack) == len(cells)
+    assert pack.header.created_at == CREATED_AT
+    assert pack.header.data_version == 42
+
+
+def test_lookup_hit(pack_path, cells):
+    pack = RegionPack(pack_path)
+    
+    for i, cell in enumerate(cells):
+        signal_dbm, confidence = pack.get(cell)
+        assert signal_dbm == round(-60.4 - i)
+        assert confidence == pytest.approx(0.5 + i / (2 * len(cells)), abs=0.005)
+
+
+def test_lookup_miss(pack_path, cells):
+    pack = RegionPack(pack_path)
+    far_away = GeospatialService().lat_lon_to_h3(51.5074, -0.1278)
+    
+    assert pack.get(far_away) is None
+    assert pack.get(cells[0] - 1) is None
+    assert pack.get(cells[-1] + 1) is None
+
+
+def test_best_in_ranges(pack_path, cells):
+    pack = RegionPack(pack_path)
+    
+    # Strongest cell is the first; a confidence floor rules it out
+    assert pack.best_in_ranges([(cells[0], cells[-1])], 0.0)[:2] == (cells[0], -60)
+    assert pack.best_in_ranges([(cells[0], cells[-1])], 0.75)[0] != cells[0]
+    assert pack.best_in_ranges([], 0.0) is None
+
+
+@pytest.mark.parametrize("size", [0, HEADER_SIZE - 1, HEADER_SIZE, HEADER_SIZE + 10])
+def test_truncated_file(pack_path, size):
+    with open(pack_path, "rb") as f:
+        data = f.read(size)
+    with open(pack_path, "wb") as f:
+        f.write(data)
+    
+    with pytest.raises(PackFormatError):
+        RegionPack(pack_path)
+
+
+def test_rejects_other_files(tmp_path, pack_path):
+    path = tmp_path / "other.stpk"
+    path.write_bytes(b"PK\x03\x04" + bytes(HEADER_SIZE))
+    with pytest.raises(PackFormatError, match="not a region pack"):
+        RegionPack(str(path))
+    
+    with open(pack_path, "r+b") as f:
+        f.seek(HEADER_SIZE)
+        byte = f.read(1)[0]
+        f.seek(HEADER_SIZE)
+        f.write(bytes([byte ^ 0xff]))
+    RegionPack(pack_path)  # Checksum only read on request
+    with pytest.raises(PackFormatError, match="checksum"):
+        RegionPack(pack_path, verify=True)
@@ -0,0 +1,123 @@
+"""Rate limiting: shared Redis buckets, the ASGI middleware, client addresses"""
+import httpx
+import pytest
+from redis import asyncio as aioredis
+
+from config import settings
+from middleware.ratelimit import RateLimitMiddleware
+from services.ratelimit import RateLimiter, client_ip, parse_networks
+
+pytestmark = pytest.mark.anyio
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def unreachable_redis():
+    return aioredis.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.1)
+
+
+async def test_bucket_is_shared_between_workers(redis):
+    workers = [RateLimiter(redis), RateLimiter(redis)]
+    decisions = [await workers[i % 2].check("default", "ip:192.0.2.1", 10) for i in range(12)]
+    
+    assert [d.allowed for d in decisions] == [True] * 10 + [False] * 2
+    assert all(d.source == "redis" for d in decisions[:10])
+    # One token refills every 6 s at 10 per minute
+    assert 5 < decisions[10].retry_after <= 6
+
+
+async def test_lease_is_spent_locally(redis):
+    limiter = RateLimiter(redis)
+    decisions = [await limiter.check("default", "ip:192.0.2.1", 60) for _ in range(7)]
+    
+    # 60 per minute leases 6 tokens at a time
+    assert [d.source for d in decisions] == ["redis"] + ["local"] * 5 + ["redis"]
+    assert all(d.allowed for d in decisions)
+    tokens = float(await redis.hget("ratelimit:default:ip:192.0.2.1", "tokens"))
+    assert 47 < tokens <= 48.1
+
+
+async def test_denial_is_remembered_locally(redis):
+    limiter = RateLimiter(redis)
+    await limiter.check("default", "ip:192.0.2.1", 1)
+    await limiter.check("default", "ip:192.0.2.1", 1)
+    
+    decision = await limiter.check("default", "ip:192.0.2.1", 1)
+    assert not decision.allowed
+    assert decision.source == "local"
+
+
+async def test_over_budget_gets_429_with_retry_after(redis, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_routes", "/api/v1/limited/=2")
+    app = RateLimitMiddleware(ok_app, limiter=RateLimiter(redis))
+    transport = httpx.ASGITransport(app=app, client=("198.51.100.7", 40000))
+    
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        statuses = [(await client.get("/api/v1/limited/x")).status_code for _ in range(2)]
+        limited = await client.get("/api/v1/limited/x")
+        other_route = await client.get("/api/v1/other")
+        not_api = await client.get("/health")
+    
+    assert statuses == [200, 200]
+    assert limited.status_code == 429
+    assert limited.json() == {"detail": "Rate limit exceeded"}
+    assert 1 <= int(limited.headers["retry-after"]) <= 30
+    assert limited.headers["ratelimit-limit"] == "2"
+    assert other_route.status_code == 200
+    assert not_api.status_code == 200
+
+
+async def test_clients_behind_one_proxy_get_separate_buckets(redis, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_routes", "/api/=1")
+    monkeypatch.setattr(settings, "rate_limit_trusted_proxies", "10.0.0.0/8")
+    app = RateLimitMiddleware(ok_app, limiter=RateLimiter(redis))
+    transport = httpx.ASGITransport(app=app, client=("10.0.0.2", 40000))
+    
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first = await client.get("/api/x", headers={"X-Forwarded-For": "203.0.113.1"})
+        second = await client.get("/api/x", headers={"X-Forwarded-For": "203.0.113.2"})
+        # A client can't escape its bucket by prepending addresses
+        spoofed = await client.get("/api/x", headers={"X-Forwarded-For": "192.0.2.9, 203.0.113.1"})
+    
+    assert [first.status_code, second.status_code, spoofed.status_code] == [200, 200, 429]
+
+
+@pytest.mark.parametrize("peer, forwarded, expected", [
+    ("203.0.113.1", None, "203.0.113.1"),
+    # Untrusted peers can't pick their address
+    ("203.0.113.1", "192.0.2.9", "203.0.113.1"),
+    ("10.0.0.2", "203.0.113.1", "203.0.113.1"),
+    # Read from the right, through every trusted hop
+    ("10.0.0.2", "192.0.2.9, 203.0.113.1, 10.0.0.3", "203.0.113.1"),
+    # Only proxies in the chain: the leftmost is as far as it goes
+    ("10.0.0.2", "10.0.0.4, 10.0.0.3", "10.0.0.4"),
+    ("10.0.0.2", None, "10.0.0.2"),
+])
+def test_client_ip_trusts_only_listed_proxies(peer, forwarded, expected):
+    headers = {b"x-forwarded-for": forwarded.encode()} if forwarded else {}
+    scope = {"client": (peer, 40000)}
+    assert client_ip(scope, headers, parse_networks("10.0.0.0/8")) == expected
+
+
+def test_client_ip_without_trusted_proxies_is_the_peer():
+    scope = {"client": ("10.0.0.2", 40000)}
+    assert client_ip(scope, {b"x-forwarded-for": b"203.0.113.1"}) == "10.0.0.2"
+    assert client_ip({}, {}) is None
+
+
+async def test_falls_back_to_local_buckets_when_redis_is_down():
+    redis = unreachable_redis()
+    limiter = RateLimiter(redis)
+    try:
+        decisions = [await limiter.check("default", "ip:192.0.2.1", 2) for _ in range(3)]
+        other_client = await limiter.check("default", "ip:192.0.2.2", 2)
+    finally:
+        await redis.aclose()
+    
+    assert [d.allowed for d in decisions] == [True, True, False]
+    assert all(d.source == "fallback" for d in decisions)
+    assert 29 < decisions[2].retry_after <= 30
+    assert other_client.allowed